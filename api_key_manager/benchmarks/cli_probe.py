@@ -0,0 +1,73 @@
+"""
+Time the command line interface in a fresh interpreter.
+
+Run by run_benchmarks.py. Prints a line starting with RESULT_PREFIX
+followed by a JSON object with the time taken to import cli.py, the Qt
+modules that import loaded (there should be none) and the time taken by
+an "exists" command against a fake keyring. The fake keyring has to be
+installed before the command runs, so the time to import the keyring
+package itself is not included.
+
+Usage: python cli_probe.py KEY_COUNT LATENCY_MS
+"""
+
+import time
+
+started = time.perf_counter()
+
+import io
+import json
+import os
+import sys
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+os.chdir(APP_DIR)
+
+RESULT_PREFIX = "CLI_PROBE "
+
+# Top-level packages that must never be imported by the command line interface
+GUI_PACKAGES = ("PyQt6", "PyQt5", "PySide6", "sip")
+
+def main():
+    """Import the CLI, check what it loaded and run one command."""
+    import_start = time.perf_counter()
+    import cli
+    imported = time.perf_counter()
+    
+    timings = {
+        "interpreter_ms": (import_start - started) * 1000,
+        "import_ms": (imported - import_start) * 1000,
+        "gui_modules": sorted(m for m in sys.modules if m.split(".")[0] in GUI_PACKAGES),
+    }
+    
+    import tempfile
+    import fake_keyring
+    from core.config import config
+    key_count = int(sys.argv[1])
+    latency = float(sys.argv[2]) / 1000
+    
+    config.set("storage", "backend", "keyring")
+    config.set("storage", "service_name", "APIKeyManager")
+    # Keep the real index lock file (and its generation) out of the run
+    config.set("storage", "index_lock_path", os.path.join(tempfile.mkdtemp(), "index.lock"))
+    backend = fake_keyring.install()
+    names = [f"bench-key-{i}" for i in range(key_count)]
+    backend.passwords[("APIKeyManager", "__key_index__")] = json.dumps(names)
+    for name in names:
+        backend.passwords[("APIKeyManager", name)] = "secret"
+    # Migrate the seeded index up front so the command does not pay for it
+    cli.open_storage()
+    backend.latency = latency
+    
+    command_start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        cli.main(["exists", "bench-key-0"])
+    timings["command_ms"] = (time.perf_counter() - command_start) * 1000
+    
+    print(RESULT_PREFIX + json.dumps(timings))
+
+if __name__ == "__main__":
+    main()
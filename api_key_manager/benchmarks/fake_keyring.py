@@ -0,0 +1,60 @@
+"""
+In-memory keyring backend for benchmarks.
+"""
+
+import time
+
+import keyring
+from keyring.backend import KeyringBackend
+from keyring.errors import PasswordDeleteError
+
+class MemoryKeyring(KeyringBackend):
+    """Keyring backend that keeps passwords in a dict.
+    
+    Each call can be slowed down by a fixed latency to simulate the
+    round-trip to a real backend (for example D-Bus to the Secret
+    Service). Calls are counted so benchmarks can report backend traffic.
+    """
+    
+    priority = 1
+    
+    def __init__(self, latency=0.0):
+        """Initialize the backend.
+        
+        Args:
+            latency (float): Seconds to sleep on every call.
+        """
+        super().__init__()
+        self.latency = latency
+        self.passwords = {}
+        self.calls = 0
+    
+    def _round_trip(self):
+        """Count a call and wait for the simulated latency."""
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def get_password(self, service, username):
+        """Get a password."""
+        self._round_trip()
+        return self.passwords.get((service, username))
+    
+    def set_password(self, service, username, password):
+        """Set a password."""
+        self._round_trip()
+        self.passwords[(service, username)] = password
+    
+    def delete_password(self, service, username):
+        """Delete a password."""
+        self._round_trip()
+        if (service, username) not in self.passwords:
+            raise PasswordDeleteError(username)
+        del self.passwords[(service, username)]
+
+
+def install(latency=0.0):
+    """Make a new MemoryKeyring the active keyring backend and return it."""
+    backend = MemoryKeyring(latency)
+    keyring.set_keyring(backend)
+    return backend
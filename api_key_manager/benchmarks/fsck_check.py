@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Check that repairing the key index keeps the metadata of its keys.
+
+A store of keys with tags is damaged in several ways (a key whose secret
+is gone, a name in the wrong shard, an unreadable manifest), then repaired
+with core.fsck.check_index() the way 'cli.py fsck --repair' does: through
+a storage opened without loading the index, and with a lock file that has
+never seen a write, so the repair cannot rely on a re-read of the index.
+Every key left must keep its tags and creation time.
+
+    python benchmarks/fsck_check.py
+    python benchmarks/fsck_check.py --keys 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from index_stress import DirectoryBackend
+
+
+def open_storage(directory, ensure_index=True):
+    """Open a KeyStorage on a directory, with a lock file of its own."""
+    from core.config import config
+    config.set("storage", "index_lock_path", os.path.join(tempfile.mkdtemp(dir=directory), "index.lock"))
+    config.set("agent", "notify", False)
+    from core.key_storage import KeyStorage
+    return KeyStorage(DirectoryBackend(os.path.join(directory, "secrets")), ensure_index=ensure_index)
+
+
+def misplace(storage, name):
+    """Move a name to a shard it does not belong in, keeping its metadata."""
+    from core import index_codec
+    index = storage.index
+    backend = storage.backend
+    home = index.shard_of(name)
+    other = (home + 1) % index.shard_count
+    names, generation, metadata = index_codec.decode_shard(backend.get_secret(index.shard_key(home)))
+    moved = {name: names.pop(name)}
+    moved_metadata = {name: metadata.pop(name)}
+    backend.set_secret(index.shard_key(home), index_codec.encode_shard(names, generation, metadata))
+    names, generation, metadata = index_codec.decode_shard(backend.get_secret(index.shard_key(other)))
+    backend.set_secret(index.shard_key(other),
+                       index_codec.encode_shard({**names, **moved}, generation, {**metadata, **moved_metadata}))
+
+
+DAMAGE = {
+    "dangling": lambda storage, names: storage.backend.delete_secret(names[1]),
+    "misplaced": lambda storage, names: misplace(storage, names[2]),
+    "damaged manifest": lambda storage, names: storage.backend.set_secret(storage.index.index_key, "{not json"),
+}
+
+
+def run(key_count):
+    """Damage and repair a store once per kind of damage.
+    
+    Returns:
+        list: Descriptions of the failures.
+    """
+    from core.fsck import check_index
+    
+    failures = []
+    for label, damage in DAMAGE.items():
+        directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(directory, "secrets"))
+        storage = open_storage(directory)
+        names = [f"svc-key-{i:05d}" for i in range(key_count)]
+        for i, name in enumerate(names):
+            storage.add_key(name, "secret", {"tags": [f"team-{i % 3}"], "environment": "prod"})
+        expected = storage.get_all_metadata()
+        damage(storage, names)
+        
+        report = check_index(open_storage(directory, ensure_index=False), repair=True)
+        if not report["repaired"]:
+            failures.append(f"{label}: the index was not repaired")
+            continue
+        
+        repaired = open_storage(directory)
+        kept = repaired.get_all_keys()
+        if label == "dangling":
+            expected.pop(names[1])
+        if sorted(kept) != sorted(expected):
+            failures.append(f"{label}: {len(kept)} keys left, expected {len(expected)}")
+        lost = [name for name in kept if repaired.get_metadata(name) != expected.get(name)]
+        if lost:
+            failures.append(f"{label}: {len(lost)} keys lost their metadata, e.g. {lost[0]!r}: "
+                            f"{repaired.get_metadata(lost[0])}")
+        if len(repaired.find_keys(all_of=[("environment", "prod")])) != len(kept):
+            failures.append(f"{label}: keys are missing from the tag index")
+    return failures
+
+
+def main():
+    """Run the check."""
+    parser = argparse.ArgumentParser(description="Index repair check")
+    parser.add_argument("--keys", type=int, default=200, help="Keys in the store")
+    args = parser.parse_args()
+    
+    failures = run(max(3, args.keys))
+    for failure in failures:
+        print(failure)
+    print("FAILED" if failures else "OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Check the key index shard encodings of core/index_codec.py.
+
+Shards of several sizes (empty, one name, more names than fit between two
+restart points, non-ASCII names, with and without metadata) must decode to
+what was encoded, in both the JSON lines and the front-coded encoding, and
+every name must be found by contains() and ShardView.get(). Re-encoding a
+shard with the lines kept from decoding it must give the same text as
+encoding it from scratch, also after names and metadata change. Damaged
+shards (truncated, or with random bytes changed) must either decode or
+raise ValueError, which the index treats as a damaged entry; any other
+exception is reported.
+    
+    python benchmarks/index_codec_check.py
+    python benchmarks/index_codec_check.py --damaged 20000
+"""
+
+import argparse
+import base64
+import os
+import random
+import sys
+import zlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from core import index_codec
+
+
+def make_shards():
+    """Build (label, names, metadata) cases covering the layout's edge cases."""
+    many = {f"svc-prod-eu-west-1-billing-{i:05d}": i * 3 for i in range(index_codec.RESTART_INTERVAL * 5 + 3)}
+    return [
+        ("empty", {}, None),
+        ("one name", {"OPENAI_KEY": 0}, None),
+        ("restart points", many, None),
+        ("large sequence numbers", {"a": 2 ** 40, "ab": 300, "b": 127, "c": 128}, None),
+        ("non-ASCII", {"clé-Ω": 1, "clé-Ω-2": 2, "ключ": 3, "鍵": 4}, None),
+        ("metadata", many, {name: {"tags": ["billing"], "environment": "prod"}
+                            for name in list(many)[::4]}),
+    ]
+
+
+ABSENT = ("", "0", "svc-prod-eu-west-1-billing-", "zzz", "svc-prod-eu-west-1-billing-99999", "generation")
+
+
+def check_round_trip():
+    """Encode and decode every case in both encodings.
+    
+    Returns:
+        list: Descriptions of the failures.
+    """
+    failures = []
+    for label, names, metadata in make_shards():
+        expected_metadata = {name: value for name, value in (metadata or {}).items() if value}
+        for encoding, text in (("json lines", index_codec.encode_shard(names, 42, metadata)),
+                               ("front-coded", index_codec.encode_front_coded(names, 42, metadata))):
+            decoded, generation, decoded_metadata = index_codec.decode_shard(text)
+            if decoded != names or generation != 42 or decoded_metadata != expected_metadata:
+                failures.append(f"{label}, {encoding}: decode_shard() does not return what was encoded")
+            missing = [name for name in names if not index_codec.contains(text, name)]
+            if missing:
+                failures.append(f"{label}, {encoding}: contains() misses {len(missing)} names, e.g. {missing[0]!r}")
+            for absent in ABSENT:
+                if absent not in names and index_codec.contains(text, absent):
+                    failures.append(f"{label}, {encoding}: contains() finds {absent!r}, which is not in the shard")
+        
+        view = index_codec.ShardView(index_codec.encode_front_coded(names, 42, metadata))
+        if dict(view.items()) != names:
+            failures.append(f"{label}: ShardView.items() does not return what was encoded")
+        missing = [name for name, seq in names.items() if view.get(name) != seq]
+        if missing:
+            failures.append(f"{label}: ShardView.get() misses {len(missing)} names, e.g. {missing[0]!r}")
+    return failures
+
+
+def check_line_cache():
+    """Re-encode shards with the lines kept from decoding them.
+    
+    Returns:
+        list: Descriptions of the failures.
+    """
+    failures = []
+    for label, names, metadata in make_shards():
+        metadata = dict(metadata or {})
+        cache = index_codec.LineCache()
+        index_codec.decode_shard(index_codec.encode_shard(names, 42, metadata), cache)
+        
+        names = dict(names)
+        for name in list(names)[::3]:
+            del names[name]
+            metadata.pop(name, None)
+            cache.discard(name)
+        for name in list(names)[::5]:
+            names[name] += 1
+        for name in list(names)[1::4]:
+            metadata[name] = {"tags": ["changed"]}
+            cache.discard(name)
+        names["svc-new"] = 10 ** 6
+        
+        if index_codec.encode_shard(names, 43, metadata, cache) != index_codec.encode_shard(names, 43, metadata):
+            failures.append(f"{label}: encode_shard() with kept lines differs from a fresh encoding")
+    return failures
+
+
+def damaged_variants(text, count, rng):
+    """Yield damaged copies of an encoded shard (JSON lines)."""
+    raw = zlib.decompress(base64.b64decode(text[len(index_codec.PREFIX):]))
+    
+    def wrap(data):
+        # Damage the uncompressed lines, which zlib would otherwise reject
+        return index_codec.PREFIX + base64.b64encode(zlib.compress(data)).decode("ascii")
+    
+    yield index_codec.PREFIX
+    yield text[:-1]
+    yield text + "!"
+    yield wrap(raw.replace(b"\n\n", b"\n"))
+    yield wrap(raw + b"\n" + raw.split(b"\n")[-1])
+    yield wrap(raw.replace(b":", b":[", 1))
+    for end in range(0, len(raw), max(1, len(raw) // 200)):
+        yield wrap(raw[:end])
+    for _ in range(count):
+        damaged = bytearray(raw)
+        for _ in range(rng.randint(1, 3)):
+            damaged[rng.randrange(len(damaged))] = rng.choice(b'"{}[]:,\n0a' + bytes([rng.randrange(256)]))
+        yield wrap(bytes(damaged))
+
+
+def front_coded_variants(text, count, rng):
+    """Yield damaged copies of a front-coded shard."""
+    prefix = index_codec.FRONT_CODED_PREFIX
+    data = base64.b64decode(text[len(prefix):])
+    flags, body = data[0], data[1:]
+    if flags & index_codec.FLAG_ZLIB:
+        # Damage the uncompressed layout, which zlib would otherwise reject
+        flags &= ~index_codec.FLAG_ZLIB
+        body = zlib.decompress(body)
+    raw = bytes([flags]) + body
+    
+    yield prefix
+    yield text[:-1]
+    yield text + "!"
+    for end in range(len(raw)):
+        yield prefix + base64.b64encode(raw[:end]).decode("ascii")
+    for _ in range(count):
+        damaged = bytearray(raw)
+        for _ in range(rng.randint(1, 3)):
+            damaged[rng.randrange(len(damaged))] = rng.randrange(256)
+        yield prefix + base64.b64encode(bytes(damaged)).decode("ascii")
+
+
+def check_damaged(count, seed=0):
+    """Decode damaged shards, expecting nothing but ValueError.
+    
+    Returns:
+        list: Descriptions of the failures.
+    """
+    rng = random.Random(seed)
+    failures = {}
+    for label, names, metadata in make_shards():
+        probes = list(names)[:3] + ["absent"]
+        variants = [(damaged, None) for damaged in
+                    damaged_variants(index_codec.encode_shard(names, 42, metadata), count, rng)]
+        variants += [(damaged, index_codec.ShardView) for damaged in
+                     front_coded_variants(index_codec.encode_front_coded(names, 42, metadata), count, rng)]
+        for damaged, view in variants:
+            calls = [
+                ("decode_shard", lambda: index_codec.decode_shard(damaged, index_codec.LineCache())),
+                ("contains", lambda: [index_codec.contains(damaged, name) for name in probes]),
+            ]
+            if view is not None:
+                calls += [
+                    ("items", lambda: list(view(damaged).items())),
+                    ("get", lambda: [view(damaged).get(name) for name in probes]),
+                ]
+            for operation, call in calls:
+                try:
+                    call()
+                except ValueError:
+                    pass
+                except Exception as e:
+                    failures.setdefault((operation, type(e).__name__), f"{label}: {operation}() raised {e!r}")
+    return list(failures.values())
+
+
+def main():
+    """Run the checks."""
+    parser = argparse.ArgumentParser(description="Index shard encoding check")
+    parser.add_argument("--damaged", type=int, default=2000,
+                        help="Randomly damaged copies of each shard")
+    args = parser.parse_args()
+    
+    failures = check_round_trip() + check_line_cache() + check_damaged(args.damaged)
+    for failure in failures:
+        print(failure)
+    print("FAILED" if failures else "OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Size and speed of the key index shard encodings: JSON (index format 3),
+front-coded (index format 4) and the compressed JSON lines of
+core/index_codec.py (index format 5).
+
+Names share long prefixes, as they do in practice ("svc-prod-eu-west-1-..."),
+and each has the creation time in its metadata, as keys added by
+KeyStorage do. Every index is split over the configured number of shards,
+the way ShardedKeyIndex stores it. Besides the size, the table shows the
+time to encode and to decode every shard, to look one name up, and to
+write a shard after adding a name, which is what every add_key() pays (the
+JSON lines reuse the lines kept from reading the shard).
+    
+    python benchmarks/index_format.py
+    python benchmarks/index_format.py --sizes 10000 100000 --shards 8
+    python benchmarks/index_format.py --no-metadata
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from core import index_codec
+
+
+def make_names(size, seed=0):
+    """Generate key names with shared prefixes, in insertion order."""
+    rng = random.Random(seed)
+    environments = ["prod", "staging", "dev"]
+    regions = ["us-east-1", "us-west-2", "eu-west-1", "ap-southeast-2"]
+    services = ["billing", "search", "payments", "auth", "analytics", "notifications"]
+    return [
+        f"svc-{rng.choice(environments)}-{rng.choice(regions)}-{rng.choice(services)}-api-key-{i:06d}"
+        for i in range(size)
+    ]
+
+
+def make_metadata(names, with_metadata):
+    """Give every name a creation time, or nothing."""
+    if not with_metadata:
+        return {}
+    return {name: {"created": f"2026-01-{i % 28 + 1:02d}T12:{i % 60:02d}:00Z"} for i, name in enumerate(names)}
+
+
+def split_shards(names, shard_count):
+    """Spread names over shards the way ShardedKeyIndex does."""
+    shards = [{} for _ in range(shard_count)]
+    for seq, name in enumerate(names):
+        shards[zlib.crc32(name.encode("utf-8")) % shard_count][name] = seq
+    return shards
+
+
+def best_of(func, repeat):
+    """Run func repeat times and return the median duration in ms."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def bench(size, shard_count, repeat, with_metadata=True):
+    """Measure every format for one index size."""
+    names = make_names(size)
+    metadata = make_metadata(names, with_metadata)
+    shards = split_shards(names, shard_count)
+    probe = names[len(names) // 2]
+    probe_shard = zlib.crc32(probe.encode("utf-8")) % shard_count
+    caches = [index_codec.LineCache() for _ in shards]
+    
+    formats = {
+        "json": (
+            lambda i, shard: json.dumps({"generation": 1, "names": shard,
+                                         "metadata": {name: metadata[name] for name in shard if name in metadata}}),
+            lambda i, text: json.loads(text)["names"],
+            lambda text, name: name in json.loads(text)["names"],
+        ),
+        "front-coded": (
+            lambda i, shard: index_codec.encode_front_coded(shard, 1, metadata),
+            lambda i, text: index_codec.decode_shard(text)[0],
+            lambda text, name: name in index_codec.ShardView(text),
+        ),
+        "json-lines": (
+            lambda i, shard: index_codec.encode_shard(shard, 1, metadata, caches[i]),
+            lambda i, text: index_codec.decode_shard(text, caches[i])[0],
+            index_codec.contains,
+        ),
+    }
+    
+    rows = []
+    for label, (encode, decode, lookup) in formats.items():
+        encoded = [encode(i, shard) for i, shard in enumerate(shards)]
+        assert [decode(i, text) for i, text in enumerate(encoded)] == shards
+        assert lookup(encoded[probe_shard], probe)
+        added = iter(range(10 ** 9))
+        
+        def write():
+            shard = dict(shards[probe_shard])
+            shard[f"svc-new-api-key-{next(added)}"] = size
+            encode(probe_shard, shard)
+        
+        rows.append({
+            "format": label,
+            "bytes": sum(len(text) for text in encoded),
+            "largest_shard": max(len(text) for text in encoded),
+            "encode_ms": best_of(lambda: [encode(i, shard) for i, shard in enumerate(shards)], repeat),
+            "decode_ms": best_of(lambda: [decode(i, text) for i, text in enumerate(encoded)], repeat),
+            "lookup_ms": best_of(lambda: lookup(encoded[probe_shard], probe), repeat),
+            "write_ms": best_of(write, repeat),
+        })
+    return rows
+
+
+def main():
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description="Key index encoding benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="Number of names in the index")
+    parser.add_argument("--shards", type=int, default=8, help="Index shards")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is shown)")
+    parser.add_argument("--no-metadata", action="store_true", help="Store names without metadata")
+    args = parser.parse_args()
+    
+    print(f"{'names':>8} {'format':<12} {'bytes':>10} {'largest':>9} "
+          f"{'encode ms':>10} {'decode ms':>10} {'lookup ms':>10} {'write ms':>9}")
+    for size in args.sizes:
+        for row in bench(size, args.shards, args.repeat, not args.no_metadata):
+            print(f"{size:>8} {row['format']:<12} {row['bytes']:>10} {row['largest_shard']:>9} "
+                  f"{row['encode_ms']:>10.2f} {row['decode_ms']:>10.2f} {row['lookup_ms']:>10.3f} "
+                  f"{row['write_ms']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
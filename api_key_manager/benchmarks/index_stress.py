@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Multi-process stress test for the key index.
+
+Several processes add, rename and delete keys in one shared store at the
+same time, then the index is checked against what they did: every key a
+process still holds must be listed, and nothing else. The store is a
+directory with one file per secret, so all processes see each other's
+writes the way they would through a real keyring. With --backend vault
+or vault_log, the processes share one vault file instead, which each of
+them also keeps in memory.
+    
+    python benchmarks/index_stress.py --processes 8 --operations 200
+    python benchmarks/index_stress.py --backend vault
+    python benchmarks/index_stress.py --no-lock     (show the lost updates)
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from core.backends import StorageBackend, VaultBackend
+
+# Fixed vault key: the secrets are throwaway test data
+MASTER_KEY = bytes(32)
+
+
+class DirectoryBackend(StorageBackend):
+    """Store each secret as a file in a directory shared by all processes."""
+    
+    concurrent_reads = True
+    
+    def __init__(self, directory, latency=0.0):
+        """Initialize the backend.
+        
+        Args:
+            directory (str): Directory holding the secrets.
+            latency (float): Seconds to sleep on every call.
+        """
+        self.directory = directory
+        self.latency = latency
+    
+    def _path(self, name):
+        return os.path.join(self.directory, name.encode("utf-8").hex())
+    
+    def get_secret(self, name):
+        """Read a secret file."""
+        time.sleep(self.latency)
+        try:
+            with open(self._path(name), "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def set_secret(self, name, value):
+        """Replace a secret file atomically."""
+        time.sleep(self.latency)
+        path = self._path(name)
+        # A temporary file per process, so concurrent writers never share one
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(value)
+        os.replace(temp_path, path)
+    
+    def delete_secret(self, name):
+        """Delete a secret file."""
+        time.sleep(self.latency)
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+
+def create_backend(kind, directory, latency):
+    """Create the backend shared by all processes."""
+    if kind == "vault":
+        return VaultBackend(os.path.join(directory, "keys.vault"), MASTER_KEY)
+    if kind == "vault_log":
+        from core.vault_log import LogVaultBackend
+        return LogVaultBackend(os.path.join(directory, "keys.vlog"), MASTER_KEY)
+    return DirectoryBackend(directory, latency)
+
+
+def open_storage(directory, lock_path, latency, use_lock, kind="directory"):
+    """Open a KeyStorage on the shared directory."""
+    from core.config import config
+    config.set("storage", "index_lock_path", lock_path)
+    config.set("storage", "index_cache_ttl", -1)
+    config.set("agent", "notify", False)
+    from core.key_storage import KeyStorage
+    storage = KeyStorage(create_backend(kind, directory, latency))
+    if not use_lock:
+        storage.index.lock_path = None
+    return storage
+
+
+def worker(worker_id, directory, lock_path, use_lock, operations, latency, kind, results):
+    """Change keys of this worker at random.
+    
+    Reports the keys it ends up holding and how many operations raised.
+    """
+    storage = open_storage(directory, lock_path, latency, use_lock, kind)
+    rng = random.Random(worker_id)
+    held = []
+    counter = 0
+    errors = 0
+    
+    for _ in range(operations):
+        action = rng.random()
+        if action < 0.6 or not held:
+            name = f"w{worker_id}-k{counter}"
+            counter += 1
+            try:
+                if storage.add_key(name, name):
+                    held.append(name)
+            except Exception:
+                errors += 1
+        elif action < 0.8:
+            name = held.pop(rng.randrange(len(held)))
+            new_name = f"w{worker_id}-k{counter}"
+            counter += 1
+            try:
+                renamed = storage.rename_key(name, new_name)
+            except Exception:
+                errors += 1
+                renamed = False
+            held.append(new_name if renamed else name)
+        else:
+            name = held.pop(rng.randrange(len(held)))
+            try:
+                storage.delete_key(name)
+            except Exception:
+                errors += 1
+    
+    results.put((held, errors))
+
+
+def run(processes, operations, latency, use_lock, kind="directory"):
+    """Run the workers and check the index they leave behind.
+    
+    Returns:
+        bool: True if the index matches the keys the workers hold.
+    """
+    directory = tempfile.mkdtemp(prefix="index-stress-")
+    lock_path = os.path.join(directory, "index.lock")
+    store = os.path.join(directory, "secrets")
+    os.makedirs(store)
+    open_storage(store, lock_path, 0.0, use_lock, kind)
+    
+    results = multiprocessing.Queue()
+    started = time.perf_counter()
+    workers = [
+        multiprocessing.Process(target=worker, args=(i, store, lock_path, use_lock, operations, latency, kind, results))
+        for i in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    expected = set()
+    errors = 0
+    for _ in workers:
+        held, worker_errors = results.get()
+        expected.update(held)
+        errors += worker_errors
+    for process in workers:
+        process.join()
+    elapsed = time.perf_counter() - started
+    
+    storage = open_storage(store, lock_path, 0.0, use_lock, kind)
+    listed = set(storage.get_all_keys())
+    lost = expected - listed
+    stray = listed - expected
+    missing_values = [name for name in listed if storage.get_key(name) is None]
+    
+    print(f"{processes} processes x {operations} operations in {elapsed:.2f} s "
+          f"({kind} backend, {'with' if use_lock else 'without'} the index lock)")
+    print(f"  keys held: {len(expected)}  listed: {len(listed)}  lost: {len(lost)}  "
+          f"stray: {len(stray)}  without value: {len(missing_values)}  failed operations: {errors}")
+    return not lost and not stray and not missing_values and not errors
+
+
+def main():
+    """Run the stress test."""
+    parser = argparse.ArgumentParser(description="Multi-process key index stress test")
+    parser.add_argument("--processes", type=int, default=8, help="Concurrent processes")
+    parser.add_argument("--operations", type=int, default=200, help="Operations per process")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Simulated backend latency per call, in ms")
+    parser.add_argument("--backend", choices=["directory", "vault", "vault_log"], default="directory",
+                        help="Shared store: one file per secret, or a vault file")
+    parser.add_argument("--no-lock", action="store_true",
+                        help="Write without the index lock, to show lost updates")
+    args = parser.parse_args()
+    
+    ok = run(args.processes, args.operations, args.latency / 1000, not args.no_lock, args.backend)
+    print("OK" if ok else "FAILED: the index does not match the keys written")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for key storage, the main window, application startup and the CLI.
+
+All benchmarks run against an in-memory keyring (fake_keyring.py) whose
+calls can be slowed down to simulate a real backend. Results are written
+as JSON so runs can be compared:
+
+    python benchmarks/run_benchmarks.py --output before.json
+    python benchmarks/run_benchmarks.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+import fake_keyring
+from startup_probe import RESULT_PREFIX
+import cli_probe
+
+SERVICE_NAME = "APIKeyManagerBenchmark"
+
+def measure(func, repeat):
+    """Call func repeat times and return the duration of each call in ms."""
+    durations = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def summarize(name, size, durations, **extra):
+    """Build a result entry from a list of durations."""
+    result = {
+        "name": name,
+        "size": size,
+        "runs": len(durations),
+        "mean_ms": statistics.fmean(durations),
+        "median_ms": statistics.median(durations),
+        "min_ms": min(durations),
+        "max_ms": max(durations),
+    }
+    result.update(extra)
+    return result
+
+
+def make_storage(size, latency):
+    """Create a KeyStorage on a fresh fake keyring holding size keys."""
+    from core.backends import KeyringBackend
+    from core.config import config
+    from core.key_storage import KeyStorage
+    
+    backend = fake_keyring.install()
+    # A fresh keyring needs a fresh lock file, whose generation matches it
+    config.set("storage", "index_lock_path", os.path.join(tempfile.mkdtemp(), "index.lock"))
+    storage = KeyStorage(KeyringBackend(SERVICE_NAME))
+    storage.add_many((f"bench-key-{i}", "secret") for i in range(size))
+    storage.invalidate_index()
+    backend.latency = latency
+    backend.calls = 0
+    return storage, backend
+
+
+def bench_storage(sizes, latency, repeat):
+    """Benchmark KeyStorage.add_key, update_key, key_exists and delete_key, and loading the index."""
+    results = []
+    for size in sizes:
+        storage, backend = make_storage(size, latency)
+        # Load the index once so every operation below sees a warm cache
+        storage.get_all_keys()
+        
+        operations = [
+            ("storage.add_key", lambda i: storage.add_key(f"new-key-{i}", "secret")),
+            ("storage.update_key", lambda i: storage.update_key(f"new-key-{i}", "rotated")),
+            ("storage.key_exists", lambda i: storage.key_exists(f"bench-key-{i}")),
+            ("storage.delete_key", lambda i: storage.delete_key(f"new-key-{i}")),
+            ("index.load", lambda i: storage.index.load()),
+        ]
+        for name, func in operations:
+            backend.calls = 0
+            durations = measure(func, repeat)
+            results.append(summarize(name, size, durations, backend_calls_per_op=backend.calls / repeat))
+            print(f"{name:<24} {size:>7} keys  {statistics.median(durations):9.3f} ms")
+    return results
+
+
+def bench_ui(sizes, latency, repeat):
+    """Benchmark MainWindow.populate_key_list and filter_keys offscreen."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    
+    os.chdir(APP_DIR)
+    from ui.main_window import MainWindow
+    
+    results = []
+    for size in sizes:
+        storage, backend = make_storage(size, latency)
+        window = MainWindow()
+        window.key_storage = storage
+        window.storage.key_storage = storage
+        names = storage.get_all_keys()
+        
+        durations = measure(lambda i: window.populate_key_list(names), repeat)
+        results.append(summarize("ui.load_keys", size, durations))
+        print(f"{'ui.load_keys':<24} {size:>7} keys  {statistics.median(durations):9.3f} ms")
+        
+        # Simulate typing a query one character at a time, then clearing it
+        queries = ["b", "be", "ben", "bench-key-1", "bench-key-12", ""]
+        durations = measure(lambda i: window.filter_keys(queries[i % len(queries)]), repeat * len(queries))
+        results.append(summarize("ui.filter_keys", size, durations))
+        print(f"{'ui.filter_keys':<24} {size:>7} keys  {statistics.median(durations):9.3f} ms")
+        
+        window.storage.wait_for_done()
+        window.deleteLater()
+        app.processEvents()
+    return results
+
+
+def bench_startup(sizes, latency, repeat):
+    """Benchmark cold startup of main.main in a fresh interpreter."""
+    probe = os.path.join(BENCH_DIR, "startup_probe.py")
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    
+    results = []
+    for size in sizes:
+        runs = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, probe, str(size), str(latency * 1000)],
+                capture_output=True, text=True, env=env, check=True
+            ).stdout
+            wall_ms = (time.perf_counter() - start) * 1000
+            line = [l for l in output.splitlines() if l.startswith(RESULT_PREFIX)][-1]
+            timings = json.loads(line[len(RESULT_PREFIX):])
+            timings["process_ms"] = wall_ms
+            runs.append(timings)
+        
+        for metric in ("window_shown_ms", "keys_loaded_ms", "process_ms"):
+            durations = [run[metric] for run in runs if metric in run]
+            if durations:
+                results.append(summarize(f"startup.{metric[:-3]}", size, durations))
+                print(f"{'startup.' + metric[:-3]:<24} {size:>7} keys  {statistics.median(durations):9.3f} ms")
+    return results
+
+
+def bench_cli(sizes, latency, repeat):
+    """Benchmark cold start of the command line interface in a fresh interpreter."""
+    probe = os.path.join(BENCH_DIR, "cli_probe.py")
+    
+    results = []
+    for size in sizes:
+        runs = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, probe, str(size), str(latency * 1000)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            wall_ms = (time.perf_counter() - start) * 1000
+            line = [l for l in output.splitlines() if l.startswith(cli_probe.RESULT_PREFIX)][-1]
+            timings = json.loads(line[len(cli_probe.RESULT_PREFIX):])
+            timings["process_ms"] = wall_ms
+            runs.append(timings)
+        
+        gui_modules = sorted({module for run in runs for module in run["gui_modules"]})
+        if gui_modules:
+            print(f"WARNING: the CLI imported GUI modules: {', '.join(gui_modules)}")
+        for metric in ("interpreter_ms", "import_ms", "command_ms", "process_ms"):
+            durations = [run[metric] for run in runs]
+            results.append(summarize(f"cli.{metric[:-3]}", size, durations, gui_modules=gui_modules))
+            print(f"{'cli.' + metric[:-3]:<24} {size:>7} keys  {statistics.median(durations):9.3f} ms")
+    return results
+
+
+def compare(results, previous_path):
+    """Print the change in median time against a previous results file."""
+    with open(previous_path, "r") as f:
+        previous = json.load(f)
+    baseline = {(r["name"], r["size"]): r["median_ms"] for r in previous["results"]}
+    
+    print(f"\nCompared with {previous_path} (median):")
+    for result in results:
+        before = baseline.get((result["name"], result["size"]))
+        if before:
+            ratio = result["median_ms"] / before if before else float("inf")
+            print(f"  {result['name']:<24} {result['size']:>7} keys  "
+                  f"{before:9.3f} -> {result['median_ms']:9.3f} ms  ({ratio:.2f}x)")
+
+
+def main():
+    """Run the selected benchmarks and write the results."""
+    parser = argparse.ArgumentParser(description="API Key Manager benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Numbers of stored keys to benchmark with")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Simulated latency of every keyring call")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Runs per storage and UI benchmark")
+    parser.add_argument("--startup-repeat", type=int, default=3,
+                        help="Runs per startup and CLI benchmark")
+    parser.add_argument("--only", choices=["storage", "ui", "startup", "cli"], nargs="+",
+                        default=["storage", "ui", "startup", "cli"], help="Benchmark groups to run")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="File to write the JSON results to")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+    
+    latency = args.latency_ms / 1000
+    output = os.path.abspath(args.output)
+    results = []
+    if "storage" in args.only:
+        results += bench_storage(args.sizes, latency, args.repeat)
+    if "ui" in args.only:
+        results += bench_ui(args.sizes, latency, args.repeat)
+    if "startup" in args.only:
+        results += bench_startup(args.sizes, latency, args.startup_repeat)
+    if "cli" in args.only:
+        results += bench_cli(args.sizes, latency, args.startup_repeat)
+    
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_ms": args.latency_ms,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+    
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Check that typo-tolerant search ranks the intended key first.
+
+Each case is a mistyped query and the prefix of the names it should find.
+The names are those of a typical store, mixed with enough generated names
+that the trigram index has to narrow down its candidates.
+    
+    python benchmarks/search_quality.py
+    python benchmarks/search_quality.py --filler 20000
+"""
+
+import argparse
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+
+from core.search import KeySearch
+
+NAMES = [
+    "openai-prod-eu", "openai-staging-us", "openai-dev", "stripe-prod", "stripe-staging",
+    "stripe-test", "anthropic-prod", "aws-access-key", "aws-secret-key", "github-token",
+    "slack-webhook", "sendgrid-api", "staging-db-password", "twilio-sid", "sentry-dsn",
+    "sts-role", "postgres-prod", "mapbox-token", "stytch-key",
+]
+
+# (query, prefix of the name expected first)
+CASES = [
+    ("opnai", "openai-"),         # dropped letter
+    ("opeani", "openai-"),        # swapped letters
+    ("stirpe", "stripe-"),
+    ("githbu", "github-"),
+    ("sentyr", "sentry-"),
+    ("antrhopic", "anthropic-"),
+    ("twlio", "twilio-"),
+    ("opanai-prod", "openai-prod"),  # wrong letter
+    ("slak", "slack-"),
+]
+
+
+def run(filler):
+    """Rank every case and report the ones whose first result is wrong.
+    
+    Returns:
+        bool: True if every case ranks the expected name first.
+    """
+    search = KeySearch(NAMES + [f"bench-key-{i}" for i in range(filler)])
+    ok = True
+    for query, expected in CASES:
+        ranked = search.rank(query)
+        passed = bool(ranked) and ranked[0].startswith(expected)
+        ok = ok and passed
+        print(f"{'ok' if passed else 'MISS':<5} {query:<12} -> {', '.join(ranked[:3]) or '(nothing)'}")
+    return ok
+
+
+def main():
+    """Run the check."""
+    parser = argparse.ArgumentParser(description="Typo-tolerant search check")
+    parser.add_argument("--filler", type=int, default=2000, help="Generated names added to the store")
+    args = parser.parse_args()
+    
+    ok = run(args.filler)
+    print("OK" if ok else "FAILED: a typo did not rank the intended key first")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
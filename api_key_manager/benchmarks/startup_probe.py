@@ -0,0 +1,73 @@
+"""
+Start the application against a fake keyring and report time to a loaded list.
+
+Run by run_benchmarks.py in a fresh interpreter. Prints a line starting
+with RESULT_PREFIX followed by a JSON object with the elapsed time until
+the window was shown and until the key list was populated, then quits.
+
+Usage: python startup_probe.py KEY_COUNT LATENCY_MS
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+started = time.perf_counter()
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, APP_DIR)
+os.chdir(APP_DIR)
+
+import fake_keyring
+
+RESULT_PREFIX = "STARTUP_PROBE "
+
+def main():
+    """Run the application until the key list has been populated."""
+    key_count = int(sys.argv[1])
+    latency = float(sys.argv[2]) / 1000
+    
+    backend = fake_keyring.install()
+    names = [f"bench-key-{i}" for i in range(key_count)]
+    backend.passwords[("APIKeyManager", "__key_index__")] = json.dumps(names)
+    for name in names:
+        backend.passwords[("APIKeyManager", name)] = "secret"
+    backend.latency = latency
+    
+    sys.argv = [sys.argv[0]]
+    import main as app_main
+    from core.config import config
+    config.set("storage", "backend", "keyring")
+    config.set("storage", "service_name", "APIKeyManager")
+    # Keep the real index lock file (and its generation) out of the run
+    config.set("storage", "index_lock_path", os.path.join(tempfile.mkdtemp(), "index.lock"))
+    
+    timings = {}
+    MainWindow = app_main.MainWindow
+    original_show = MainWindow.show
+    original_populate = MainWindow.populate_key_list
+    
+    def show(window):
+        original_show(window)
+        timings["window_shown_ms"] = (time.perf_counter() - started) * 1000
+    
+    def populate_key_list(window, keys):
+        original_populate(window, keys)
+        timings["keys_loaded_ms"] = (time.perf_counter() - started) * 1000
+        app_main.QApplication.instance().quit()
+    
+    MainWindow.show = show
+    MainWindow.populate_key_list = populate_key_list
+    
+    try:
+        app_main.main()
+    except SystemExit:
+        pass
+    
+    print(RESULT_PREFIX + json.dumps(timings))
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import platform
 import shutil
 import importlib.util
 from core.config import config
+from core import resources
 
 def ensure_pyinstaller_installed():
     """Check if PyInstaller is installed, install if not."""
@@ -44,13 +45,13 @@ def main():
     # Default platform-specific icon if configured path doesn't exist
     elif not icon_path:
         if platform.system() == "Windows":
-            default_icon = os.path.join("resources", "icons", "app_icon.ico")
+            default_icon = resources.resource_path("icons/app_icon.ico")
             if os.path.exists(default_icon):
                 abs_icon_path = os.path.abspath(default_icon)
                 icon_option = ["--icon", abs_icon_path]
                 print(f"Using default Windows icon: {abs_icon_path}")
         elif platform.system() == "Darwin":  # macOS
-            default_icon = os.path.join("resources", "icons", "app_icon.icns")
+            default_icon = resources.resource_path("icons/app_icon.icns")
             if os.path.exists(default_icon):
                 abs_icon_path = os.path.abspath(default_icon)
                 icon_option = ["--icon", abs_icon_path]
@@ -59,10 +60,13 @@ def main():
     # Determine if one-file mode should be used
     one_file_option = ["--onefile"] if build_config.get("one_file", True) else ["--onedir"]
     
+    # Icons are compiled into a module instead of shipped as loose files,
+    # so the bundle has less to unpack and nothing to look up at startup
+    resources.generate()
+    
     # Prepare data files to include
     data_files = [
         ("config.json", "."),
-        ("resources", "resources")
     ]
     
     data_options = []
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Command line interface for the API Key Manager.
+
+Runs without a display: only the storage and configuration modules are
+loaded, never Qt.
+
+    python cli.py get OPENAI_API_KEY
+    python cli.py set OPENAI_API_KEY sk-...     (or pipe the value on stdin)
+    python cli.py list --json
+    python cli.py list --tag billing --env prod
+    python cli.py rm OPENAI_API_KEY
+    python cli.py exists OPENAI_API_KEY         (exit status 0 if it exists)
+    python cli.py import keys.env
+    python cli.py export backup.akmx
+    python cli.py agent                         (serve keys to other processes)
+    python cli.py fsck --repair                 (check and repair the key index)
+
+The export passphrase is read from the API_KEY_MANAGER_EXPORT_PASSPHRASE
+environment variable, or prompted for. While a key agent is running, get,
+list and exists are answered by the agent instead of the keyring.
+"""
+
+import argparse
+import json
+import os
+import sys
+from core.config import config
+from core.key_storage import KeyStorage
+
+# Environment variable that can supply the passphrase of an encrypted export
+PASSPHRASE_ENV = "API_KEY_MANAGER_EXPORT_PASSPHRASE"
+
+# Exit status when the named key does not exist
+EXIT_NOT_FOUND = 1
+# Exit status for errors
+EXIT_ERROR = 2
+# Exit status when fsck finds problems it did not repair
+EXIT_INCONSISTENT = 1
+
+def output(args, data, text):
+    """Print a result as JSON with --json, otherwise as plain text."""
+    if args.json:
+        print(json.dumps(data))
+    elif text is not None:
+        print(text)
+
+def read_passphrase(confirm=False):
+    """Get the export passphrase from the environment or the terminal."""
+    passphrase = os.environ.get(PASSPHRASE_ENV)
+    if passphrase:
+        return passphrase
+    
+    import getpass
+    passphrase = getpass.getpass("Export passphrase: ")
+    if confirm and getpass.getpass("Repeat passphrase: ") != passphrase:
+        raise SystemExit("Passphrases do not match")
+    return passphrase
+
+def open_storage(ensure_index=True):
+    """Create the KeyStorage for the configured backend."""
+    return KeyStorage(ensure_index=ensure_index)
+
+def open_agent(args):
+    """Get a client for a running key agent, or None to use storage directly."""
+    if args.no_agent or not config.get("agent", "use_agent", True):
+        return None
+    from core.agent import find_agent
+    return find_agent()
+
+def cmd_get(args):
+    """Print the value of a key."""
+    agent = open_agent(args)
+    if agent is not None:
+        with agent:
+            value = agent.get(args.name)
+    else:
+        # A single lookup reads one index shard instead of loading the index
+        storage = open_storage(ensure_index=False)
+        value = storage.get_key(args.name) if storage.index.contains(args.name) else None
+    output(args, {"name": args.name, "value": value}, value)
+    return 0 if value is not None else EXIT_NOT_FOUND
+
+def cmd_set(args):
+    """Create a key or replace its value."""
+    value = args.value
+    if value is None:
+        # Read from stdin so the value does not end up in the shell history
+        value = sys.stdin.readline().rstrip("\r\n")
+    if not value:
+        raise ValueError("A key value is required")
+    
+    # Only the metadata options given on the command line are changed
+    metadata = {}
+    if args.tag:
+        metadata["tags"] = args.tag
+    if args.env is not None:
+        metadata["environment"] = args.env
+    if args.provider is not None:
+        metadata["provider"] = args.provider
+    
+    storage = open_storage()
+    if storage.index.is_reserved_name(args.name):
+        raise ValueError(f"'{args.name}' is reserved for the key index")
+    created = storage.add_key(args.name, value, metadata)
+    if not created:
+        storage.update_key(args.name, value)
+        if metadata:
+            storage.set_metadata(args.name, {**storage.get_metadata(args.name), **metadata})
+    output(args, {"name": args.name, "created": created}, None)
+    return 0
+
+def cmd_list(args):
+    """Print the names of all keys, or of those with the given tags, environment or provider."""
+    all_of = [("tag", tag) for tag in args.tag]
+    if args.env:
+        all_of.append(("environment", args.env))
+    if args.provider:
+        all_of.append(("provider", args.provider))
+    any_of = [("tag", tag) for tag in args.any_tag]
+    
+    # The key agent only serves names, so filtered lists come from storage
+    agent = open_agent(args) if not all_of and not any_of else None
+    if agent is not None:
+        with agent:
+            names = agent.list()
+    else:
+        names = open_storage().find_keys(all_of, any_of)
+    output(args, names, "\n".join(names) if names else None)
+    return 0
+
+def cmd_rm(args):
+    """Delete a key."""
+    deleted = open_storage().delete_key(args.name)
+    output(args, {"name": args.name, "deleted": deleted}, None)
+    if not deleted:
+        print(f"No key named '{args.name}'", file=sys.stderr)
+    return 0 if deleted else EXIT_NOT_FOUND
+
+def cmd_exists(args):
+    """Report through the exit status whether a key exists."""
+    agent = open_agent(args)
+    if agent is not None:
+        with agent:
+            exists = agent.exists(args.name)
+    else:
+        exists = open_storage(ensure_index=False).index.contains(args.name)
+    output(args, {"name": args.name, "exists": exists}, None)
+    return 0 if exists else EXIT_NOT_FOUND
+
+def cmd_import(args):
+    """Import keys from a .env, JSON lines, CSV or encrypted export file."""
+    from core import transfer
+    
+    file_format = args.format or transfer.detect_format(args.file)
+    passphrase = read_passphrase() if file_format == "encrypted" else None
+    records = transfer.read_records(args.file, file_format, passphrase)
+    
+    result = transfer.import_keys(
+        open_storage(), records, overwrite=args.overwrite, workers=args.workers
+    )
+    message = (f"Added {len(result['added'])}, updated {len(result['updated'])}, "
+               f"skipped {len(result['skipped'])} keys")
+    if result["empty"]:
+        message += f" and {len(result['empty'])} empty values ({', '.join(result['empty'])})"
+    output(args, result, message)
+    return 0
+
+def cmd_export(args):
+    """Export keys to an encrypted file."""
+    from core import transfer
+    
+    passphrase = read_passphrase(confirm=True)
+    count = transfer.export_keys(
+        open_storage(), args.file, passphrase, names=args.names or None, workers=args.workers
+    )
+    output(args, {"file": args.file, "exported": count}, f"Exported {count} keys to {args.file}")
+    return 0
+
+def cmd_agent(args):
+    """Run the key agent in the foreground."""
+    from core.agent import KeyAgent
+    agent = KeyAgent(open_storage(), socket_path=args.socket)
+    # The agent runs for a long time, so pick up edits to the configuration
+    config.start_watching()
+    agent.run()
+    return 0
+
+def cmd_fsck(args):
+    """Check that every indexed key has a value, and optionally repair the index."""
+    from core.fsck import check_index
+    
+    # Opened without creating the index, which would hide a damaged manifest
+    report = check_index(
+        open_storage(ensure_index=False), workers=args.workers, repair=args.repair, adopt_orphans=args.adopt_orphans
+    )
+    lines = [f"Checked {report['checked']} keys"]
+    for problem in ("dangling", "corrupt", "misplaced", "orphans"):
+        lines.extend(f"{problem}: {name}" for name in report[problem])
+    if report["repaired"]:
+        lines.append("Index repaired")
+    output(args, report, "\n".join(lines))
+    
+    problems = report["dangling"] or report["corrupt"] or report["misplaced"]
+    return EXIT_INCONSISTENT if problems and not report["repaired"] else 0
+
+def build_parser():
+    """Build the argument parser."""
+    workers = config.get("storage", "transfer_workers", 4)
+    parser = argparse.ArgumentParser(prog="api-key-manager-cli", description="Manage stored API keys")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--no-agent", action="store_true",
+                        help="Read from storage even if a key agent is running")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    get_parser = commands.add_parser("get", help="Print the value of a key")
+    get_parser.add_argument("name")
+    get_parser.set_defaults(func=cmd_get)
+    
+    set_parser = commands.add_parser("set", help="Create a key or replace its value")
+    set_parser.add_argument("name")
+    set_parser.add_argument("value", nargs="?", help="Key value (default: read one line from stdin)")
+    set_parser.add_argument("--tag", action="append", default=[], help="Tag of the key (repeatable)")
+    set_parser.add_argument("--env", help="Environment of the key (e.g. prod)")
+    set_parser.add_argument("--provider", help="Provider of the key (e.g. OpenAI)")
+    set_parser.set_defaults(func=cmd_set)
+    
+    list_parser = commands.add_parser("list", help="List key names")
+    list_parser.add_argument("--tag", action="append", default=[],
+                             help="Only keys with this tag (repeatable; all must match)")
+    list_parser.add_argument("--any-tag", action="append", default=[],
+                             help="Only keys with at least one of these tags (repeatable)")
+    list_parser.add_argument("--env", help="Only keys of this environment")
+    list_parser.add_argument("--provider", help="Only keys of this provider")
+    list_parser.set_defaults(func=cmd_list)
+    
+    rm_parser = commands.add_parser("rm", help="Delete a key")
+    rm_parser.add_argument("name")
+    rm_parser.set_defaults(func=cmd_rm)
+    
+    exists_parser = commands.add_parser("exists", help="Exit with status 0 if a key exists, 1 if not")
+    exists_parser.add_argument("name")
+    exists_parser.set_defaults(func=cmd_exists)
+    
+    import_parser = commands.add_parser("import", help="Import keys from a file")
+    import_parser.add_argument("file", help="File to import (.env, .jsonl, .csv or an encrypted export)")
+    import_parser.add_argument("--format", choices=["env", "jsonl", "csv", "encrypted"],
+                               help="File format (default: detected from the file)")
+    import_parser.add_argument("--overwrite", action="store_true",
+                               help="Replace the values of keys that already exist")
+    import_parser.add_argument("--workers", type=int, default=workers,
+                               help="Parallel backend writes")
+    import_parser.set_defaults(func=cmd_import)
+    
+    export_parser = commands.add_parser("export", help="Export keys to an encrypted file")
+    export_parser.add_argument("file", help="File to write")
+    export_parser.add_argument("names", nargs="*", help="Keys to export (default: all)")
+    export_parser.add_argument("--workers", type=int, default=workers,
+                               help="Parallel backend reads")
+    export_parser.set_defaults(func=cmd_export)
+    
+    agent_parser = commands.add_parser("agent", help="Serve keys to other processes over a Unix socket")
+    agent_parser.add_argument("--socket", help="Socket path (default: from the configuration)")
+    agent_parser.set_defaults(func=cmd_agent)
+    
+    fsck_parser = commands.add_parser("fsck", help="Check the key index against the stored keys")
+    fsck_parser.add_argument("--repair", action="store_true",
+                             help="Rewrite the index without dangling, damaged or misplaced entries")
+    fsck_parser.add_argument("--adopt-orphans", action="store_true",
+                             help="With --repair, add stored keys missing from the index to it")
+    fsck_parser.add_argument("--workers", type=int, default=config.get("storage", "fsck_workers", 16),
+                             help="Parallel backend reads")
+    fsck_parser.set_defaults(func=cmd_fsck)
+    return parser
+
+def main(argv=None):
+    """Main entry point for the command line interface."""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+if __name__ == "__main__":
+    sys.exit(main())
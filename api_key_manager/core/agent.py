@@ -0,0 +1,337 @@
+"""
+Key agent: a long-lived process that serves stored keys over a Unix socket.
+
+Like ssh-agent, the agent keeps KeyStorage open so scripts and CI jobs
+avoid a keyring unlock and a D-Bus round-trip on every lookup. Values are
+kept in a size- and time-bounded SecretCache. KeyStorage instances in other
+processes (the GUI and the CLI) tell the agent which keys they changed, so
+it never serves a stale value.
+
+Protocol: one JSON object per line in each direction.
+    {"op": "get", "name": "..."}      -> {"ok": true, "value": "..." or null}
+    {"op": "exists", "name": "..."}   -> {"ok": true, "exists": true}
+    {"op": "list"}                    -> {"ok": true, "names": [...]}
+    {"op": "invalidate", "names": [...] or null}  -> {"ok": true}
+    {"op": "stats"}                   -> {"ok": true, "stats": {...}}
+    {"op": "ping"}                    -> {"ok": true}
+Failures are answered with {"ok": false, "error": "..."}.
+"""
+
+import json
+import os
+import socket
+import sys
+from core.config import config
+from core.value_cache import SecretCache
+
+# Environment variable that overrides the configured socket path
+SOCKET_ENV = "API_KEY_MANAGER_AGENT_SOCK"
+
+class AgentError(Exception):
+    """Raised when the agent cannot be reached or rejects a request."""
+
+
+def default_socket_path():
+    """Get the agent socket path from the environment or the configuration."""
+    path = os.environ.get(SOCKET_ENV) or config.get("agent", "socket_path", "")
+    if path:
+        return os.path.expanduser(path)
+    
+    # Prefer the per-user runtime directory, which is private and in memory
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    base = runtime_dir if runtime_dir else os.path.join(os.path.expanduser("~"), ".api_key_manager")
+    return os.path.join(base, "api-key-manager-agent.sock")
+
+
+class KeyAgent:
+    """Serve get/exists/list requests for a KeyStorage over a Unix socket."""
+    
+    def __init__(self, storage, socket_path=None, cache_size=None, cache_ttl=None):
+        """Initialize the agent.
+        
+        Args:
+            storage (KeyStorage): Storage to serve keys from.
+            socket_path (str, optional): Socket to listen on (default: default_socket_path()).
+            cache_size (int, optional): Maximum number of cached values.
+            cache_ttl (float, optional): Seconds a cached value stays valid.
+        """
+        agent_config = config.get("agent", default={})
+        self.storage = storage
+        # The agent only reads, so it has nothing to tell other agents
+        self.storage.change_listeners.clear()
+        self.socket_path = socket_path or default_socket_path()
+        # Replaces the storage's own value cache, with the agent's limits
+        self.cache = SecretCache(
+            agent_config.get("cache_size", 256) if cache_size is None else cache_size,
+            agent_config.get("cache_ttl", 300) if cache_ttl is None else cache_ttl,
+        )
+        self.storage.value_cache = self.cache
+        self._server = None
+        self._executor = None
+        config.subscribe("agent", self.apply_config)
+    
+    def apply_config(self, agent_config):
+        """Apply changed cache limits from the agent configuration."""
+        self.cache.configure(agent_config.get("cache_size", 256), agent_config.get("cache_ttl", 300))
+    
+    def run(self):
+        """Serve requests until the process is interrupted or terminated."""
+        import asyncio
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+    
+    async def serve(self):
+        """Listen on the socket and serve requests until stopped."""
+        import asyncio
+        import signal
+        from concurrent.futures import ThreadPoolExecutor
+        
+        if not hasattr(asyncio, "start_unix_server"):
+            raise AgentError("The key agent needs Unix domain sockets, which this platform lacks")
+        
+        self._prepare_socket_path()
+        # KeyStorage is not thread-safe, so all storage calls share one thread
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        old_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        finally:
+            os.umask(old_umask)
+        
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        print(f"Key agent listening on {self.socket_path}", file=sys.stderr)
+        print(f"export {SOCKET_ENV}={self.socket_path}")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._executor.shutdown(wait=False)
+            self.cache.lock()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+    
+    def stop(self):
+        """Stop serving (call from the event loop)."""
+        if self._server is not None:
+            self._server.close()
+    
+    def _prepare_socket_path(self):
+        """Create the socket directory and remove a socket left by a dead agent."""
+        directory = os.path.dirname(self.socket_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        
+        if os.path.exists(self.socket_path):
+            try:
+                with AgentClient(self.socket_path, timeout=0.5) as client:
+                    client.ping()
+            except AgentError:
+                os.unlink(self.socket_path)
+            else:
+                raise AgentError(f"Another key agent is already listening on {self.socket_path}")
+    
+    async def handle_client(self, reader, writer):
+        """Answer requests from one connection until it is closed."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.dispatch(json.loads(line))
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def dispatch(self, request):
+        """Handle one request and return the response."""
+        op = request.get("op")
+        
+        if op == "get":
+            name = request["name"]
+            # Cache hits are answered without leaving the event loop
+            value = self.cache.get(name)
+            if value is None:
+                value = await self._call(self._load_value, name)
+            return {"ok": True, "value": value}
+        
+        if op == "exists":
+            return {"ok": True, "exists": await self._call(self.storage.key_exists, request["name"])}
+        
+        if op == "list":
+            return {"ok": True, "names": await self._call(self.storage.get_all_keys)}
+        
+        if op == "invalidate":
+            # On the storage thread, after any load that may still return an old value
+            await self._call(self._invalidate, request.get("names"))
+            return {"ok": True}
+        
+        if op == "stats":
+            return {"ok": True, "stats": self.cache.stats()}
+        
+        if op == "ping":
+            return {"ok": True}
+        
+        return {"ok": False, "error": f"Unknown operation '{op}'"}
+    
+    def _invalidate(self, names):
+        """Forget cached values and the index (runs on the storage thread)."""
+        self.cache.invalidate(names)
+        self.storage.invalidate_index()
+    
+    def _load_value(self, name):
+        """Read a value through the storage cache (runs on the storage thread)."""
+        if not self.storage.key_exists(name):
+            return None
+        return self.storage.get_key(name)
+    
+    async def _call(self, func, *args):
+        """Run a storage call on the storage thread."""
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+
+class AgentClient:
+    """Synchronous client for a running key agent.
+    
+    The connection is opened on first use and kept for later requests.
+    
+    Usage:
+        with AgentClient() as agent:
+            value = agent.get("OPENAI_API_KEY")
+    """
+    
+    def __init__(self, socket_path=None, timeout=2.0):
+        """Initialize the client.
+        
+        Args:
+            socket_path (str, optional): Agent socket (default: default_socket_path()).
+            timeout (float): Seconds to wait for the agent on each request.
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def connect(self):
+        """Connect to the agent."""
+        if self._sock is not None:
+            return
+        if not hasattr(socket, "AF_UNIX"):
+            raise AgentError("The key agent needs Unix domain sockets, which this platform lacks")
+        
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise AgentError(f"Cannot connect to the key agent at {self.socket_path}: {e}")
+        self._sock = sock
+        self._file = sock.makefile("rb")
+    
+    def close(self):
+        """Close the connection."""
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            self._sock = None
+            self._file = None
+    
+    def request(self, op, **fields):
+        """Send a request and return the response.
+        
+        Raises:
+            AgentError: If the agent cannot be reached or reports an error.
+        """
+        self.connect()
+        fields["op"] = op
+        try:
+            self._sock.sendall(json.dumps(fields).encode("utf-8") + b"\n")
+            line = self._file.readline()
+        except OSError as e:
+            self.close()
+            raise AgentError(f"Key agent connection failed: {e}")
+        if not line:
+            self.close()
+            raise AgentError("Key agent closed the connection")
+        
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise AgentError(response.get("error", "Unknown agent error"))
+        return response
+    
+    def get(self, name):
+        """Get a key value, or None if the key does not exist."""
+        return self.request("get", name=name)["value"]
+    
+    def exists(self, name):
+        """Check if a key exists."""
+        return self.request("exists", name=name)["exists"]
+    
+    def list(self):
+        """Get all key names."""
+        return self.request("list")["names"]
+    
+    def invalidate(self, names=None):
+        """Tell the agent that keys changed (None: anything may have changed)."""
+        self.request("invalidate", names=names)
+    
+    def stats(self):
+        """Get the agent's cache counters."""
+        return self.request("stats")["stats"]
+    
+    def ping(self):
+        """Check that the agent is answering."""
+        self.request("ping")
+
+
+def find_agent(socket_path=None, timeout=2.0):
+    """Get a connected client for a running agent, or None if none is running."""
+    socket_path = socket_path or default_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+    
+    client = AgentClient(socket_path, timeout)
+    try:
+        client.connect()
+    except AgentError:
+        return None
+    return client
+
+
+def notify_agent(names):
+    """Tell a running agent that the given keys changed.
+    
+    Registered as a KeyStorage change listener. Does nothing if no agent
+    is running; an unreachable agent is not an error for the caller.
+    """
+    client = find_agent(timeout=0.5)
+    if client is None:
+        return
+    try:
+        client.invalidate(names)
+    except AgentError as e:
+        print(f"Could not notify the key agent: {e}", file=sys.stderr)
+    finally:
+        client.close()
@@ -0,0 +1,287 @@
+"""
+Storage backends that hold the secrets managed by KeyStorage.
+"""
+
+import base64
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+# Environment variable that can supply the vault master secret directly
+# (useful on headless machines without a keyring daemon)
+MASTER_KEY_ENV = "API_KEY_MANAGER_MASTER_KEY"
+
+class StorageBackend:
+    """Interface for a secret store used by KeyStorage.
+    
+    Secrets are addressed by name and stored as strings. Backends that
+    write to disk may defer writes inside a batch() block so a group of
+    changes costs a single write.
+    """
+    
+    # Whether get_secret may be called from several threads at once to hide
+    # per-call latency (in-process backends gain nothing from it)
+    concurrent_reads = False
+    # Whether set_secret may likewise be called from several threads at once
+    concurrent_writes = False
+    
+    def get_secret(self, name):
+        """Get a secret by name, or None if it does not exist."""
+        raise NotImplementedError
+    
+    def set_secret(self, name, value):
+        """Create or replace a secret."""
+        raise NotImplementedError
+    
+    def delete_secret(self, name):
+        """Delete a secret. Deleting a missing secret is not an error."""
+        raise NotImplementedError
+    
+    def refresh(self):
+        """Re-read secrets another process may have written.
+        
+        Called by the key index before it re-reads itself. Backends that
+        keep no copy of the secrets in memory have nothing to do.
+        """
+    
+    @contextmanager
+    def batch(self):
+        """Group several changes into one write where the backend supports it."""
+        yield self
+
+
+class KeyringBackend(StorageBackend):
+    """Store each secret as its own entry in the system keyring."""
+    
+    concurrent_reads = True
+    concurrent_writes = True
+    
+    def __init__(self, service_name):
+        """Initialize the keyring backend.
+        
+        Args:
+            service_name (str): Keyring service name for all entries.
+        """
+        # Imported here: loading keyring takes longer than everything else
+        # in the storage layer, and only this backend always needs it
+        import keyring
+        self.keyring = keyring
+        self.service_name = service_name
+    
+    def get_secret(self, name):
+        """Get a secret from the keyring."""
+        return self.keyring.get_password(self.service_name, name)
+    
+    def set_secret(self, name, value):
+        """Store a secret in the keyring."""
+        self.keyring.set_password(self.service_name, name, value)
+    
+    def delete_secret(self, name):
+        """Delete a secret from the keyring."""
+        from keyring.errors import PasswordDeleteError
+        try:
+            self.keyring.delete_password(self.service_name, name)
+        except PasswordDeleteError:
+            pass
+
+
+class VaultBackend(StorageBackend):
+    """Store all secrets in a single file encrypted with AES-GCM.
+    
+    The whole vault is read once when the backend is opened and written
+    back in one atomic replace, so any number of keys costs one file read
+    at startup and one file write per change (or per batch). The 256-bit
+    encryption key is the only secret kept in the keyring.
+    
+    File layout: MAGIC | 12-byte nonce | AES-GCM(JSON object of secrets),
+    with MAGIC used as associated data.
+    """
+    
+    MAGIC = b"AKMV\x01"
+    NONCE_SIZE = 12
+    
+    def __init__(self, path, master_key):
+        """Initialize the vault backend.
+        
+        Args:
+            path (str): Path of the vault file (created on first write).
+            master_key (bytes): 32-byte encryption key.
+        """
+        self.path = path
+        self._cipher = make_cipher(master_key)
+        self._secrets = {}
+        # Changes not yet written: name -> value, or None for a deletion
+        self._pending = {}
+        self._batch_depth = 0
+        self._dirty = False
+        self.load()
+    
+    def load(self):
+        """Read and decrypt the vault file."""
+        if not os.path.exists(self.path):
+            self._secrets = {}
+            return
+        
+        with open(self.path, "rb") as f:
+            data = f.read()
+        
+        if not data.startswith(self.MAGIC):
+            raise ValueError(f"Not a key vault file: {self.path}")
+        
+        header_size = len(self.MAGIC)
+        nonce = data[header_size:header_size + self.NONCE_SIZE]
+        ciphertext = data[header_size + self.NONCE_SIZE:]
+        plaintext = self._cipher.decrypt(nonce, ciphertext, self.MAGIC)
+        self._secrets = json.loads(plaintext.decode("utf-8"))
+    
+    def save(self):
+        """Encrypt and atomically write the vault file."""
+        plaintext = json.dumps(self._secrets).encode("utf-8")
+        nonce = os.urandom(self.NONCE_SIZE)
+        ciphertext = self._cipher.encrypt(nonce, plaintext, self.MAGIC)
+        write_file_atomic(self.path, self.MAGIC + nonce + ciphertext)
+        self._pending = {}
+        self._dirty = False
+    
+    def refresh(self):
+        """Re-read the vault file, keeping the changes not written yet."""
+        self.load()
+        for name, value in self._pending.items():
+            if value is None:
+                self._secrets.pop(name, None)
+            else:
+                self._secrets[name] = value
+    
+    def get_secret(self, name):
+        """Get a secret from the vault."""
+        return self._secrets.get(name)
+    
+    def set_secret(self, name, value):
+        """Store a secret in the vault."""
+        self._secrets[name] = value
+        self._pending[name] = value
+        self._changed()
+    
+    def delete_secret(self, name):
+        """Delete a secret from the vault."""
+        if self._secrets.pop(name, None) is not None:
+            self._pending[name] = None
+            self._changed()
+    
+    def list_names(self):
+        """Get the names of all secrets stored in the vault."""
+        return list(self._secrets)
+    
+    @contextmanager
+    def batch(self):
+        """Defer writing the vault file until the outermost batch ends."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self.save()
+    
+    def _changed(self):
+        """Persist a change now, or mark it for the end of the batch."""
+        self._dirty = True
+        if self._batch_depth == 0:
+            self.save()
+
+
+def make_cipher(master_key, feature="The vault storage backend"):
+    """Create an AES-GCM cipher, importing cryptography only when needed.
+    
+    Args:
+        master_key (bytes): AES key.
+        feature (str): What needs the cipher, named in the error raised
+            when cryptography is not installed.
+    """
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise RuntimeError(
+            f"{feature} requires the 'cryptography' package "
+            "(pip install cryptography)"
+        )
+    return AESGCM(master_key)
+
+
+def write_file_atomic(path, data):
+    """Write bytes to a file via a temporary file and rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def get_master_key(service_name, entry_name):
+    """Get the vault master key, creating one in the keyring on first use.
+    
+    The MASTER_KEY_ENV environment variable takes precedence over the
+    keyring so the vault can be used where no keyring is available.
+    
+    Returns:
+        bytes: 32-byte key.
+    """
+    encoded = os.environ.get(MASTER_KEY_ENV)
+    if not encoded:
+        import keyring
+        encoded = keyring.get_password(service_name, entry_name)
+        if not encoded:
+            import secrets
+            encoded = base64.b64encode(secrets.token_bytes(32)).decode("ascii")
+            keyring.set_password(service_name, entry_name, encoded)
+    
+    master_key = base64.b64decode(encoded)
+    if len(master_key) != 32:
+        raise ValueError("Vault master key must be 32 bytes (base64 encoded)")
+    return master_key
+
+
+def default_vault_path(service_name, extension=".vault"):
+    """Get the default vault file location for a service."""
+    return str(Path.home() / ".api_key_manager" / f"{service_name}{extension}")
+
+
+def create_backend(storage_config):
+    """Create the storage backend selected in the storage configuration.
+    
+    Args:
+        storage_config (dict): The "storage" configuration section.
+    
+    Returns:
+        StorageBackend: The configured backend.
+    """
+    service_name = storage_config.get("service_name", "APIKeyManager")
+    backend_name = storage_config.get("backend", "keyring")
+    
+    if backend_name == "keyring":
+        return KeyringBackend(service_name)
+    
+    if backend_name == "vault":
+        path = storage_config.get("vault_path") or default_vault_path(service_name)
+        master_key = get_master_key(
+            service_name, storage_config.get("vault_master_key", "__vault_master_key__")
+        )
+        return VaultBackend(os.path.expanduser(path), master_key)
+    
+    if backend_name == "vault_log":
+        from core.vault_log import LogVaultBackend
+        path = storage_config.get("vault_path") or default_vault_path(service_name, ".vlog")
+        master_key = get_master_key(
+            service_name, storage_config.get("vault_master_key", "__vault_master_key__")
+        )
+        return LogVaultBackend(
+            os.path.expanduser(path), master_key,
+            compact_threshold=storage_config.get("vault_compact_threshold", 0.5)
+        )
+    
+    raise ValueError(f"Unknown storage backend: {backend_name}")
@@ -3,14 +3,23 @@ Configuration management for API Key Manager.
 """
 
 import os
+import sys
 import json
+import copy
+import atexit
+import weakref
+import threading
 from pathlib import Path
+from types import MappingProxyType
 
 # Default configuration
 DEFAULT_CONFIG = {
     # Application settings
     "app_name": "API Key Manager",
     "organization": "APIKeyManager",
+    # Seconds between checks for changes to this file where it is not
+    # watched by the file system (e.g. in the key agent)
+    "config_poll_interval": 2,
     
     # UI settings
     "window": {
@@ -19,6 +28,8 @@ DEFAULT_CONFIG = {
         "min_height": 400,
         "start_maximized": False,
         "dark_mode": False,
+        "search_debounce_ms": 150,
+        "search_fuzzy_limit": 20,
     },
     
     # Build settings
@@ -32,11 +43,110 @@ DEFAULT_CONFIG = {
     "storage": {
         "service_name": "APIKeyManager",
         "index_key": "__key_index__",
+        "index_cache_ttl": 30,
+        # The key index is split over this many keyring entries (an existing
+        # index keeps its shard count) and read with up to index_read_workers
+        # parallel calls
+        "index_shards": 8,
+        "index_read_workers": 4,
+        # Lock file that lets several processes change the index safely
+        # (default: ~/.api_key_manager/<service_name>.<index_key>.lock)
+        "index_lock_path": "",
+        # Parallel backend calls used by bulk import and export
+        "transfer_workers": 4,
+        # Parallel backend reads used by the fsck command
+        "fsck_workers": 16,
+        # Recently used key values kept in memory (0 = off) and for how many
+        # seconds; changes made elsewhere are seen once a value expires
+        "value_cache_size": 64,
+        "value_cache_ttl": 30,
+        # "keyring" stores each key in the system keyring; "vault" stores all
+        # keys in one encrypted file whose master key is kept in the keyring;
+        # "vault_log" is an append-only encrypted file for very large vaults
+        "backend": "keyring",
+        "vault_path": "",
+        "vault_master_key": "__vault_master_key__",
+        "vault_compact_threshold": 0.5,
+    },
+    
+    # Key agent settings
+    "agent": {
+        # Unix socket of the agent (default: in $XDG_RUNTIME_DIR or ~/.api_key_manager)
+        "socket_path": "",
+        "cache_size": 256,
+        "cache_ttl": 300,
+        # Tell a running agent about changes made by the GUI and CLI
+        "notify": True,
+        # Let the CLI answer get, list and exists through a running agent
+        "use_agent": True,
+    },
+    
+    # Instrumentation settings
+    "metrics": {
+        # Record operation counts and latencies (see Ctrl+Shift+D in the app)
+        "enabled": False,
+        # JSON file the metrics are written to when the application exits
+        "dump_path": "",
     }
 }
 
+def freeze(value):
+    """Make a read-only copy of a configuration value, dicts and lists included."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def validate(data, defaults, path=""):
+    """Reset values whose type does not match their default, in place.
+    
+    Unknown keys are kept as they are.
+    
+    Returns:
+        list: Dotted names of the values that were reset.
+    """
+    replaced = []
+    for key, default in defaults.items():
+        if key not in data:
+            continue
+        value = data[key]
+        if isinstance(default, dict):
+            if isinstance(value, dict):
+                replaced += validate(value, default, f"{path}{key}.")
+                continue
+        elif isinstance(default, bool):
+            if isinstance(value, bool):
+                continue
+        elif isinstance(default, (int, float)):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                continue
+        elif isinstance(value, type(default)):
+            continue
+        data[key] = copy.deepcopy(default)
+        replaced.append(f"{path}{key}")
+    return replaced
+
+
 class Config:
-    """Manage application configuration."""
+    """Manage application configuration.
+    
+    Changes are written with an atomic replace, so a crash can never leave
+    a half-written file. Callers that change settings often (such as UI
+    toggles) use schedule_save(), which coalesces a burst of changes into a
+    single write on a background timer; writes are skipped entirely when
+    the configuration matches what is already on disk.
+    
+    Values are read from an immutable, validated snapshot that is rebuilt
+    only when the configuration changes. reload_if_changed() re-reads the
+    file when its modification time or size changed (call it from a file
+    watcher, or let start_watching() poll) and calls the subscribers of
+    each section whose values changed.
+    """
+    
+    # Seconds schedule_save() waits for further changes before writing
+    SAVE_DELAY = 0.5
     
     def __init__(self, config_path=None):
         """Initialize configuration.
@@ -45,7 +155,8 @@ class Config:
             config_path (str, optional): Path to the configuration file.
                 If not provided, looks for config.json in the app directory.
         """
-        self.config_data = DEFAULT_CONFIG.copy()
+        # A deep copy, so loading a file never changes DEFAULT_CONFIG itself
+        self.config_data = copy.deepcopy(DEFAULT_CONFIG)
         
         # Determine config file path
         if config_path is None:
@@ -54,35 +165,216 @@ class Config:
         else:
             self.config_path = config_path
         
+        # Guards config_data against the background save timer
+        self._lock = threading.RLock()
+        self._save_timer = None
+        # Serialized configuration as last read from or written to disk
+        self._saved_text = None
+        # (mtime, size) of the file as last read or written
+        self._file_signature = None
+        # Section name -> callbacks (bound methods are held weakly)
+        self._subscribers = {}
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self._rebuild_snapshot()
+        
         # Load config file if it exists
         self.load_config()
     
     def load_config(self):
-        """Load configuration from file."""
-        if os.path.exists(self.config_path):
-            try:
-                with open(self.config_path, "r") as f:
-                    user_config = json.load(f)
-                
-                # Update default config with user settings (recursively)
-                self._update_config(self.config_data, user_config)
-                
-                print(f"Configuration loaded from {self.config_path}")
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"Error loading configuration: {e}")
+        """Load configuration from file.
+        
+        Returns:
+            set: Names of the sections whose values changed.
+        """
+        # A missing file is not created here, so startup never writes to
+        # disk; it is written the first time a setting is saved
+        if not os.path.exists(self.config_path):
+            return set()
+        
+        try:
+            signature = self._stat_file()
+            with open(self.config_path, "r") as f:
+                user_config = json.load(f)
+            if not isinstance(user_config, dict):
+                raise ValueError("expected a JSON object")
+        except (ValueError, IOError) as e:
+            print(f"Error loading configuration: {e}", file=sys.stderr)
+            return set()
+        
+        # Update default config with user settings (recursively)
+        data = copy.deepcopy(DEFAULT_CONFIG)
+        self._update_config(data, user_config)
+        for name in validate(data, DEFAULT_CONFIG):
+            print(f"Invalid configuration value for '{name}', using the default", file=sys.stderr)
+        
+        with self._lock:
+            old_data = self.config_data
+            self.config_data = data
+            self._saved_text = self._serialize()
+            self._file_signature = signature
+            self._rebuild_snapshot()
+        
+        print(f"Configuration loaded from {self.config_path}", file=sys.stderr)
+        return {name for name in old_data.keys() | data.keys() if old_data.get(name) != data.get(name)}
+    
+    def reload_if_changed(self):
+        """Reload the file if it changed on disk, and notify subscribers.
+        
+        Returns:
+            set: Names of the sections whose values changed.
+        """
+        if self._stat_file() == self._file_signature:
+            return set()
+        
+        changed = self.load_config()
+        for section in sorted(changed):
+            self._notify(section)
+        return changed
+    
+    def subscribe(self, section, callback):
+        """Call callback(values) with the new section when it changes on reload.
+        
+        Bound methods are held weakly, so subscribing does not keep their
+        object alive. Callbacks run on the thread that noticed the change.
+        """
+        if hasattr(callback, "__self__"):
+            ref = weakref.WeakMethod(callback)
         else:
-            # Create default config file if it doesn't exist
-            self.save_config()
+            ref = lambda: callback
+        with self._lock:
+            self._subscribers.setdefault(section, []).append(ref)
     
-    def save_config(self):
-        """Save current configuration to file."""
+    def start_watching(self, interval=None):
+        """Check the file for changes periodically on a background thread.
+        
+        Args:
+            interval (float, optional): Seconds between checks
+                (default: config_poll_interval).
+        """
+        if self._watch_thread is not None:
+            return
+        if interval is None:
+            interval = self.get("config_poll_interval", default=2)
+        
+        def watch():
+            while not self._watch_stop.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    print(f"Error reloading configuration: {e}", file=sys.stderr)
+        
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=watch, name="config-watch", daemon=True)
+        self._watch_thread.start()
+    
+    def stop_watching(self):
+        """Stop the background checks."""
+        if self._watch_thread is not None:
+            self._watch_stop.set()
+            self._watch_thread = None
+    
+    def _notify(self, section):
+        """Call the subscribers of a section with its new values."""
+        with self._lock:
+            refs = self._subscribers.get(section, [])
+            callbacks = [ref() for ref in refs]
+            # Forget subscribers whose objects no longer exist
+            refs[:] = [ref for ref, callback in zip(refs, callbacks) if callback is not None]
+        
+        values = self.get(section)
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(values)
+            except Exception as e:
+                print(f"Error applying '{section}' configuration: {e}", file=sys.stderr)
+    
+    def _stat_file(self):
+        """Get the (mtime, size) of the file, or None if it does not exist."""
         try:
-            with open(self.config_path, "w") as f:
-                json.dump(self.config_data, f, indent=2)
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _rebuild_snapshot(self):
+        """Rebuild the read-only snapshot behind get() (caller holds the lock)."""
+        snapshot = freeze(self.config_data)
+        values = {}
+        for section, section_values in snapshot.items():
+            if isinstance(section_values, MappingProxyType):
+                for key, value in section_values.items():
+                    values[(section, key)] = value
+        # Each is replaced in a single assignment, so readers need no lock
+        self.snapshot = snapshot
+        self._values = values
+    
+    def save_config(self):
+        """Save current configuration to file now, if it has changed."""
+        with self._lock:
+            self._cancel_save_timer()
+            text = self._serialize()
+            if text == self._saved_text:
+                return
             
-            print(f"Configuration saved to {self.config_path}")
-        except IOError as e:
-            print(f"Error saving configuration: {e}")
+            try:
+                self._write_atomic(text)
+                self._saved_text = text
+                # Our own write is not a change to reload
+                self._file_signature = self._stat_file()
+                print(f"Configuration saved to {self.config_path}", file=sys.stderr)
+            except OSError as e:
+                print(f"Error saving configuration: {e}", file=sys.stderr)
+    
+    def schedule_save(self, delay=None):
+        """Save the configuration after a short delay, on a background thread.
+        
+        Calls made before the delay runs out restart it, so a burst of
+        changes results in one write.
+        
+        Args:
+            delay (float, optional): Seconds to wait (default: SAVE_DELAY).
+        """
+        with self._lock:
+            self._cancel_save_timer()
+            self._save_timer = threading.Timer(self.SAVE_DELAY if delay is None else delay, self.save_config)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush(self):
+        """Write a pending scheduled save immediately."""
+        with self._lock:
+            if self._save_timer is not None:
+                self.save_config()
+    
+    def _cancel_save_timer(self):
+        """Cancel a pending scheduled save (caller holds the lock)."""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+    
+    def _serialize(self):
+        """Serialize the configuration as written to the file."""
+        return json.dumps(self.config_data, indent=2)
+    
+    def _write_atomic(self, text):
+        """Write the file through a temporary file and an atomic rename."""
+        directory = os.path.dirname(os.path.abspath(self.config_path))
+        tmp_path = os.path.join(directory, f".{os.path.basename(self.config_path)}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.config_path):
+                os.chmod(tmp_path, os.stat(self.config_path).st_mode & 0o777)
+            os.replace(tmp_path, self.config_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
     
     def _update_config(self, target, source):
         """Recursively update the target dictionary with values from source."""
@@ -102,15 +394,13 @@ class Config:
             default (any, optional): Default value if section/key not found.
         
         Returns:
-            The configuration value or default if not found.
+            The configuration value or default if not found. Sections are
+            returned as read-only mappings and lists as tuples.
         """
-        if section not in self.config_data:
-            return default
-        
         if key is None:
-            return self.config_data[section]
+            return self.snapshot.get(section, default)
         
-        return self.config_data[section].get(key, default)
+        return self._values.get((section, key), default)
     
     def set(self, section, key, value):
         """Set a configuration value.
@@ -120,26 +410,34 @@ class Config:
             key (str): Configuration key within section.
             value: Value to set.
         """
-        if section not in self.config_data:
-            self.config_data[section] = {}
-        
-        self.config_data[section][key] = value
+        with self._lock:
+            if section not in self.config_data:
+                self.config_data[section] = {}
+            
+            self.config_data[section][key] = value
+            self._rebuild_snapshot()
     
     def get_app_name(self):
         """Get the application name."""
-        return self.config_data.get("app_name", "API Key Manager")
+        return self.get("app_name", default="API Key Manager")
     
     def get_window_config(self):
         """Get window configuration."""
-        return self.config_data.get("window", {})
+        return self.get("window", default=MappingProxyType({}))
     
     def get_build_config(self):
         """Get build configuration."""
-        return self.config_data.get("build", {})
+        return self.get("build", default=MappingProxyType({}))
     
     def get_storage_config(self):
         """Get storage configuration."""
-        return self.config_data.get("storage", {})
+        return self.get("storage", default=MappingProxyType({}))
+    
+    def get_agent_config(self):
+        """Get key agent configuration."""
+        return self.get("agent", default=MappingProxyType({}))
 
 # Create a global configuration instance
 config = Config()
+# Do not lose a scheduled save when the process exits
+atexit.register(config.flush)
@@ -0,0 +1,114 @@
+"""
+Inter-process lock file that also records the key index generation.
+"""
+
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def default_lock_path(service_name, index_key):
+    """Get the default lock file location for an index."""
+    return str(Path.home() / ".api_key_manager" / f"{service_name}.{index_key}.lock")
+
+
+def peek_generation(path):
+    """Read the recorded generation without taking the lock.
+    
+    A value read while a writer holds the lock may be out of date or
+    unreadable (0); either way the reader re-reads the index before its
+    next write.
+    """
+    try:
+        with open(path, "rb") as f:
+            return parse_generation(f.read(32))
+    except OSError:
+        return 0
+
+
+def parse_generation(data):
+    """Decode the contents of a lock file."""
+    try:
+        return int(data)
+    except ValueError:
+        return 0
+
+
+class IndexLock:
+    """Exclusive lock that serializes index writers on this host.
+    
+    The lock file holds the generation of the last index write, so a
+    writer holding the lock can tell whether another process changed the
+    index since it was read without a backend round-trip.
+    
+    Usage:
+        with IndexLock(path) as lock:
+            generation = lock.read_generation()
+            ...
+            lock.write_generation(generation + 1)
+    
+    The lock is advisory (flock on POSIX, a byte-range lock on Windows) and
+    is released if the holder dies. It also excludes other threads, as long
+    as each uses its own IndexLock.
+    """
+    
+    def __init__(self, path):
+        """Initialize the lock.
+        
+        Args:
+            path (str): Lock file (created on first use).
+        """
+        self.path = path
+        self._fd = None
+    
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                # LK_LOCK gives up after ten one-second retries
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+    
+    def read_generation(self):
+        """Get the recorded generation (0 if none was recorded yet)."""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        return parse_generation(os.read(self._fd, 32))
+    
+    def write_generation(self, generation):
+        """Record the generation of the index write just made."""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, str(generation).encode("ascii"))
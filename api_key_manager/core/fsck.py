@@ -0,0 +1,153 @@
+"""
+Consistency check and repair of the key index.
+
+The index and the secrets it lists are separate backend entries, so they
+can drift apart: a crash or a failed delete can leave names in the index
+whose secret is gone (dangling), a damaged index entry reads as empty
+(corrupt), and a secret can survive without an index entry (orphan, only
+detectable on backends that can list their entries).
+
+    report = check_index(storage, workers=16)
+    report = check_index(storage, repair=True)
+"""
+
+import json
+from core.key_index import READABLE_FORMATS
+
+def read_index_entries(storage, read_many=None):
+    """Read the manifest and every shard directly from the backend.
+    
+    Args:
+        storage (KeyStorage): Storage whose index is read.
+        read_many (callable, optional): Function mapping a list of entry
+            names to their values (default: one read after another).
+    
+    Returns:
+        tuple: (names in index order, name -> shard it was found in,
+        names of the entries that could not be decoded, name -> metadata
+        for the names that have any).
+    """
+    backend = storage.backend
+    index = storage.index
+    corrupt = []
+    
+    raw_manifest = backend.get_secret(index.index_key)
+    manifest = _decode(raw_manifest)
+    shard_count = index.shard_count
+    if isinstance(manifest, dict) and manifest.get("format") in READABLE_FORMATS:
+        shard_count = manifest.get("shards", shard_count)
+    elif raw_manifest:
+        corrupt.append(index.index_key)
+        # The shard count is unknown: read every shard entry there is
+        while backend.get_secret(index.shard_key(shard_count)):
+            shard_count += 1
+    
+    if read_many is None:
+        read_many = lambda keys: [backend.get_secret(key) for key in keys]
+    keys = [index.shard_key(shard) for shard in range(shard_count)]
+    
+    entries = []
+    found_in = {}
+    metadata = {}
+    for shard, (key, raw) in enumerate(zip(keys, read_many(keys))):
+        if not raw:
+            continue
+        decoded = index.decode_shard(raw)
+        if decoded is None:
+            corrupt.append(key)
+            continue
+        for name, seq in decoded[0].items():
+            entries.append((seq, name))
+            found_in.setdefault(name, shard)
+        for name, value in decoded[2].items():
+            metadata.setdefault(name, value)
+    
+    entries.sort()
+    names = list(dict.fromkeys(name for seq, name in entries))
+    return names, found_in, corrupt, metadata
+
+
+def check_index(storage, workers=16, repair=False, adopt_orphans=False):
+    """Verify that every indexed key has a secret, and optionally repair the index.
+    
+    Every indexed name is probed with up to workers parallel backend reads
+    (on backends that allow concurrent reads). A repair rewrites the whole
+    index once, in a single backend batch.
+    
+    Args:
+        storage (KeyStorage): Storage to check.
+        workers (int): Maximum parallel probes.
+        repair (bool): Rewrite the index without dangling names, damaged
+            entries and misplaced names.
+        adopt_orphans (bool): When repairing, add orphaned secrets to the
+            index instead of only reporting them.
+    
+    Returns:
+        dict: "checked" (number of indexed names), "dangling", "corrupt"
+        (index entry names), "misplaced", "orphans" and "repaired".
+    """
+    backend = storage.backend
+    index = storage.index
+    pool = None
+    if backend.concurrent_reads and workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=workers)
+    
+    def read_many(keys):
+        if pool is None:
+            return [backend.get_secret(key) for key in keys]
+        return list(pool.map(backend.get_secret, keys))
+    
+    def probe_many(keys):
+        # Only whether each secret exists; values are not kept
+        if pool is None:
+            return [backend.get_secret(key) is not None for key in keys]
+        return list(pool.map(lambda key: backend.get_secret(key) is not None, keys))
+    
+    try:
+        names, found_in, corrupt, metadata = read_index_entries(storage, read_many)
+        present = probe_many(names)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    
+    misplaced = [name for name in names if found_in[name] != index.shard_of(name)]
+    dangling = [name for name, exists in zip(names, present) if not exists]
+    
+    orphans = []
+    if hasattr(backend, "list_names"):
+        indexed = set(names)
+        orphans = [
+            name for name in backend.list_names()
+            if name not in indexed and not index.is_reserved_name(name)
+        ]
+    
+    report = {
+        "checked": len(names),
+        "dangling": dangling,
+        "corrupt": corrupt,
+        "misplaced": misplaced,
+        "orphans": orphans,
+        "repaired": False,
+    }
+    
+    if repair and (dangling or corrupt or misplaced or (adopt_orphans and orphans)):
+        missing = set(dangling)
+        repaired = [name for name in names if name not in missing]
+        if adopt_orphans:
+            repaired += orphans
+        # Keeps the tags and timestamps of the names, also of misplaced ones
+        storage.rebuild_index(repaired, metadata)
+        storage.notify_changed(dangling)
+        report["repaired"] = True
+    return report
+
+
+def _decode(raw):
+    """Decode a JSON index entry, or None if it is missing or damaged."""
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,446 @@
+"""
+Encoding of key index shards.
+
+A shard (name -> sequence number, with the metadata of its names) is stored
+as the members of two JSON objects, one per line: a header with the
+generation, the names with their sequence numbers, an empty line, then the
+metadata of the names that have any. Lines are sorted, and the text is
+compressed with zlib and base64-wrapped, since backends store text:
+    
+    {"generation":7}
+    "svc-prod-a":0
+    "svc-prod-b":1
+    
+    "svc-prod-b":{"tags":["llm"]}
+
+Sorting puts names that share long prefixes ("svc-prod-eu-west-...") next
+to each other, where zlib compresses them nearly as well as front coding,
+while a whole shard is written and read by zlib and the C JSON parser. A
+line depends only on its own name, so a writer can keep the lines of a
+shard in a LineCache and encode only the entries that changed:
+    
+    cache = LineCache()
+    names, generation, metadata = decode_shard(text, cache)
+    text = encode_shard(names, generation + 1, metadata, cache)
+    contains(text, "svc-prod-b")           (True, without parsing the shard)
+
+Shards of index format 4 are front-coded (see ShardView). They are still
+read and looked up, and encode_front_coded() writes them for comparison.
+The front-coded layout, before zlib compression (applied only when it
+makes the shard smaller) and base64:
+    
+    generation, count          varints
+    entries                    shared prefix length, suffix length,
+                               suffix bytes, sequence number (varints),
+                               metadata length and JSON (only with
+                               FLAG_METADATA)
+    restart offsets            uint32 each, then their number (uint32)
+"""
+
+import base64
+import binascii
+import json
+import struct
+import zlib
+
+# Marks an encoded shard and its layout version
+PREFIX = "kix2:"
+# Prefix of front-coded shards (index format 4)
+FRONT_CODED_PREFIX = "kix1:"
+# zlib level: the fastest, as sorted lines already compress well
+COMPRESS_LEVEL = 1
+# Front coding: entries between two names stored in full
+RESTART_INTERVAL = 16
+# Front coding: flag byte values
+FLAG_ZLIB = 1
+FLAG_METADATA = 2
+
+
+class LineCache:
+    """Encoded lines of the entries of a shard, reused by encode_shard().
+    
+    decode_shard() only records the lines it read; they are sorted out by
+    name when the shard is next encoded, so reading a shard that is never
+    written costs nothing extra.
+    """
+    
+    def __init__(self):
+        # name -> (sequence number, line)
+        self.names = {}
+        # name -> metadata line ("" for none)
+        self.metadata = {}
+        # (names, name lines, metadata, metadata lines) last read
+        self._read = None
+    
+    def record(self, names, name_lines, metadata, metadata_lines):
+        """Replace the cached lines with those of a decoded shard."""
+        self.names = {}
+        self.metadata = {}
+        self._read = (names, name_lines, metadata, metadata_lines)
+    
+    def discard(self, name):
+        """Forget the lines of a name, e.g. because its metadata changes."""
+        self.index()
+        self.names.pop(name, None)
+        self.metadata.pop(name, None)
+    
+    def index(self):
+        """Index the recorded lines by name."""
+        if self._read is None:
+            return
+        names, name_lines, metadata, metadata_lines = self._read
+        self._read = None
+        self.names.update(zip(names, zip(names.values(), name_lines)))
+        self.metadata.update(dict.fromkeys(names, ""))
+        self.metadata.update(zip(metadata, metadata_lines))
+
+
+def is_encoded(text):
+    """Check whether a stored shard uses one of these encodings (and not JSON)."""
+    return text.startswith((PREFIX, FRONT_CODED_PREFIX))
+
+
+def encode_shard(names, generation, metadata=None, cache=None):
+    """Encode a shard.
+    
+    Args:
+        names (dict): Key name -> sequence number.
+        generation (int): Generation of the index write.
+        metadata (mapping, optional): Key name -> dict stored with the name.
+            Names without an entry get none.
+        cache (LineCache, optional): Lines of the shard's entries encoded
+            or read before. Names missing from it (or with another sequence
+            number) are encoded and added; the caller discards names whose
+            metadata changes.
+    
+    Returns:
+        str: The encoded shard.
+    """
+    if metadata is None:
+        metadata = {}
+    if cache is None:
+        cache = LineCache()
+    cache.index()
+    name_lines = []
+    metadata_lines = []
+    for name, seq in names.items():
+        cached = cache.names.get(name)
+        if cached is None or cached[0] != seq:
+            cached = cache.names[name] = (seq, f"{json.dumps(name)}:{seq}")
+        name_lines.append(cached[1])
+        line = cache.metadata.get(name)
+        if line is None:
+            value = metadata.get(name)
+            line = cache.metadata[name] = f"{json.dumps(name)}:{json.dumps(value, separators=(',', ':'))}" if value else ""
+        if line:
+            metadata_lines.append(line)
+    name_lines.sort()
+    metadata_lines.sort()
+    
+    text = "\n".join([json.dumps({"generation": generation}), *name_lines]) + "\n\n" + "\n".join(metadata_lines)
+    return PREFIX + base64.b64encode(zlib.compress(text.encode("utf-8"), COMPRESS_LEVEL)).decode("ascii")
+
+
+def decode_shard(text, cache=None):
+    """Decode a shard of either encoding.
+    
+    Args:
+        text (str): The encoded shard.
+        cache (LineCache, optional): Records the lines of its entries
+            (front-coded shards leave it empty).
+    
+    Returns:
+        tuple: (dict of key name -> sequence number, generation, dict of
+        key name -> metadata for the names that have any).
+    
+    Raises:
+        ValueError: If the shard is damaged.
+    """
+    if text.startswith(FRONT_CODED_PREFIX):
+        view = ShardView(text)
+        names, metadata = view.decode()
+        return names, view.generation, metadata
+    
+    entries, _, metadata_lines = _decompress(text).partition("\n\n")
+    header, _, name_lines = entries.partition("\n")
+    name_lines = name_lines.split("\n") if name_lines else []
+    metadata_lines = metadata_lines.split("\n") if metadata_lines else []
+    try:
+        generation = json.loads(header)["generation"]
+        names = json.loads("{" + ",".join(name_lines) + "}")
+        metadata = json.loads("{" + ",".join(metadata_lines) + "}")
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Damaged index shard: {e}") from None
+    if (not isinstance(generation, int) or len(names) != len(name_lines) or len(metadata) != len(metadata_lines)
+            or not set(map(type, names.values())) <= {int}
+            or not set(map(type, metadata.values())) <= {dict} or not all(metadata.values())
+            or not names.keys() >= metadata.keys()):
+        raise ValueError("Damaged index shard: bad entry")
+    
+    if cache is not None:
+        cache.record(names, name_lines, metadata, metadata_lines)
+    return names, generation, metadata
+
+
+def contains(text, name):
+    """Check whether a shard holds a name, without parsing its entries.
+    
+    Raises:
+        ValueError: If the shard is damaged.
+    """
+    if text.startswith(FRONT_CODED_PREFIX):
+        return ShardView(text).get(name) is not None
+    body = _decompress(text)
+    end = body.find("\n\n")
+    if end < 0:
+        raise ValueError("Damaged index shard: no end of names")
+    # Name lines follow the header, up to the empty line
+    return body.find(f"\n{json.dumps(name)}:", 0, end) >= 0
+
+
+def _decompress(text):
+    """Unwrap the lines of a shard."""
+    if not text.startswith(PREFIX):
+        raise ValueError("Not an encoded index shard")
+    try:
+        return zlib.decompress(base64.b64decode(text[len(PREFIX):], validate=True)).decode("utf-8")
+    except (binascii.Error, zlib.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Damaged index shard: {e}") from None
+
+
+def encode_front_coded(names, generation, metadata=None):
+    """Encode a shard front-coded, as index format 4 did.
+    
+    Args:
+        names (dict): Key name -> sequence number.
+        generation (int): Generation of the index write.
+        metadata (dict, optional): Key name -> dict stored with the name.
+            Names without an entry get none.
+    
+    Returns:
+        str: The encoded shard.
+    """
+    flags = 0
+    if metadata and any(metadata.get(name) for name in names):
+        flags |= FLAG_METADATA
+    
+    body = bytearray()
+    _write_varint(body, generation)
+    _write_varint(body, len(names))
+    
+    restarts = []
+    previous = b""
+    entries = sorted((name.encode("utf-8"), seq) for name, seq in names.items())
+    for i, (name, seq) in enumerate(entries):
+        shared = 0
+        if i % RESTART_INTERVAL == 0:
+            restarts.append(len(body))
+        else:
+            shared = _shared_prefix(previous, name)
+        _write_varint(body, shared)
+        _write_varint(body, len(name) - shared)
+        body += name[shared:]
+        _write_varint(body, seq)
+        if flags & FLAG_METADATA:
+            extra = metadata.get(name.decode("utf-8"))
+            encoded = json.dumps(extra, separators=(",", ":")).encode("utf-8") if extra else b""
+            _write_varint(body, len(encoded))
+            body += encoded
+        previous = name
+    
+    body += struct.pack(f"<{len(restarts)}I", *restarts)
+    body += struct.pack("<I", len(restarts))
+    
+    compressed = zlib.compress(bytes(body))
+    if len(compressed) < len(body):
+        body = compressed
+        flags |= FLAG_ZLIB
+    return FRONT_CODED_PREFIX + base64.b64encode(bytes([flags]) + bytes(body)).decode("ascii")
+
+
+class ShardView:
+    """Read a front-coded shard without building a dict of all its names."""
+    
+    def __init__(self, text):
+        """Unpack a shard.
+        
+        Args:
+            text (str): Shard written by encode_front_coded().
+        
+        Raises:
+            ValueError: If the shard is damaged.
+        """
+        if not text.startswith(FRONT_CODED_PREFIX):
+            raise ValueError("Not a front-coded index shard")
+        try:
+            data = base64.b64decode(text[len(FRONT_CODED_PREFIX):], validate=True)
+            flags, body = data[0], data[1:]
+            self._has_metadata = bool(flags & FLAG_METADATA)
+            if flags & FLAG_ZLIB:
+                body = zlib.decompress(body)
+            
+            self.generation, pos = _read_varint(body, 0)
+            self.count, self._entries_start = _read_varint(body, pos)
+            (restart_count,) = struct.unpack_from("<I", body, len(body) - 4)
+            self._entries_end = len(body) - 4 - 4 * restart_count
+            self._restarts = struct.unpack_from(f"<{restart_count}I", body, self._entries_end)
+        except (binascii.Error, IndexError, struct.error, zlib.error) as e:
+            raise ValueError(f"Damaged index shard: {e}") from None
+        if self._entries_end < self._entries_start or restart_count != -(-self.count // RESTART_INTERVAL):
+            raise ValueError("Damaged index shard: bad restart table")
+        self._body = body
+    
+    def __len__(self):
+        return self.count
+    
+    def __contains__(self, name):
+        return self.get(name) is not None
+    
+    def get(self, name):
+        """Get the sequence number of a name, or None if the shard does not hold it.
+        
+        Only the restart points and at most RESTART_INTERVAL entries after
+        one of them are read.
+        
+        Raises:
+            ValueError: If the part of the shard read is damaged.
+        """
+        target = name.encode("utf-8")
+        low, high = 0, len(self._restarts)
+        if not high:
+            return None
+        try:
+            # Find the last restart point whose name is <= target
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self._restart_name(middle) <= target:
+                    low = middle
+                else:
+                    high = middle
+            
+            pos = self._restarts[low]
+            end = self._restarts[low + 1] if low + 1 < len(self._restarts) else self._entries_end
+            for entry, seq in self._scan(pos, end):
+                if entry == target:
+                    return seq
+                if entry > target:
+                    break
+        except IndexError:
+            raise ValueError("Damaged index shard: truncated entry") from None
+        return None
+    
+    def items(self):
+        """Yield (name, sequence number) for every name, sorted by name."""
+        try:
+            for name, seq in self._scan(self._entries_start, self._entries_end):
+                yield name.decode("utf-8"), seq
+        except IndexError:
+            raise ValueError("Damaged index shard: truncated entry") from None
+    
+    def decode(self):
+        """Decode every name at once (faster than items() for a whole shard).
+        
+        Returns:
+            tuple: (dict of name -> sequence number, dict of name -> metadata).
+        """
+        body = self._body
+        pos = self._entries_start
+        end = self._entries_end
+        has_metadata = self._has_metadata
+        names = {}
+        metadata = {}
+        name = b""
+        try:
+            while pos < end:
+                # Lengths and most sequence numbers fit in one byte
+                shared = body[pos]
+                if shared < 0x80:
+                    pos += 1
+                else:
+                    shared, pos = _read_varint(body, pos)
+                length = body[pos]
+                if length < 0x80:
+                    pos += 1
+                else:
+                    length, pos = _read_varint(body, pos)
+                name = name[:shared] + body[pos:pos + length]
+                pos += length
+                seq = body[pos]
+                if seq < 0x80:
+                    pos += 1
+                else:
+                    seq, pos = _read_varint(body, pos)
+                decoded = name.decode("utf-8")
+                names[decoded] = seq
+                if has_metadata:
+                    length, pos = _read_varint(body, pos)
+                    if length:
+                        metadata[decoded] = json.loads(body[pos:pos + length])
+                        pos += length
+        except IndexError:
+            raise ValueError("Damaged index shard: truncated entry") from None
+        return names, metadata
+    
+    def _restart_name(self, restart):
+        """Get the name stored in full at a restart point."""
+        pos = self._restarts[restart]
+        shared, pos = _read_varint(self._body, pos)
+        length, pos = _read_varint(self._body, pos)
+        return bytes(self._body[pos:pos + length])
+    
+    def _scan(self, pos, end):
+        """Yield (name bytes, sequence number) for the entries from pos to end."""
+        body = self._body
+        name = b""
+        while pos < end:
+            shared, pos = _read_varint(body, pos)
+            length, pos = _read_varint(body, pos)
+            name = name[:shared] + body[pos:pos + length]
+            pos += length
+            seq, pos = _read_varint(body, pos)
+            if self._has_metadata:
+                # Skipped: only decode() reads the metadata
+                length, pos = _read_varint(body, pos)
+                pos += length
+            yield name, seq
+
+
+def _shared_prefix(a, b):
+    """Get the length of the common prefix of two byte strings."""
+    # Binary search on slice comparisons, which run in C
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _write_varint(buffer, value):
+    """Append an unsigned integer in 7-bit groups, low group first."""
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, pos):
+    """Read an unsigned integer written by _write_varint.
+    
+    Returns:
+        tuple: (value, position after it).
+    """
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    value = byte & 0x7F
+    shift = 7
+    while True:
+        pos += 1
+        byte = data[pos]
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos + 1
+        shift += 7
@@ -0,0 +1,608 @@
+"""
+Sharded index of stored key names.
+"""
+
+import json
+import sys
+import threading
+import zlib
+from collections import ChainMap
+from types import MappingProxyType
+from contextlib import contextmanager
+from core import index_codec
+from core.file_lock import IndexLock, peek_generation
+from core.metrics import metrics
+
+# Version number stored in the index manifest
+INDEX_FORMAT = 5
+# Older formats still read: JSON shards, as plain name -> sequence number
+# dicts (2) or with a generation (3), and front-coded shards (4). They are
+# re-encoded on the first write.
+READABLE_FORMATS = (2, 3, 4, INDEX_FORMAT)
+
+
+class IndexDamagedError(Exception):
+    """Raised when changing an index whose manifest cannot be read."""
+
+
+class ShardedKeyIndex:
+    """Persist the list of key names across several backend entries.
+    
+    The index entry itself holds a small manifest; the names are spread
+    over shard entries ("<index_key>.0", "<index_key>.1", ...) by a hash
+    of the name. Changing one name rewrites only its shard, no entry grows
+    with the total number of keys (some keyrings cap the size of a
+    secret), and shards are fetched in parallel on backends that allow it.
+    
+    Each shard maps names to a sequence number so the original insertion
+    order can be restored across shards, and is stored as compressed JSON
+    lines (see index_codec) together with the metadata of its names. The
+    encoded line of every name is kept, so rewriting a shard encodes only
+    the names that changed. An index written by older versions (a single
+    JSON list in the index entry) is migrated on load; one with shards in
+    an older encoding is re-encoded with its next change.
+    
+    Several processes may change the index. Every write is stamped with a
+    generation number, which is also recorded in a lock file that writers
+    on this host hold while they write. A writer whose last known
+    generation no longer matches the lock file re-reads the index and
+    applies its change on top of the other process's, instead of
+    overwriting it; when nothing else has written, the check costs no
+    backend round-trip.
+    """
+    
+    def __init__(self, backend, index_key, shard_count=8, read_workers=4, lock_path=None):
+        """Initialize the index.
+        
+        Args:
+            backend (StorageBackend): Backend holding the index entries.
+            index_key (str): Name of the manifest entry.
+            shard_count (int): Number of shards for a new index. An existing
+                index keeps the shard count recorded in its manifest.
+            read_workers (int): Maximum parallel shard reads.
+            lock_path (str, optional): Lock file shared by all writers of
+                this index. Without one, writes are not coordinated.
+        """
+        self.backend = backend
+        self.index_key = index_key
+        self.shard_count = max(1, shard_count)
+        self.read_workers = max(1, read_workers)
+        # One dict per shard: name -> sequence number
+        self._shards = [{} for _ in range(self.shard_count)]
+        # name -> metadata dict, for the names that have any
+        self._metadata = {}
+        # Shard number -> LineCache with the encoded lines of its names
+        self._lines = {}
+        self._next_seq = 0
+        # Whether the backend holds a sharded index yet
+        self.has_manifest = False
+        # Whether the manifest entry exists but cannot be read. The shards
+        # are still read, but nothing is written until the index is rebuilt.
+        self.damaged = False
+        # Format of the manifest in the backend (rewritten on the next change)
+        self.manifest_format = INDEX_FORMAT
+        # Generation of the last write this process has seen
+        self.generation = 0
+        self.lock_path = lock_path
+        # Called with the current names after changes by another process
+        # were read in while writing
+        self.on_reload = None
+        # Nesting depth of _writing() blocks, and whether the outermost one
+        # re-read the index (inner blocks neither lock nor re-read again)
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._reloaded = False
+    
+    def shard_key(self, shard):
+        """Get the backend entry name of a shard."""
+        return f"{self.index_key}.{shard}"
+    
+    def is_reserved_name(self, name):
+        """Check whether a name is taken by the index itself (the manifest or a shard)."""
+        if name == self.index_key:
+            return True
+        prefix, dot, shard = name.rpartition(".")
+        return dot == "." and prefix == self.index_key and shard.isdigit()
+    
+    def shard_of(self, name):
+        """Get the shard a name belongs to."""
+        return zlib.crc32(name.encode("utf-8")) % self.shard_count
+    
+    @metrics.timed("index.load")
+    def load(self):
+        """Read the index from the backend.
+        
+        Returns:
+            list: Key names in insertion order.
+        """
+        # Read before the shards: if a write finishes while they are read,
+        # the generation is already out of date and the next write re-reads
+        lock_generation = peek_generation(self.lock_path) if self.lock_path is not None else None
+        raw_manifest = self.backend.get_secret(self.index_key)
+        manifest = self._parse(raw_manifest)
+        self._metadata = {}
+        self._lines = {}
+        self.damaged = False
+        
+        if isinstance(manifest, list):
+            self._migrate(manifest)
+        elif isinstance(manifest, dict) and manifest.get("format") in READABLE_FORMATS:
+            self.has_manifest = True
+            self.manifest_format = manifest["format"]
+            self.shard_count = manifest.get("shards", self.shard_count)
+            self._shards = self._read_shards()
+        elif raw_manifest:
+            # Damaged, or written by a newer version: read whatever shards
+            # exist, and never write over the manifest
+            self.damaged = True
+            self.has_manifest = True
+            self.manifest_format = INDEX_FORMAT
+            while self.backend.get_secret(self.shard_key(self.shard_count)):
+                self.shard_count += 1
+            self._shards = self._read_shards()
+        else:
+            # No index yet; the manifest is written with the first change
+            self.has_manifest = False
+            self._shards = [{} for _ in range(self.shard_count)]
+        
+        seqs = [seq for shard in self._shards for seq in shard.values()]
+        self._next_seq = max(seqs) + 1 if seqs else 0
+        if lock_generation is not None:
+            self.generation = lock_generation
+        return self.names()
+    
+    def names(self):
+        """Get all key names in insertion order."""
+        entries = [(seq, name) for shard in self._shards for name, seq in shard.items()]
+        entries.sort()
+        return [name for seq, name in entries]
+    
+    def metadata(self, name):
+        """Get a copy of the metadata stored with a name (empty if none)."""
+        return dict(self._metadata.get(name) or {})
+    
+    def all_metadata(self):
+        """Get a read-only view of name -> metadata for the names that have any.
+        
+        The metadata dicts are not copied and must not be modified.
+        """
+        return MappingProxyType(self._metadata)
+    
+    @metrics.timed("index.contains")
+    def contains(self, name):
+        """Check whether the backend index holds a name, without load().
+        
+        Only the manifest and the name's shard are read, and the shard is
+        searched without decoding all of its names. Meant for a single
+        lookup, such as one command line call; an index in the old list
+        format or with a damaged manifest is loaded in full instead.
+        """
+        manifest = self._parse(self.backend.get_secret(self.index_key))
+        if not (isinstance(manifest, dict) and manifest.get("format") in READABLE_FORMATS):
+            return name in self.load()
+        
+        self.shard_count = manifest.get("shards", self.shard_count)
+        raw = self.backend.get_secret(self.shard_key(self.shard_of(name)))
+        if raw and index_codec.is_encoded(raw):
+            try:
+                return index_codec.contains(raw, name)
+            except ValueError:
+                self._warn_damaged()
+                return False
+        decoded = self.decode_shard(raw)
+        return decoded is not None and name in decoded[0]
+    
+    def add(self, name, metadata=None):
+        """Add a name, rewriting only its shard.
+        
+        Args:
+            name (str): Key name.
+            metadata (dict, optional): JSON-serializable data stored with it.
+        
+        Returns:
+            bool: True if added, False if the index already holds it.
+        """
+        with self._writing():
+            shard = self.shard_of(name)
+            if name in self._shards[shard]:
+                return False
+            
+            updated = dict(self._shards[shard])
+            updated[name] = self._next_seq
+            self._write_shards({shard: updated}, {name: metadata})
+            self._next_seq += 1
+            return True
+    
+    def set_metadata(self, name, metadata):
+        """Replace the metadata stored with a name, rewriting only its shard.
+        
+        Returns:
+            bool: True if stored, False if the index does not hold the name.
+        """
+        with self._writing():
+            shard = self.shard_of(name)
+            if name not in self._shards[shard]:
+                return False
+            
+            self._write_shards({shard: self._shards[shard]}, {name: metadata})
+            return True
+    
+    def remove(self, name):
+        """Remove a name, rewriting only its shard.
+        
+        Returns:
+            bool: True if removed, False if the index does not hold it.
+        """
+        with self._writing():
+            shard = self.shard_of(name)
+            if name not in self._shards[shard]:
+                return False
+            
+            updated = dict(self._shards[shard])
+            del updated[name]
+            self._write_shards({shard: updated}, {name: None})
+            return True
+    
+    def rename(self, old_name, new_name, metadata=None):
+        """Rename a name in place, keeping its position and metadata.
+        
+        The shard gaining new_name is written before the one losing
+        old_name, so an interruption between the two writes leaves both
+        names listed rather than neither.
+        
+        Args:
+            old_name (str): Current name.
+            new_name (str): New name.
+            metadata (dict, optional): New metadata (default: keep the current).
+        
+        Returns:
+            bool: True if renamed, False if old_name is missing or new_name
+            is already taken.
+        """
+        with self._writing():
+            old_shard = self.shard_of(old_name)
+            new_shard = self.shard_of(new_name)
+            seq = self._shards[old_shard].get(old_name)
+            if seq is None or new_name in self._shards[new_shard]:
+                return False
+            
+            if metadata is None:
+                metadata = self._metadata.get(old_name)
+            moved = {old_name: None, new_name: metadata}
+            
+            gaining = dict(self._shards[new_shard])
+            gaining[new_name] = seq
+            if new_shard == old_shard:
+                del gaining[old_name]
+                self._write_shards({new_shard: gaining}, moved)
+                return True
+            
+            losing = dict(self._shards[old_shard])
+            del losing[old_name]
+            with self.backend.batch():
+                self._write_shards({new_shard: gaining, old_shard: losing}, moved)
+            return True
+    
+    def replace(self, names, base=None, metadata=None):
+        """Make the index hold exactly the given names, in the given order.
+        
+        Names already in the index keep their position (and metadata)
+        unless their order relative to each other changed. Only shards
+        whose contents differ are rewritten.
+        
+        If another process changed the index since base was read, only the
+        difference between base and names is applied to its current
+        contents: names added or removed by the other process are kept.
+        
+        Args:
+            names (list): Key names in order.
+            base (iterable, optional): Names the list was derived from
+                (default: the index as this process last saw it).
+            metadata (dict, optional): Name -> new metadata for names
+                whose metadata changes.
+        
+        Returns:
+            list: The names now in the index.
+        """
+        if base is None:
+            base = [name for shard in self._shards for name in shard]
+        base = set(base)
+        
+        with self._writing() as reloaded:
+            if reloaded():
+                removed = base - set(names)
+                current = self.names()
+                current_set = set(current)
+                added = [name for name in names if name not in base and name not in current_set]
+                names = [name for name in current if name not in removed] + added
+            self._replace(names, metadata=metadata)
+            return list(names)
+    
+    def rebuild(self, names, metadata=None):
+        """Rewrite the manifest and every shard to hold exactly the given names.
+        
+        Unlike replace(), entries are written even if they appear unchanged,
+        so damaged entries (which read as empty) are overwritten. This is the
+        only change allowed while the manifest is damaged.
+        
+        Args:
+            names (list): Key names in order.
+            metadata (dict, optional): Name -> metadata to store with the
+                names, as read from the backend (e.g. by fsck). Without it,
+                the index is re-read first so the names keep their metadata.
+        """
+        with self._writing(repair=True) as reloaded:
+            if metadata is None and not reloaded():
+                self.load()
+            self.has_manifest = False
+            self._replace(names, rewrite_all=True, metadata=metadata)
+    
+    def _replace(self, names, rewrite_all=False, metadata=None):
+        """Write the shards so they hold exactly the given names."""
+        current = {}
+        for shard in self._shards:
+            current.update(shard)
+        
+        # Metadata changes, including removed names (dropping their metadata)
+        wanted = set(names)
+        removed = current.keys() - wanted
+        changes = dict.fromkeys(removed)
+        if metadata:
+            changes.update((name, value) for name, value in metadata.items() if name in wanted)
+        changed_shards = {self.shard_of(name) for name in changes}
+        
+        added = [name for name in names if name not in current]
+        if not rewrite_all and self._keeps_order(names, current, added):
+            # Only names were removed and appended: touch just their shards
+            changed = {}
+            for name in removed:
+                shard = self.shard_of(name)
+                changed.setdefault(shard, dict(self._shards[shard])).pop(name)
+            next_seq = self._next_seq
+            for name in added:
+                shard = self.shard_of(name)
+                changed.setdefault(shard, dict(self._shards[shard]))[name] = next_seq
+                next_seq += 1
+            for shard in changed_shards:
+                changed.setdefault(shard, self._shards[shard])
+        else:
+            shards = [{} for _ in range(self.shard_count)]
+            next_seq = self._next_seq
+            last_seq = -1
+            for name in names:
+                seq = current.get(name)
+                if seq is None or seq <= last_seq:
+                    seq = max(next_seq, last_seq + 1)
+                    next_seq = seq + 1
+                shards[self.shard_of(name)][name] = seq
+                last_seq = seq
+            
+            changed = {
+                i: shard for i, shard in enumerate(shards)
+                if rewrite_all or shard != self._shards[i] or i in changed_shards
+            }
+        if changed or not self.has_manifest:
+            self._write_shards(changed, changes)
+        self._next_seq = max(next_seq, self._next_seq)
+    
+    @staticmethod
+    def _keeps_order(names, current, added):
+        """Check whether names keeps the order of the current names and only appends new ones."""
+        kept = len(names) - len(added)
+        if names[kept:] != added or len(set(added)) != len(added):
+            return False
+        seqs = [current[name] for name in names[:kept]]
+        return seqs == sorted(seqs)
+    
+    def check_writable(self):
+        """Raise IndexDamagedError if the index must be repaired before it is changed."""
+        if self.damaged:
+            raise IndexDamagedError(
+                f"The manifest of key index '{self.index_key}' is damaged; "
+                "run 'cli.py fsck --repair' before changing keys"
+            )
+    
+    @contextmanager
+    def writing(self):
+        """Hold the writer lock across several changes, including secret writes.
+        
+        Index changes made inside the block take the lock without waiting
+        for it again. Backends that keep secrets in memory are refreshed
+        when the index is re-read, so a secret written before the block
+        ends does not overwrite what another process wrote.
+        """
+        with self._writing(repair=True):
+            yield
+    
+    @contextmanager
+    def _writing(self, repair=False):
+        """Hold the writer lock while changing the index.
+        
+        If another process wrote since this one last read or wrote, the
+        backend is refreshed and the index re-read first. Yields a function
+        that tells whether that happened. Unless repairing, a damaged index
+        raises IndexDamagedError.
+        """
+        with self._thread_lock:
+            if self._lock_depth or self.lock_path is None:
+                if not repair:
+                    self.check_writable()
+                self._lock_depth += 1
+                try:
+                    yield lambda: self._reloaded
+                finally:
+                    self._lock_depth -= 1
+                return
+            
+            with IndexLock(self.lock_path) as lock:
+                generation = lock.read_generation()
+                self._reloaded = False
+                if generation != self.generation:
+                    metrics.count("index.conflicts")
+                    self.backend.refresh()
+                    names = self.load()
+                    self._reloaded = True
+                    if self.on_reload is not None:
+                        self.on_reload(names)
+                if not repair:
+                    self.check_writable()
+                
+                self._lock_depth += 1
+                try:
+                    yield lambda: self._reloaded
+                finally:
+                    self._lock_depth -= 1
+                    if self.generation != generation:
+                        lock.write_generation(self.generation)
+    
+    @metrics.timed("index.write_shards")
+    def _write_shards(self, shards, metadata=None):
+        """Write changed shards, restoring the old contents if a write fails.
+        
+        Args:
+            shards (dict): Shard number -> new contents.
+            metadata (dict, optional): Name -> new metadata (None to drop
+                it) for names in those shards.
+        """
+        generation = self.generation + 1
+        for name in metadata or ():
+            self._line_cache(self.shard_of(name)).discard(name)
+        if self.has_manifest and self.manifest_format != INDEX_FORMAT:
+            # Re-encode the shards of an older format along with the change
+            shards = {**dict(enumerate(self._shards)), **shards}
+        written = []
+        try:
+            for shard, contents in shards.items():
+                self.backend.set_secret(self.shard_key(shard), self._serialize(shard, contents, generation, metadata))
+                written.append(shard)
+            if not self.has_manifest or self.manifest_format != INDEX_FORMAT:
+                self._write_manifest()
+        except Exception:
+            for name in metadata or ():
+                self._line_cache(self.shard_of(name)).discard(name)
+            for shard in written:
+                try:
+                    self.backend.set_secret(self.shard_key(shard), self._serialize(shard, self._shards[shard], generation))
+                except Exception as e:
+                    print(f"Failed to restore index shard {shard}: {e}", file=sys.stderr)
+            raise
+        finally:
+            # Even a restored shard was written, so other writers must re-read
+            if written:
+                self.generation = generation
+        
+        for shard, contents in shards.items():
+            self._shards[shard] = contents
+        for name, value in (metadata or {}).items():
+            if value:
+                self._metadata[name] = value
+            else:
+                self._metadata.pop(name, None)
+    
+    def _write_manifest(self):
+        """Write the manifest that marks the index as sharded."""
+        manifest = {"format": INDEX_FORMAT, "shards": self.shard_count}
+        self.backend.set_secret(self.index_key, json.dumps(manifest))
+        self.has_manifest = True
+        self.damaged = False
+        self.manifest_format = INDEX_FORMAT
+    
+    def _read_shards(self):
+        """Fetch all shards, in parallel where the backend allows it."""
+        keys = [self.shard_key(shard) for shard in range(self.shard_count)]
+        if self.backend.concurrent_reads and self.shard_count > 1:
+            # Imported here to keep it out of the command line start-up time
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(self.read_workers, self.shard_count)) as pool:
+                raw_shards = list(pool.map(self.backend.get_secret, keys))
+        else:
+            raw_shards = [self.backend.get_secret(key) for key in keys]
+        
+        shards = []
+        generations = [0]
+        for shard, raw in enumerate(raw_shards):
+            decoded = self.decode_shard(raw, self._line_cache(shard))
+            if decoded is None:
+                if raw:
+                    self._warn_damaged()
+                shards.append({})
+                continue
+            shards.append(decoded[0])
+            generations.append(decoded[1])
+            self._metadata.update(decoded[2])
+        self.generation = max(generations)
+        return shards
+    
+    def decode_shard(self, raw, cache=None):
+        """Decode a shard in the current or an older format.
+        
+        Args:
+            raw (str): The stored shard.
+            cache (LineCache, optional): Filled with the encoded lines of its names.
+        
+        Returns:
+            tuple: (dict of name -> sequence number, generation, dict of
+            name -> metadata), or None if the shard is missing or damaged.
+        """
+        if not raw:
+            return None
+        if index_codec.is_encoded(raw):
+            try:
+                return index_codec.decode_shard(raw, cache)
+            except ValueError:
+                return None
+        
+        try:
+            shard = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        generation = 0
+        if isinstance(shard, dict) and isinstance(shard.get("names"), dict):
+            generation = shard.get("generation", 0)
+            shard = shard["names"]
+        if not isinstance(shard, dict) or not all(isinstance(seq, int) for seq in shard.values()):
+            return None
+        return shard, generation, {}
+    
+    def _serialize(self, shard, contents, generation, metadata=None):
+        """Encode a shard for the backend, with pending metadata changes applied."""
+        stored = ChainMap(metadata, self._metadata) if metadata else self._metadata
+        return index_codec.encode_shard(contents, generation, stored, self._line_cache(shard))
+    
+    def _line_cache(self, shard):
+        """Get the encoded lines kept for a shard."""
+        cache = self._lines.get(shard)
+        if cache is None:
+            cache = self._lines[shard] = index_codec.LineCache()
+        return cache
+    
+    def _migrate(self, names):
+        """Convert a single-list index from older versions to shards."""
+        print(f"Migrating key index '{self.index_key}' to {self.shard_count} shards", file=sys.stderr)
+        shards = [{} for _ in range(self.shard_count)]
+        for seq, name in enumerate(dict.fromkeys(names)):
+            shards[self.shard_of(name)][name] = seq
+        
+        # Shards first: until the manifest replaces the old list, a crash
+        # simply means the migration runs again
+        self.has_manifest = False
+        self._shards = [{} for _ in range(self.shard_count)]
+        with self.backend.batch():
+            self._write_shards({i: shard for i, shard in enumerate(shards) if shard})
+            if not self.has_manifest:
+                self._write_manifest()
+    
+    def _parse(self, raw):
+        """Decode a JSON index entry, treating damaged data as missing."""
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            self._warn_damaged()
+            return None
+
+    def _warn_damaged(self):
+        """Report that an index entry could not be read."""
+        print(f"Ignoring a damaged entry of key index '{self.index_key}' (run 'cli.py fsck --repair')",
+              file=sys.stderr)
@@ -0,0 +1,170 @@
+"""
+Per-key metadata (tags, environment, provider, timestamps) and the
+inverted index used to filter keys by it.
+"""
+
+from datetime import datetime, timezone
+
+# Metadata fields the user edits; "created" and "rotated" are set by KeyStorage
+EDITABLE_FIELDS = ("tags", "environment", "provider")
+# Fields the inverted index can filter on, with the metadata field holding
+# their values
+FACETS = {"tag": "tags", "environment": "environment", "provider": "provider"}
+# Metadata fields holding facet values
+FACET_FIELDS = frozenset(FACETS.values())
+
+
+def timestamp():
+    """Get the current time as an ISO 8601 UTC string (e.g. "2024-05-01T12:00:00Z")."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_tags(tags):
+    """Split comma-separated tags (or clean up a list of them), dropping duplicates."""
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return list(dict.fromkeys(tag.strip() for tag in tags if tag and tag.strip()))
+
+
+def normalize_metadata(metadata):
+    """Clean up user-supplied metadata for storage.
+    
+    Tags become a list without duplicates, text fields are stripped, and
+    empty fields are left out so keys without metadata cost nothing in
+    the index.
+    
+    Args:
+        metadata (dict): Any of "tags", "environment", "provider",
+            "created" and "rotated".
+    
+    Returns:
+        dict: The metadata to store.
+    """
+    normalized = {}
+    tags = parse_tags(metadata.get("tags") or [])
+    if tags:
+        normalized["tags"] = tags
+    for field in ("environment", "provider", "created", "rotated"):
+        value = (metadata.get(field) or "").strip()
+        if value:
+            normalized[field] = value
+    return normalized
+
+
+def facet_values(metadata, facet):
+    """Get the values a key has for a facet ("tag", "environment" or "provider")."""
+    value = metadata.get(FACETS[facet])
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class TagIndex:
+    """Inverted index from facet values to the names of the keys having them.
+    
+    Terms are (facet, value) pairs such as ("tag", "billing") or
+    ("environment", "prod"). A query looks up one set per term and combines
+    them with set operations, so its cost does not grow with the number of
+    keys that match none of its terms.
+    
+    Usage:
+        tags = TagIndex({"OPENAI_KEY": {"tags": ["llm"], "environment": "prod"}})
+        tags.query(all_of=[("environment", "prod")], any_of=[("tag", "llm"), ("tag", "ml")])
+    """
+    
+    def __init__(self, metadata=None):
+        """Initialize the index.
+        
+        Args:
+            metadata (dict, optional): Key name -> metadata of the initial keys.
+        """
+        # (facet, value) -> set of names
+        self._postings = {}
+        # name -> terms of that name, to remove them again
+        self._terms = {}
+        for name, data in (metadata or {}).items():
+            # Most keys only have timestamps
+            if not FACET_FIELDS.isdisjoint(data):
+                self.set(name, data)
+    
+    def __len__(self):
+        """Get the number of keys with at least one term."""
+        return len(self._terms)
+    
+    def set(self, name, metadata):
+        """Index a key under the terms of its metadata, replacing earlier ones."""
+        self.remove(name)
+        terms = {(facet, value) for facet in FACETS for value in facet_values(metadata, facet)}
+        if not terms:
+            return
+        
+        self._terms[name] = terms
+        postings = self._postings
+        for term in terms:
+            if term in postings:
+                postings[term].add(name)
+            else:
+                postings[term] = {name}
+    
+    def remove(self, name):
+        """Remove a key from the index."""
+        for term in self._terms.pop(name, ()):
+            names = self._postings[term]
+            names.discard(name)
+            if not names:
+                del self._postings[term]
+    
+    def rename(self, old_name, new_name):
+        """Move the terms of a key to its new name."""
+        terms = self._terms.pop(old_name, None)
+        if terms is None:
+            return
+        
+        self._terms[new_name] = terms
+        for term in terms:
+            names = self._postings[term]
+            names.discard(old_name)
+            names.add(new_name)
+    
+    def names(self, term):
+        """Get the names indexed under a term (do not modify the returned set)."""
+        return self._postings.get(term, frozenset())
+    
+    def values(self, facet):
+        """Get the values of a facet in use, with the number of keys having each.
+        
+        Returns:
+            list: (value, count) pairs sorted by value.
+        """
+        return sorted((value, len(names)) for (term_facet, value), names in self._postings.items()
+                      if term_facet == facet)
+    
+    def query(self, all_of=(), any_of=()):
+        """Find the keys having every term of all_of and at least one of any_of.
+        
+        Args:
+            all_of (iterable): (facet, value) terms that must all match.
+            any_of (iterable): (facet, value) terms of which one must match
+                (ignored if empty).
+        
+        Returns:
+            set: Matching names, or None if neither list has a term (no filter).
+        """
+        all_of = list(all_of)
+        any_of = list(any_of)
+        if not all_of and not any_of:
+            return None
+        
+        required = [self.names(term) for term in all_of]
+        if any_of:
+            required.append(set().union(*(self.names(term) for term in any_of)))
+        # Intersect starting from the smallest set, so the work is bounded by it
+        required.sort(key=len)
+        if not required[0]:
+            return set()
+        result = set(required[0])
+        for names in required[1:]:
+            result &= names
+            if not result:
+                break
+        return result
@@ -1,17 +1,33 @@
 """
-Secure storage for API keys using the system keyring.
+Secure storage for API keys using a pluggable backend (system keyring by default).
 """
 
-import keyring
-import json
 import os
+import sys
+import time
+from contextlib import contextmanager
 from core.config import config
+from core.backends import create_backend
+from core.file_lock import default_lock_path
+from core.key_index import ShardedKeyIndex
+from core.key_metadata import EDITABLE_FIELDS, TagIndex, normalize_metadata, timestamp
+from core.value_cache import SecretCache
+from core.metrics import metrics, instrument_backend
 
 class KeyStorage:
-    """Handle secure API key storage using the system keyring."""
+    """Handle secure API key storage using the configured storage backend."""
     
-    def __init__(self):
-        """Initialize the key storage."""
+    def __init__(self, backend=None, ensure_index=True):
+        """Initialize the key storage.
+        
+        Args:
+            backend (StorageBackend, optional): Backend to store secrets in.
+                If not provided, the backend selected in the storage
+                configuration is used.
+            ensure_index (bool): Create the index if the backend holds none.
+                Checks that must see the backend as it is (see core.fsck)
+                pass False.
+        """
         # Get storage configuration
         storage_config = config.get_storage_config()
         
@@ -19,79 +35,571 @@ class KeyStorage:
         self.SERVICE_NAME = storage_config.get("service_name", "APIKeyManager")
         # Special key name for the index of all stored keys
         self.INDEX_KEY = storage_config.get("index_key", "__key_index__")
+        # Seconds before the cached index is re-read from the backend
+        # (a negative value keeps the cache until invalidate_index is called)
+        self.index_cache_ttl = storage_config.get("index_cache_ttl", 30)
+        
+        # Where secrets (and the index itself) are stored
+        self.backend = instrument_backend(backend if backend is not None else create_backend(storage_config))
+        # Persisted index: a manifest at INDEX_KEY plus hash-partitioned shards
+        self.index = ShardedKeyIndex(
+            self.backend,
+            self.INDEX_KEY,
+            shard_count=storage_config.get("index_shards", 8),
+            read_workers=storage_config.get("index_read_workers", 4),
+            # Shared by every process using this index, so concurrent
+            # writers merge their changes instead of losing each other's
+            lock_path=os.path.expanduser(
+                storage_config.get("index_lock_path") or default_lock_path(self.SERVICE_NAME, self.INDEX_KEY)
+            ),
+        )
+        self.index.on_reload = self._cache_index
+        
+        # In-process copy of the index: ordered names plus a set for O(1) lookups
+        self._index_names = None
+        self._index_set = set()
+        self._index_loaded_at = 0.0
+        # Tags, environments and providers of the cached keys, for find_keys()
+        self.tags = TagIndex()
+        
+        # Recently read key values, so repeated lookups skip the backend
+        # (value_cache_size 0 turns the cache off)
+        value_cache_size = storage_config.get("value_cache_size", 64)
+        self.value_cache = None
+        if value_cache_size > 0:
+            self.value_cache = SecretCache(value_cache_size, storage_config.get("value_cache_ttl", 30))
+        # Another owner of value_cache (the key agent) applies its own limits
+        self._own_value_cache = self.value_cache
+        
+        # Called with the names of changed keys after every change (an empty
+        # list when only the index changed). By default a running key agent
+        # is told to drop what it has cached.
+        self.change_listeners = []
+        if config.get("agent", "notify", True):
+            from core.agent import notify_agent
+            self.change_listeners.append(notify_agent)
+        
+        # Apply edits to the storage section made while running (the backend
+        # and index layout are only read here, at startup)
+        config.subscribe("storage", self.apply_config)
         
-        self.ensure_index_exists()
+        if ensure_index:
+            self.ensure_index_exists()
     
+    def apply_config(self, storage_config):
+        """Apply changed cache settings from the storage configuration."""
+        self.index_cache_ttl = storage_config.get("index_cache_ttl", 30)
+        if self.value_cache is not self._own_value_cache:
+            return
+        
+        value_cache_size = storage_config.get("value_cache_size", 64)
+        value_cache_ttl = storage_config.get("value_cache_ttl", 30)
+        if self.value_cache is not None:
+            # A size of 0 empties the cache and stops it from storing values
+            self.value_cache.configure(value_cache_size, value_cache_ttl)
+        elif value_cache_size > 0:
+            self.value_cache = self._own_value_cache = SecretCache(value_cache_size, value_cache_ttl)
     
     def ensure_index_exists(self):
-        """Ensure the key index exists in the keyring."""
-        index = self.get_key_index()
-        if index is None:
+        """Ensure the key index exists in the backend.
+        
+        A damaged manifest counts as existing; it is left for fsck to repair.
+        """
+        self._cached_index()
+        if not self.index.has_manifest:
             self.set_key_index([])
     
+    def _index_is_stale(self):
+        """Check whether the cached index must be re-read from the backend."""
+        if self._index_names is None:
+            return True
+        if self.index_cache_ttl < 0:
+            return False
+        return time.monotonic() - self._index_loaded_at > self.index_cache_ttl
+    
+    @metrics.timed("storage.load_index")
+    def _load_index(self):
+        """Read the index from the backend into the in-process cache."""
+        self._cache_index(self.index.load())
+    
+    def _cache_index(self, names, changed=None):
+        """Replace the cached index with the given names.
+        
+        Args:
+            names (list): Key names in index order.
+            changed (iterable, optional): Names whose metadata may have
+                changed since the cache was last set. Only those and the
+                removed names are updated in the tag index; without them
+                it is rebuilt.
+        """
+        names = list(names)
+        name_set = set(names)
+        if changed is None or self._index_names is None:
+            self.tags = TagIndex(self.index.all_metadata())
+        else:
+            for name in self._index_set - name_set:
+                self.tags.remove(name)
+            for name in changed:
+                if name in name_set:
+                    self.tags.set(name, self.index.metadata(name))
+        self._index_names = names
+        self._index_set = name_set
+        self._index_loaded_at = time.monotonic()
+    
+    def _cached_index(self):
+        """Return the cached index, reloading it first if it may be stale."""
+        if self._index_is_stale():
+            self._load_index()
+        return self._index_names
+    
+    def invalidate_index(self):
+        """Drop the cached index so the next access re-reads the backend."""
+        self._index_names = None
+        self._index_set = set()
+    
     def get_key_index(self):
         """Get the index of all stored key names."""
-        index_json = keyring.get_password(self.SERVICE_NAME, self.INDEX_KEY)
-        if index_json:
+        return list(self._cached_index())
+    
+    def notify_changed(self, names):
+        """Drop cached values of changed keys and tell the change listeners."""
+        if self.value_cache is not None:
+            self.value_cache.invalidate(names)
+        for listener in self.change_listeners:
             try:
-                return json.loads(index_json)
-            except json.JSONDecodeError:
-                return []
-        return []
+                listener(list(names))
+            except Exception as e:
+                print(f"Key change listener failed: {e}", file=sys.stderr)
     
-    def set_key_index(self, names):
-        """Set the index of all stored key names."""
-        keyring.set_password(self.SERVICE_NAME, self.INDEX_KEY, json.dumps(names))
+    @contextmanager
+    def _writing(self):
+        """Hold the index writer lock while a change writes secrets and the index.
+        
+        Another process's changes are read in (secrets included) before the
+        change is made, and a vault file is written before the lock is
+        released, so concurrent writers never drop each other's secrets.
+        The secret and index writes of the change share one backend batch,
+        so a vault file is written once per change.
+        """
+        with self.index.writing(), self.backend.batch():
+            yield
+    
+    @metrics.timed("storage.set_key_index")
+    def set_key_index(self, names, base=None, metadata=None):
+        """Set the index of all stored key names.
+        
+        Only the index shards whose contents change are rewritten. If
+        another process changed the index meanwhile, only the names added
+        to or removed from base (default: the cached index) are applied.
+        metadata maps names to their new metadata, if it changes.
+        """
+        if base is None:
+            base = self._index_names if self._index_names is not None else []
+        self._cache_index(self.index.replace(names, base, metadata), metadata or ())
+    
+    def rebuild_index(self, names, metadata=None):
+        """Rewrite every index entry so the index holds exactly the given names.
+        
+        Used to repair a damaged index; see core.fsck. metadata maps names
+        to the metadata to keep with them, as read from the backend.
+        """
+        with self.backend.batch():
+            self.index.rebuild(names, metadata)
+        self._cache_index(names)
     
+    @metrics.timed("storage.get_all_keys")
     def get_all_keys(self):
         """Get all stored key names."""
         return self.get_key_index()
     
+    @metrics.timed("storage.get_key")
     def get_key(self, name):
         """Get a specific API key by name."""
-        return keyring.get_password(self.SERVICE_NAME, name)
+        if self.value_cache is None:
+            return self.backend.get_secret(name)
+        
+        value = self.value_cache.get(name)
+        if value is None:
+            value = self.backend.get_secret(name)
+            if value is not None:
+                self.value_cache.put(name, value)
+        return value
+    
+    def lock(self):
+        """Wipe all cached key values from memory."""
+        if self.value_cache is not None:
+            self.value_cache.lock()
+    
+    def cache_stats(self):
+        """Get the value cache counters, or None if the cache is off."""
+        if self.value_cache is None:
+            return None
+        return self.value_cache.stats()
+    
+    def get_metadata(self, name):
+        """Get the metadata of a key (tags, environment, provider, created, rotated).
+        
+        Returns:
+            dict: The fields that are set, or None if the key does not exist.
+        """
+        if not self.key_exists(name):
+            return None
+        return self.index.metadata(name)
+    
+    def get_all_metadata(self):
+        """Get the metadata of every key that has any, by name."""
+        stored = self.index.all_metadata()
+        return {name: dict(stored[name]) for name in self._cached_index() if name in stored}
+    
+    @metrics.timed("storage.set_metadata")
+    def set_metadata(self, name, metadata):
+        """Replace the tags, environment and provider of a key.
+        
+        The created and rotated timestamps are kept. Only the index shard
+        holding the key is rewritten.
+        
+        Returns:
+            bool: True if stored, False if the key does not exist
+        """
+        with self._writing():
+            if not self.key_exists(name):
+                return False
+            
+            updated = self.edited_metadata(name, metadata)
+            if not self.index.set_metadata(name, updated):
+                return False
+            self.tags.set(name, updated)
+            return True
     
-    def add_key(self, name, key):
+    def edited_metadata(self, name, metadata, rotated=False):
+        """Get the stored metadata of a key with the editable fields replaced.
+        
+        Nothing is written; the result is meant for set_key_index() or
+        another index write, e.g. by an import that rotates keys.
+        
+        Args:
+            name (str): Key name.
+            metadata (dict): New tags, environment and provider (None to keep them).
+            rotated (bool): Record the current time as the rotation time.
+        
+        Returns:
+            dict: The metadata to store.
+        """
+        updated = self.index.metadata(name)
+        if metadata is not None:
+            for field in EDITABLE_FIELDS:
+                updated.pop(field, None)
+                if metadata.get(field):
+                    updated[field] = metadata[field]
+        if rotated:
+            updated["rotated"] = timestamp()
+        return normalize_metadata(updated)
+    
+    def find_keys(self, all_of=(), any_of=()):
+        """Find keys by tag, environment or provider.
+        
+        Args:
+            all_of (iterable): (facet, value) terms that must all match, e.g.
+                ("tag", "billing") or ("environment", "prod").
+            any_of (iterable): Terms of which at least one must match.
+        
+        Returns:
+            list: Matching key names in index order (all keys if no term is given).
+        """
+        names = self._cached_index()
+        matches = self.tags.query(all_of, any_of)
+        if matches is None:
+            return list(names)
+        return [name for name in names if name in matches]
+    
+    @metrics.timed("storage.add_key")
+    def add_key(self, name, key, metadata=None):
         """Add a new API key.
         
+        Args:
+            name (str): Key name.
+            key (str): Key value.
+            metadata (dict, optional): Tags, environment and provider. The
+                creation time is recorded in any case.
+        
         Returns:
             bool: True if key was added, False if the key name already exists
+            or is reserved for the index
         """
-        # Check if key already exists
-        if self.key_exists(name):
-            return False
+        with self._writing():
+            # Check if key already exists
+            if self.index.is_reserved_name(name) or self.key_exists(name):
+                return False
+            
+            metadata = normalize_metadata({**(metadata or {}), "created": timestamp()})
+            # Add to index (write-through: backend first, then the cached copy).
+            # The index has the final say: another process may have added it.
+            if not self.index.add(name, metadata):
+                return False
+            self._index_names.append(name)
+            self._index_set.add(name)
+            self.tags.set(name, metadata)
+            
+            # Store key
+            self.backend.set_secret(name, key)
+            self.notify_changed([name])
+            return True
+    
+    @metrics.timed("storage.update_key")
+    def update_key(self, name, new_key):
+        """Update an existing API key's value, recording the rotation time."""
+        with self._writing():
+            if not self.key_exists(name):
+                return False
+            # Fail before the value changes if the rotation cannot be recorded
+            self.index.check_writable()
+            
+            self.backend.set_secret(name, new_key)
+            self.index.set_metadata(name, self.edited_metadata(name, None, rotated=True))
+            self.notify_changed([name])
+            return True
+    
+    @metrics.timed("storage.delete_key")
+    def delete_key(self, name):
+        """Delete an API key."""
+        with self._writing():
+            if not self.key_exists(name):
+                return False
+            
+            # Remove from index (write-through: backend first, then the cached copy)
+            if not self.index.remove(name):
+                return False
+            self._index_names.remove(name)
+            self._index_set.discard(name)
+            self.tags.remove(name)
+            
+            # Delete from backend
+            self.backend.delete_secret(name)
+            self.notify_changed([name])
+            return True
+    
+    @metrics.timed("storage.rename_key")
+    def rename_key(self, old_name, new_name, new_value=None, metadata=None):
+        """Rename an API key, keeping its position in the index.
+        
+        The value is stored under the new name first, then the index is
+        updated in a single write, and only then is the old entry deleted.
+        An interruption at any point leaves the key readable under at
+        least one name.
         
-        # Add to index
-        index = self.get_key_index()
-        index.append(name)
-        self.set_key_index(index)
+        Args:
+            old_name (str): Current name of the key.
+            new_name (str): New name of the key.
+            new_value (str, optional): New value (default: keep the current
+                value). A new value is recorded as a rotation.
+            metadata (dict, optional): New tags, environment and provider
+                (default: keep the current ones).
+        
+        Returns:
+            bool: True if renamed, False if old_name does not exist or
+            new_name is already taken or reserved for the index
+        """
+        with self._writing():
+            if not self.key_exists(old_name) or self.key_exists(new_name) or self.index.is_reserved_name(new_name):
+                return False
+            
+            self.index.check_writable()
+            
+            value = new_value if new_value is not None else self.backend.get_secret(old_name)
+            if value is None:
+                return False
+            self.backend.set_secret(new_name, value)
+            
+            updated = self.edited_metadata(old_name, metadata, rotated=new_value is not None)
+            
+            # Index (write-through: backend first, then the cached copy)
+            if not self.index.rename(old_name, new_name, updated):
+                # Another process changed one of the names meanwhile; drop the
+                # copy unless the new name has become a key of its own
+                if new_name not in self._index_set:
+                    self.backend.delete_secret(new_name)
+                return False
+            self._index_names[self._index_names.index(old_name)] = new_name
+            self._index_set.discard(old_name)
+            self._index_set.add(new_name)
+            self.tags.remove(old_name)
+            self.tags.set(new_name, updated)
+            
+            self.backend.delete_secret(old_name)
+            self.notify_changed([old_name, new_name])
+            return True
+    
+    @metrics.timed("storage.key_exists")
+    def key_exists(self, name):
+        """Check if a key with the given name exists."""
+        self._cached_index()
+        return name in self._index_set
+    
+    @contextmanager
+    def transaction(self):
+        """Stage several changes and commit them with a single index write.
         
-        # Store key
-        keyring.set_password(self.SERVICE_NAME, name, key)
+        Usage:
+            with key_storage.transaction() as txn:
+                txn.add_key("name", "value")
+                txn.delete_key("old-name")
+        
+        Nothing is written until the block exits normally. If the block
+        raises, the staged changes are discarded.
+        """
+        txn = KeyStorageTransaction(self)
+        yield txn
+        txn.commit()
+    
+    def add_many(self, items):
+        """Add several API keys in one batch.
+        
+        Args:
+            items: Mapping or iterable of (name, key) pairs.
+        
+        Returns:
+            list: Names that were added (existing names are skipped).
+        """
+        pairs = items.items() if isinstance(items, dict) else items
+        with self.transaction() as txn:
+            return [name for name, key in pairs if txn.add_key(name, key)]
+    
+    def update_many(self, items):
+        """Update several existing API keys in one batch.
+        
+        Args:
+            items: Mapping or iterable of (name, key) pairs.
+        
+        Returns:
+            list: Names that were updated (unknown names are skipped).
+        """
+        pairs = items.items() if isinstance(items, dict) else items
+        with self.transaction() as txn:
+            return [name for name, key in pairs if txn.update_key(name, key)]
+    
+    def delete_many(self, names):
+        """Delete several API keys in one batch.
+        
+        Returns:
+            list: Names that were deleted (unknown names are skipped).
+        """
+        with self.transaction() as txn:
+            return [name for name in names if txn.delete_key(name)]
+
+
+class KeyStorageTransaction:
+    """A batch of key changes staged in memory and committed together.
+    
+    Commit order keeps the index consistent if something fails: new and
+    updated secrets are written first, then the index is written once, and
+    only then are deleted secrets removed from the backend. A failure before
+    the index write undoes the secrets already written. The whole commit
+    runs inside a backend batch, so file-based backends write once.
+    """
+    
+    def __init__(self, storage):
+        """Initialize the transaction from the storage's current index."""
+        self.storage = storage
+        self._names = storage.get_key_index()
+        self._name_set = set(self._names)
+        self._original_names = list(self._names)
+        self._original = set(self._name_set)
+        self._writes = {}
+        self._deletes = set()
+        # name -> metadata to store with the index write
+        self._metadata = {}
+        self.committed = False
+        # Names whose secret could not be removed after the index was committed
+        self.failed_deletes = []
+    
+    def key_exists(self, name):
+        """Check if a key exists, including staged changes."""
+        return name in self._name_set
+    
+    def add_key(self, name, key, metadata=None):
+        """Stage a new API key.
+        
+        Returns:
+            bool: True if staged, False if the key name already exists or
+            is reserved for the index
+        """
+        if name in self._name_set or self.storage.index.is_reserved_name(name):
+            return False
+        
+        self._names.append(name)
+        self._name_set.add(name)
+        self._writes[name] = key
+        self._deletes.discard(name)
+        self._metadata[name] = normalize_metadata({**(metadata or {}), "created": timestamp()})
         return True
     
     def update_key(self, name, new_key):
-        """Update an existing API key's value."""
-        if not self.key_exists(name):
+        """Stage a new value for an existing API key."""
+        if name not in self._name_set:
             return False
         
-        keyring.set_password(self.SERVICE_NAME, name, new_key)
+        self._writes[name] = new_key
+        if name in self._original:
+            self._metadata[name] = self.storage.edited_metadata(name, None, rotated=True)
         return True
     
     def delete_key(self, name):
-        """Delete an API key."""
-        if not self.key_exists(name):
+        """Stage the deletion of an API key."""
+        if name not in self._name_set:
             return False
         
-        # Remove from index
-        index = self.get_key_index()
-        index.remove(name)
-        self.set_key_index(index)
-        
-        # Delete from keyring
-        keyring.delete_password(self.SERVICE_NAME, name)
+        self._names.remove(name)
+        self._name_set.discard(name)
+        self._writes.pop(name, None)
+        self._metadata.pop(name, None)
+        if name in self._original:
+            self._deletes.add(name)
         return True
     
-    def key_exists(self, name):
-        """Check if a key with the given name exists."""
-        return name in self.get_key_index()
+    @metrics.timed("storage.commit")
+    def commit(self):
+        """Write the staged secrets and the index, rolling back on failure."""
+        if self.committed:
+            return
+        
+        backend = self.storage.backend
+        with self.storage.index.writing(), backend.batch():
+            # (name, previous value) for every secret written, used for rollback
+            undo = []
+            try:
+                for name, key in self._writes.items():
+                    previous = backend.get_secret(name) if name in self._original else None
+                    backend.set_secret(name, key)
+                    undo.append((name, previous))
+                
+                if self._names != self._original_names or self._metadata:
+                    self.storage.set_key_index(self._names, self._original_names, self._metadata)
+            except Exception:
+                self._rollback(undo)
+                raise
+            
+            self.committed = True
+            
+            # The index no longer references these, so a failure only leaves an orphan
+            for name in self._deletes:
+                try:
+                    backend.delete_secret(name)
+                except Exception:
+                    self.failed_deletes.append(name)
+        
+        if self._writes or self._deletes:
+            self.storage.notify_changed(list(self._writes) + list(self._deletes))
+    
+    def _rollback(self, undo):
+        """Restore secrets overwritten by a failed commit."""
+        backend = self.storage.backend
+        for name, previous in reversed(undo):
+            try:
+                if previous is None:
+                    backend.delete_secret(name)
+                else:
+                    backend.set_secret(name, previous)
+            except Exception as e:
+                print(f"Failed to roll back key '{name}': {e}", file=sys.stderr)
+        # The cached index may not match what the backend holds any more
+        self.storage.invalidate_index()
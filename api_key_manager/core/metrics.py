@@ -0,0 +1,248 @@
+"""
+Operation counters and latency histograms.
+
+Turned on with "enabled" in the "metrics" section of config.json. While
+disabled, instrumented calls cost a single attribute check.
+"""
+
+import atexit
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from core.config import config
+
+# Upper bounds (ms) of the latency histogram buckets; slower calls go in "inf"
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+class Histogram:
+    """Latency distribution of one operation."""
+    
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+    
+    def observe(self, ms):
+        """Add one duration in milliseconds."""
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+    
+    def percentile(self, fraction):
+        """Estimate a percentile as the upper bound of the bucket it falls in
+        (or the slowest call, if that is lower)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+    
+    def to_dict(self):
+        """Summarize the histogram for a report."""
+        return {
+            "count": self.count,
+            "total_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else None,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                **{f"<={bound}": hits for bound, hits in zip(BUCKETS_MS, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+class Metrics:
+    """Collect counters and latency histograms by operation name.
+    
+    Usage:
+        @metrics.timed("storage.get_key")
+        def get_key(self, name): ...
+        
+        with metrics.timer("ui.populate"):
+            ...
+        
+        metrics.count("storage.cache_hit")
+    
+    Recording is thread-safe. Failed calls are timed like successful ones
+    and also counted as "<name>.errors".
+    """
+    
+    def __init__(self, enabled=False):
+        """Initialize the collector."""
+        self.enabled = enabled
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, name, ms):
+        """Record one duration in milliseconds."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(ms)
+    
+    def count(self, name, amount=1):
+        """Add to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+    
+    @contextmanager
+    def timer(self, name):
+        """Time the enclosed block."""
+        if not self.enabled:
+            yield
+            return
+        
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count(f"{name}.errors")
+            raise
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+    
+    def timed(self, name):
+        """Decorator that times every call of a function."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except BaseException:
+                    self.count(f"{name}.errors")
+                    raise
+                finally:
+                    self.observe(name, (time.perf_counter() - start) * 1000)
+            return wrapper
+        return decorator
+    
+    def snapshot(self):
+        """Get all counters and histogram summaries.
+        
+        Returns:
+            dict: "uptime_s", "counters" and "timings" (by operation name).
+        """
+        with self._lock:
+            return {
+                "uptime_s": time.time() - self.started,
+                "counters": dict(sorted(self._counters.items())),
+                "timings": {name: self._histograms[name].to_dict() for name in sorted(self._histograms)},
+            }
+    
+    def reset(self):
+        """Clear all recorded data."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started = time.time()
+    
+    def dump(self, path):
+        """Write a snapshot to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        print(f"Metrics written to {path}", file=sys.stderr)
+    
+    def format_report(self):
+        """Format the timings and counters as a plain text table."""
+        snapshot = self.snapshot()
+        lines = [f"{'operation':<40} {'count':>7} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name, timing in snapshot["timings"].items():
+            lines.append(
+                f"{name:<40} {timing['count']:>7} {timing['mean_ms']:>9.3f} "
+                f"{timing['p95_ms']:>9.3f} {timing['max_ms']:>9.3f}"
+            )
+        if snapshot["counters"]:
+            lines.append("")
+            lines.append(f"{'counter':<40} {'value':>7}")
+            for name, value in snapshot["counters"].items():
+                lines.append(f"{name:<40} {value:>7}")
+        return "\n".join(lines)
+
+
+class InstrumentedBackend:
+    """Wrap a StorageBackend so each call is timed as "backend.<method>"."""
+    
+    def __init__(self, backend, metrics):
+        """Initialize the wrapper around backend."""
+        self.backend = backend
+        self.metrics = metrics
+    
+    def __getattr__(self, name):
+        # Everything not timed below (batch, list_names, flags) passes through
+        return getattr(self.backend, name)
+    
+    def get_secret(self, name):
+        """Get a secret, timing the call."""
+        with self.metrics.timer("backend.get_secret"):
+            return self.backend.get_secret(name)
+    
+    def set_secret(self, name, value):
+        """Store a secret, timing the call."""
+        with self.metrics.timer("backend.set_secret"):
+            self.backend.set_secret(name, value)
+    
+    def delete_secret(self, name):
+        """Delete a secret, timing the call."""
+        with self.metrics.timer("backend.delete_secret"):
+            self.backend.delete_secret(name)
+
+
+def instrument_backend(backend):
+    """Wrap a backend for timing if metrics are enabled, else return it as is."""
+    if not metrics.enabled:
+        return backend
+    return InstrumentedBackend(backend, metrics)
+
+
+def _dump_at_exit():
+    """Write the metrics to the configured file when the process ends."""
+    path = config.get("metrics", "dump_path", "")
+    if metrics.enabled and path:
+        try:
+            metrics.dump(path)
+        except OSError as e:
+            print(f"Error writing metrics: {e}", file=sys.stderr)
+
+
+def _apply_config(metrics_config):
+    """Turn recording on or off when the metrics configuration changes.
+    
+    Backend calls are only timed for storage opened while metrics were on.
+    """
+    metrics.enabled = metrics_config.get("enabled", False)
+
+
+# Create a global metrics instance
+metrics = Metrics(enabled=config.get("metrics", "enabled", False))
+config.subscribe("metrics", _apply_config)
+atexit.register(_dump_at_exit)
@@ -0,0 +1,62 @@
+"""
+Lightweight timing of application startup phases.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from core.metrics import metrics
+
+class StartupProfiler:
+    """Record how long each startup phase takes.
+    
+    Phases are only recorded when the profiler is enabled (with the
+    --profile-startup command line flag), so the timing calls cost next
+    to nothing otherwise. Phases may be recorded from worker threads.
+    """
+    
+    def __init__(self):
+        """Initialize the profiler; times are relative to its creation."""
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.phases = []
+        self.reported = False
+    
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as a named phase."""
+        if not self.enabled and not metrics.enabled:
+            yield
+            return
+        
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+    
+    def record(self, name, start, end):
+        """Record a phase from its start and end perf_counter() times."""
+        if self.enabled:
+            self.phases.append((name, start - self.started, end - start))
+        metrics.observe(f"startup.{name}", (end - start) * 1000)
+    
+    def mark(self, name):
+        """Record a point in time (a phase with no duration)."""
+        now = time.perf_counter()
+        self.record(name, now, now)
+    
+    def report(self, file=None):
+        """Print the recorded phases once, in the order they started."""
+        if not self.enabled or self.reported:
+            return
+        
+        self.reported = True
+        file = file or sys.stderr
+        print("Startup profile (ms since start / duration):", file=file)
+        for name, offset, duration in sorted(self.phases, key=lambda phase: phase[1]):
+            print(f"  {offset * 1000:9.1f}  {duration * 1000:9.1f}  {name}", file=file)
+
+
+# Create a global profiler instance
+startup_profiler = StartupProfiler()
@@ -0,0 +1,99 @@
+"""
+Application resources (icons), embedded in a generated Python module.
+
+build_exe.py calls generate() before packaging, so the executable carries
+its resources inside core/resources_data.py instead of as loose files that
+are unpacked and looked up on every start. Where that module has not been
+generated (running from a source checkout), resources are read from the
+resources directory instead.
+
+    python -m core.resources        (generate the module by hand)
+"""
+
+import base64
+import sys
+from pathlib import Path
+
+# Directory the resources are read from when they are not embedded
+RESOURCE_DIR = Path(__file__).resolve().parent.parent / "resources"
+# Generated module holding the embedded resources
+DATA_MODULE_PATH = Path(__file__).resolve().parent / "resources_data.py"
+
+# name -> bytes of every resource loaded so far
+_cache = {}
+
+
+def resource_names():
+    """Get the names of all files in the resources directory ("icons/app_icon.ico")."""
+    return sorted(
+        path.relative_to(RESOURCE_DIR).as_posix()
+        for path in RESOURCE_DIR.rglob("*") if path.is_file()
+    )
+
+
+def resource_path(name):
+    """Get the path of a resource file, for tools that need one on disk."""
+    return str(RESOURCE_DIR / name)
+
+
+def load(name):
+    """Get the contents of a resource.
+    
+    Args:
+        name (str): Resource name relative to the resources directory,
+            with forward slashes (e.g. "icons/app_icon.ico").
+    
+    Returns:
+        bytes: The resource, or None if it does not exist.
+    """
+    data = _cache.get(name)
+    if data is None:
+        data = _load(name)
+        if data is not None:
+            _cache[name] = data
+    return data
+
+
+def _load(name):
+    """Read a resource from the embedded module, or else from its file."""
+    try:
+        from core.resources_data import RESOURCES
+    except ImportError:
+        RESOURCES = {}
+    
+    encoded = RESOURCES.get(name)
+    if encoded is not None:
+        return base64.b64decode(encoded)
+    
+    path = RESOURCE_DIR / name
+    if not path.is_file():
+        return None
+    return path.read_bytes()
+
+
+def generate(output_path=DATA_MODULE_PATH):
+    """Write the module that embeds every file of the resources directory.
+    
+    Returns:
+        list: Names of the embedded resources.
+    """
+    names = resource_names()
+    lines = [
+        '"""',
+        "Embedded application resources. Generated by core/resources.py; do not edit.",
+        '"""',
+        "",
+        "RESOURCES = {",
+    ]
+    for name in names:
+        encoded = base64.b64encode((RESOURCE_DIR / name).read_bytes()).decode("ascii")
+        lines.append(f"    {name!r}: {encoded!r},")
+    lines.append("}")
+    
+    Path(output_path).write_text("\n".join(lines) + "\n")
+    print(f"Embedded {len(names)} resources in {output_path}", file=sys.stderr)
+    return names
+
+
+if __name__ == "__main__":
+    generate()
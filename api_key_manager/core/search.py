@@ -0,0 +1,248 @@
+"""
+Search over stored key names.
+"""
+
+import heapq
+from collections import Counter
+
+class TrigramIndex:
+    """Inverted index from character trigrams to the names containing them.
+    
+    Used for typo-tolerant matching: names are ranked by the share of the
+    query's trigrams they contain, so a long name is not penalized for
+    holding more than the query; among names covering the query equally,
+    those closest to it in length (highest Jaccard similarity) come first.
+    """
+    
+    # Trigrams found in more than this share of names are only used when a
+    # query has nothing more selective, since they barely narrow the result
+    COMMON_GRAM_SHARE = 0.05
+    # Candidates scored exactly per requested result
+    CANDIDATES_PER_RESULT = 4
+    
+    def __init__(self, names=()):
+        """Initialize the index with an optional list of names."""
+        self._postings = {}
+        self._grams = {}
+        for name in names:
+            self.add(name)
+    
+    @staticmethod
+    def trigrams(text):
+        """Get the set of trigrams of a string, padded to weight its start."""
+        padded = f"  {text.casefold()} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    
+    def __len__(self):
+        """Get the number of indexed names."""
+        return len(self._grams)
+    
+    def add(self, name):
+        """Add a name to the index."""
+        if name in self._grams:
+            return
+        
+        grams = self.trigrams(name)
+        self._grams[name] = grams
+        postings = self._postings
+        for gram in grams:
+            if gram in postings:
+                postings[gram].add(name)
+            else:
+                postings[gram] = {name}
+    
+    def remove(self, name):
+        """Remove a name from the index."""
+        grams = self._grams.pop(name, None)
+        if grams is None:
+            return
+        
+        for gram in grams:
+            names = self._postings[gram]
+            names.discard(name)
+            if not names:
+                del self._postings[gram]
+    
+    def rename(self, old_name, new_name):
+        """Re-index a renamed name."""
+        self.remove(old_name)
+        self.add(new_name)
+    
+    def search(self, query, limit=20, min_score=0.4, exclude=()):
+        """Find the names most similar to the query.
+        
+        Args:
+            query (str): Text to match.
+            limit (int): Maximum number of results.
+            min_score (float): Minimum share of the query's trigrams (0 to
+                1) a name must contain to be included.
+            exclude (set, optional): Names to leave out, e.g. those already
+                found another way. They take up no candidate slots.
+        
+        Returns:
+            list: (score, name) tuples, best first.
+        """
+        query_grams = self.trigrams(query)
+        postings = [self._postings[g] for g in query_grams if g in self._postings]
+        if not postings:
+            return []
+        
+        # Count shared trigrams using the selective postings only
+        postings.sort(key=len)
+        common = max(limit, int(len(self._grams) * self.COMMON_GRAM_SHARE))
+        selective = [p for p in postings if len(p) <= common] or postings[:1]
+        counts = Counter()
+        for names in selective:
+            counts.update(names)
+        names = [name for name in counts if name not in exclude] if exclude else counts
+        candidates = heapq.nlargest(limit * self.CANDIDATES_PER_RESULT, names, key=counts.__getitem__)
+        
+        # Score the candidates exactly on their full trigram sets
+        results = []
+        query_size = len(query_grams)
+        query_chars = Counter(query.casefold())
+        query_length = sum(query_chars.values())
+        for name in candidates:
+            grams = self._grams[name]
+            shared = len(query_grams & grams)
+            # Swapped letters break up to three trigrams but no characters
+            shared_chars = sum((query_chars & Counter(name.casefold())).values())
+            score = (shared / query_size + shared_chars / query_length) / 2
+            if score >= min_score:
+                results.append((score, shared / (query_size + len(grams) - shared), name))
+        return [(score, name) for score, similarity, name in heapq.nlargest(limit, results)]
+
+
+class KeySearch:
+    """Case-insensitive substring search over key names.
+    
+    Names are casefolded once when they are added rather than on every
+    query. When a query contains the previous query (for example, the user
+    typed another character), only the previous results are scanned.
+    
+    rank() adds typo-tolerant matches from a trigram index. The index can
+    be built elsewhere (e.g. on a worker thread) and handed over with
+    set_trigram_index(); otherwise it is built on first use. Either way it
+    is then kept up to date as names are added and removed.
+    """
+    
+    # Queries shorter than this get no typo-tolerant matches
+    FUZZY_MIN_QUERY = 3
+    # Larger result sets keep index order; sorting them costs more than it helps
+    RANK_MAX_RESULTS = 20000
+    
+    def __init__(self, names=()):
+        """Initialize the search with an optional list of names."""
+        self.set_names(names)
+    
+    def set_names(self, names):
+        """Replace all searchable names."""
+        self._names = list(names)
+        self._folded = {name: name.casefold() for name in self._names}
+        self._trigrams = None
+        self._reset_results()
+    
+    def add(self, name):
+        """Add a name to the search."""
+        if name in self._folded:
+            return
+        
+        self._names.append(name)
+        folded = name.casefold()
+        self._folded[name] = folded
+        if self._last_results is not None and self._last_query in folded:
+            self._last_results.append(name)
+        if self._trigrams is not None:
+            self._trigrams.add(name)
+    
+    def remove(self, name):
+        """Remove a name from the search."""
+        if name not in self._folded:
+            return
+        
+        self._names.remove(name)
+        del self._folded[name]
+        if self._last_results is not None and name in self._last_results:
+            self._last_results.remove(name)
+        if self._trigrams is not None:
+            self._trigrams.remove(name)
+    
+    def rename(self, old_name, new_name):
+        """Replace a name in the search."""
+        self.remove(old_name)
+        self.add(new_name)
+    
+    def names(self):
+        """Get a copy of all searchable names."""
+        return list(self._names)
+    
+    def set_trigram_index(self, trigrams):
+        """Use a prebuilt trigram index, catching it up with later changes."""
+        current = set(self._folded)
+        indexed = set(trigrams._grams)
+        for name in indexed - current:
+            trigrams.remove(name)
+        for name in current - indexed:
+            trigrams.add(name)
+        self._trigrams = trigrams
+    
+    def search(self, query):
+        """Find the names containing the query.
+        
+        Args:
+            query (str): Text to search for (case-insensitive).
+        
+        Returns:
+            list: Matching names, in the order they were added.
+        """
+        query = query.casefold()
+        if not query:
+            self._reset_results()
+            return list(self._names)
+        
+        if self._last_results is not None and self._last_query in query:
+            candidates = self._last_results
+        else:
+            candidates = self._names
+        
+        folded = self._folded
+        results = [name for name in candidates if query in folded[name]]
+        self._last_query = query
+        self._last_results = results
+        return list(results)
+    
+    def rank(self, query, fuzzy_limit=20):
+        """Find names matching the query, best matches first.
+        
+        Substring matches come first, ordered by where the match starts
+        (prefix matches first) and then by name length. They are followed
+        by up to fuzzy_limit typo-tolerant matches from the trigram index.
+        Very broad queries (more than RANK_MAX_RESULTS matches) are returned
+        in index order.
+        
+        Returns:
+            list: Matching names in ranked order.
+        """
+        results = self.search(query)
+        folded_query = query.casefold()
+        if not folded_query:
+            return results
+        
+        if len(results) > self.RANK_MAX_RESULTS:
+            return results
+        
+        folded = self._folded
+        results.sort(key=lambda name: (folded[name].find(folded_query), len(name)))
+        if fuzzy_limit <= 0 or len(folded_query) < self.FUZZY_MIN_QUERY:
+            return results
+        
+        if self._trigrams is None:
+            self._trigrams = TrigramIndex(self._names)
+        matches = self._trigrams.search(query, fuzzy_limit, exclude=set(results))
+        results.extend(name for score, name in matches)
+        return results
+    
+    def _reset_results(self):
+        """Forget the previous query so the next search scans all names."""
+        self._last_query = None
+        self._last_results = None
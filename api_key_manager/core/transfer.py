@@ -0,0 +1,408 @@
+"""
+Bulk import and export of API keys.
+
+Imports read .env, JSON lines and CSV files (or an encrypted export) one
+record at a time, write the secrets through a bounded pool of worker
+threads and update the key index once at the end. Exports fetch secrets a
+few at a time and write each one as its own encrypted record, so neither
+direction holds every secret in memory at once.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from core.backends import make_cipher
+from core.key_metadata import timestamp
+
+# Encrypted export file layout:
+#   MAGIC, scrypt parameters (log2 n, r, p), 16-byte salt, then records of
+#   ">I" length + 12-byte nonce + AES-GCM ciphertext of {"name", "value"}.
+# Each record is authenticated together with the header and its position,
+# and a final empty record marks the end, so reordered, spliced or
+# truncated files are rejected.
+EXPORT_MAGIC = b"AKMX\x01"
+EXPORT_PARAMS = struct.Struct(">BBB")
+RECORD_LENGTH = struct.Struct(">I")
+RECORD_SEQ = struct.Struct(">Q")
+SALT_SIZE = 16
+NONCE_SIZE = 12
+SCRYPT_LOG2_N = 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+# Named in the error raised without the cryptography package ("export" extra)
+EXPORT_FEATURE = "Encrypted key export"
+
+# Formats understood by read_records (by file extension)
+FORMATS = {
+    ".env": "env",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "jsonl",
+    ".csv": "csv",
+    ".akmx": "encrypted",
+}
+
+# Escape sequences understood in double-quoted .env values; other escaped
+# characters stand for themselves
+ENV_ESCAPES = {"n": "\n", "r": "\r", "t": "\t"}
+ENV_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+# A quoted .env value at the start of the text, up to its closing quote
+ENV_QUOTED = re.compile(r"\"(?:[^\"\\]|\\.)*\"|'[^']*'", re.DOTALL)
+
+
+class TransferError(Exception):
+    """Raised when an import or export file cannot be read or written."""
+
+
+def detect_format(path):
+    """Guess the format of a file from its extension and first bytes.
+    
+    Returns:
+        str: "env", "jsonl", "csv" or "encrypted"
+    """
+    with open(path, "rb") as f:
+        if f.read(len(EXPORT_MAGIC)) == EXPORT_MAGIC:
+            return "encrypted"
+    
+    extension = os.path.splitext(path)[1].lower()
+    if extension in FORMATS:
+        return FORMATS[extension]
+    raise TransferError(f"Cannot tell the format of '{path}' from its extension")
+
+
+def parse_env(lines):
+    """Yield (name, value) pairs from the lines of a .env file.
+    
+    Blank lines and comments are skipped, an "export " prefix is allowed
+    and values may be wrapped in single or double quotes. A comment may
+    follow a value, after a space if the value is not quoted.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export "):].lstrip()
+        
+        name, sep, value = line.partition("=")
+        name = name.strip()
+        if not sep or not name:
+            raise TransferError(f"Line {number}: expected NAME=VALUE")
+        
+        value = value.strip()
+        quoted = ENV_QUOTED.match(value)
+        if quoted and value[quoted.end():].lstrip().startswith("#"):
+            # A trailing comment after the closing quote
+            value = value[:quoted.end()]
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            quote = value[0]
+            value = value[1:-1]
+            if quote == '"':
+                # One pass, so an escaped backslash is never read as the
+                # start of another escape ("\\n" is a backslash and an n)
+                value = ENV_ESCAPE.sub(lambda match: ENV_ESCAPES.get(match.group(1), match.group(1)), value)
+        elif " #" in value:
+            # Unquoted values may carry a trailing comment
+            value = value.split(" #", 1)[0].rstrip()
+        yield name, value
+
+
+def parse_jsonl(lines):
+    """Yield (name, value) pairs from JSON lines of {"name": ..., "value": ...}."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            yield str(record["name"]), str(record["value"])
+        except (json.JSONDecodeError, KeyError, TypeError):
+            raise TransferError(f"Line {number}: expected {{\"name\": ..., \"value\": ...}}")
+
+
+def parse_csv(lines):
+    """Yield (name, value) pairs from CSV rows.
+    
+    The name and value are taken from the "name" and "value" columns if the
+    first row is a header naming them, otherwise from the first two columns.
+    """
+    reader = csv.reader(lines)
+    name_col, value_col = 0, 1
+    for row in reader:
+        if reader.line_num == 1:
+            header = [column.strip().lower() for column in row]
+            if "name" in header and "value" in header:
+                name_col, value_col = header.index("name"), header.index("value")
+                continue
+        if not any(row):
+            continue
+        if len(row) <= max(name_col, value_col):
+            raise TransferError(f"Row {reader.line_num}: expected a name and a value")
+        yield row[name_col].strip(), row[value_col]
+
+
+PARSERS = {
+    "env": parse_env,
+    "jsonl": parse_jsonl,
+    "csv": parse_csv,
+}
+
+
+def read_records(path, file_format=None, passphrase=None):
+    """Yield (name, value) pairs from an import file, one at a time.
+    
+    Args:
+        path (str): File to read.
+        file_format (str, optional): "env", "jsonl", "csv" or "encrypted".
+            Detected from the file if not given.
+        passphrase (str, optional): Passphrase of an encrypted export.
+    """
+    file_format = file_format or detect_format(path)
+    if file_format == "encrypted":
+        if not passphrase:
+            raise TransferError("A passphrase is required to read an encrypted export")
+        yield from read_encrypted(path, passphrase)
+        return
+    
+    if file_format not in PARSERS:
+        raise TransferError(f"Unknown import format '{file_format}'")
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from PARSERS[file_format](f)
+
+
+def derive_key(passphrase, salt, log2_n=SCRYPT_LOG2_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Derive a 256-bit export key from a passphrase with scrypt."""
+    n = 1 << log2_n
+    return hashlib.scrypt(
+        passphrase.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+        maxmem=2 * 128 * n * r, dklen=32
+    )
+
+
+def write_encrypted(path, records, passphrase):
+    """Write (name, value) pairs to an encrypted export file.
+    
+    Records are encrypted and written as they arrive. The file is written
+    under a temporary name and moved into place once complete.
+    
+    Returns:
+        int: Number of records written.
+    """
+    salt = os.urandom(SALT_SIZE)
+    header = EXPORT_MAGIC + EXPORT_PARAMS.pack(SCRYPT_LOG2_N, SCRYPT_R, SCRYPT_P) + salt
+    cipher = make_cipher(derive_key(passphrase, salt), EXPORT_FEATURE)
+    
+    def encrypt(seq, plaintext):
+        nonce = os.urandom(NONCE_SIZE)
+        data = nonce + cipher.encrypt(nonce, plaintext, header + RECORD_SEQ.pack(seq))
+        return RECORD_LENGTH.pack(len(data)) + data
+    
+    tmp_path = f"{path}.tmp"
+    count = 0
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for name, value in records:
+                f.write(encrypt(count, json.dumps({"name": name, "value": value}).encode("utf-8")))
+                count += 1
+            f.write(encrypt(count, b""))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def read_encrypted(path, passphrase):
+    """Yield (name, value) pairs from an encrypted export file."""
+    with open(path, "rb") as f:
+        header = f.read(len(EXPORT_MAGIC) + EXPORT_PARAMS.size + SALT_SIZE)
+        if len(header) < len(EXPORT_MAGIC) + EXPORT_PARAMS.size + SALT_SIZE or not header.startswith(EXPORT_MAGIC):
+            raise TransferError(f"'{path}' is not an encrypted API key export")
+        log2_n, r, p = EXPORT_PARAMS.unpack_from(header, len(EXPORT_MAGIC))
+        salt = header[-SALT_SIZE:]
+        cipher = make_cipher(derive_key(passphrase, salt, log2_n, r, p), EXPORT_FEATURE)
+        from cryptography.exceptions import InvalidTag
+        
+        seq = 0
+        while True:
+            length = f.read(RECORD_LENGTH.size)
+            if len(length) < RECORD_LENGTH.size:
+                raise TransferError(f"'{path}' is truncated")
+            size = RECORD_LENGTH.unpack(length)[0]
+            data = f.read(size)
+            if len(data) < size:
+                raise TransferError(f"'{path}' is truncated")
+            try:
+                plaintext = cipher.decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], header + RECORD_SEQ.pack(seq))
+            except (InvalidTag, ValueError):
+                if seq == 0:
+                    raise TransferError("Wrong passphrase, or the export file is damaged")
+                raise TransferError(f"Record {seq} of '{path}' is damaged")
+            if not plaintext:
+                return
+            record = json.loads(plaintext)
+            yield record["name"], record["value"]
+            seq += 1
+
+
+def _bounded_map(executor, func, items, limit):
+    """Like executor.map, but with at most limit calls queued or running.
+    
+    Yields (item, result) in completion order. The first exception raised
+    by func is re-raised once the calls already running have finished.
+    """
+    pending = {}
+    try:
+        for item in items:
+            if len(pending) >= limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            pending[executor.submit(func, item)] = item
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        wait(pending)
+
+
+def import_keys(storage, records, overwrite=False, workers=4):
+    """Write (name, value) pairs to storage and update the index once.
+    
+    Secrets are written by up to `workers` threads (one for backends that do
+    not allow concurrent calls), with a bounded number of records in flight.
+    If any write fails, the secrets written so far are restored and the
+    index is left untouched. Added keys get a creation time and updated
+    keys a rotation time, as with KeyStorage.add_key() and update_key().
+    
+    Args:
+        storage (KeyStorage): Storage to import into.
+        records: Iterable of (name, value) pairs, e.g. from read_records().
+        overwrite (bool): Replace the values of keys that already exist.
+        workers (int): Maximum number of parallel backend writes.
+    
+    Returns:
+        dict: Lists of "added", "updated" and "skipped" names, and of the
+        names skipped because their value is "empty".
+    """
+    backend = storage.backend
+    if not backend.concurrent_writes:
+        workers = 1
+    
+    names = storage.get_key_index()
+    existing = set(names)
+    result = {"added": [], "updated": [], "skipped": [], "empty": []}
+    seen = set()
+    # Accepted names in file order, so new keys are indexed in that order
+    order = []
+    # (name, previous value) for every secret written, used for rollback
+    undo = []
+    
+    def accepted(records):
+        for name, value in records:
+            if name and not value:
+                # An empty line such as "KEY=" would store an empty secret
+                result["empty"].append(name)
+                continue
+            if (not name or name in seen or (name in existing and not overwrite)
+                    or storage.index.is_reserved_name(name)):
+                result["skipped"].append(name)
+                continue
+            seen.add(name)
+            order.append(name)
+            yield name, value
+    
+    def write(record):
+        name, value = record
+        previous = backend.get_secret(name) if name in existing else None
+        backend.set_secret(name, value)
+        # Recorded by the worker, so writes finishing after a failure are undone too
+        undo.append((name, previous))
+    
+    # The lock is held until the batch is written, see KeyStorage._writing()
+    with storage.index.writing(), backend.batch():
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for (name, value), _ in _bounded_map(executor, write, accepted(records), workers * 4):
+                    result["updated" if name in existing else "added"].append(name)
+            
+            if result["added"] or result["updated"]:
+                added = set(result["added"])
+                result["added"] = [name for name in order if name in added]
+                created = {"created": timestamp()}
+                metadata = {name: created for name in result["added"]}
+                for name in result["updated"]:
+                    metadata[name] = storage.edited_metadata(name, None, rotated=True)
+                storage.set_key_index(names + result["added"], names, metadata)
+        except Exception:
+            _restore(backend, undo)
+            storage.invalidate_index()
+            raise
+    
+    if undo:
+        storage.notify_changed(result["added"] + result["updated"])
+    return result
+
+
+def _restore(backend, undo):
+    """Undo the secret writes of a failed import."""
+    for name, previous in reversed(undo):
+        try:
+            if previous is None:
+                backend.delete_secret(name)
+            else:
+                backend.set_secret(name, previous)
+        except Exception as e:
+            print(f"Failed to roll back key '{name}': {e}", file=sys.stderr)
+
+
+def iter_secrets(storage, names=None, workers=4):
+    """Yield (name, value) pairs for stored keys, fetching a few at a time.
+    
+    Values are fetched by up to `workers` threads on backends that allow
+    concurrent calls, and yielded in index order. Keys without a stored
+    value are skipped.
+    """
+    backend = storage.backend
+    names = storage.get_key_index() if names is None else list(names)
+    if not backend.concurrent_reads:
+        workers = 1
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        window = max(1, workers) * 4
+        for start in range(0, len(names), window):
+            chunk = names[start:start + window]
+            for name, value in zip(chunk, executor.map(backend.get_secret, chunk)):
+                if value is not None:
+                    yield name, value
+
+
+def export_keys(storage, path, passphrase, names=None, workers=4):
+    """Export stored keys to an encrypted file.
+    
+    Args:
+        storage (KeyStorage): Storage to export from.
+        path (str): File to write.
+        passphrase (str): Passphrase to encrypt the export with.
+        names (list, optional): Keys to export (default: all keys).
+        workers (int): Maximum number of parallel backend reads.
+    
+    Returns:
+        int: Number of keys exported.
+    """
+    if not passphrase:
+        raise TransferError("A passphrase is required to export keys")
+    return write_encrypted(path, iter_secrets(storage, names, workers), passphrase)
@@ -0,0 +1,103 @@
+"""
+In-memory cache of decrypted key values.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class SecretCache:
+    """Least-recently-used cache of key values that expire after a TTL.
+    
+    Values are held as UTF-8 in bytearrays, which are overwritten with zeros
+    when they expire, are evicted or invalidated, or when the cache is
+    locked, so a dropped secret does not linger in memory until garbage
+    collection. (The str returned by get() is a copy Python cannot wipe.)
+    The cache may be used from several threads.
+    """
+    
+    def __init__(self, max_entries=64, ttl=30):
+        """Initialize the cache.
+        
+        Args:
+            max_entries (int): Maximum number of cached values (0 disables caching).
+            ttl (float): Seconds a value stays valid (a negative value never expires).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, name):
+        """Get a cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                buffer, expires = entry
+                if expires is None or time.monotonic() <= expires:
+                    self._entries.move_to_end(name)
+                    self.hits += 1
+                    return buffer.decode("utf-8")
+                self._drop(name)
+                self.evictions += 1
+            self.misses += 1
+            return None
+    
+    def put(self, name, value):
+        """Cache a value, evicting the least recently used ones if full."""
+        if self.max_entries <= 0:
+            return
+        
+        expires = time.monotonic() + self.ttl if self.ttl >= 0 else None
+        with self._lock:
+            self._drop(name)
+            self._entries[name] = (bytearray(value.encode("utf-8")), expires)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def configure(self, max_entries, ttl):
+        """Change the limits, evicting values beyond the new size.
+        
+        Values already cached keep the expiry they were given.
+        """
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = ttl
+            while self._entries and len(self._entries) > max(max_entries, 0):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def invalidate(self, names=None):
+        """Wipe the given names, or every value if names is None."""
+        with self._lock:
+            for name in list(self._entries) if names is None else names:
+                self._drop(name)
+    
+    def lock(self):
+        """Wipe every cached value (e.g. when the application is locked)."""
+        self.invalidate()
+    
+    def stats(self):
+        """Get the cache counters.
+        
+        Returns:
+            dict: Entry count, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+    
+    def _drop(self, name):
+        """Remove an entry and zero its buffer (caller holds the lock)."""
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            buffer = entry[0]
+            buffer[:] = bytes(len(buffer))
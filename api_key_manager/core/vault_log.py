@@ -0,0 +1,345 @@
+"""
+Append-only, memory-mapped vault file for large numbers of API keys.
+
+File layout:
+
+    HEADER  MAGIC
+    RECORD* type (1 byte) | payload length (4 bytes) | payload
+    FOOTER  a RECORD of type FOOTER holding the encrypted offset index
+    TRAILER footer offset (8 bytes) | footer length (4 bytes) | TRAILER_MAGIC
+
+Every payload is a 12-byte nonce followed by AES-GCM ciphertext, with
+the record's type and length bytes as associated data. Entry payloads
+decrypt to name length (4 bytes) | name | value; tombstones carry the
+name only. The footer decrypts to a JSON object mapping each live name
+to the offset and length of its newest record.
+
+Changes append new records, then rewrite only the footer and trailer.
+Opening the file decrypts nothing but the footer; values are decrypted
+from the memory map on demand. When superseded records and tombstones
+make up more than the configured share of the file, the live records
+are copied into a fresh file.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from contextlib import contextmanager
+
+from core.backends import StorageBackend, make_cipher, write_file_atomic
+
+RECORD_ENTRY = 1
+RECORD_TOMBSTONE = 2
+RECORD_FOOTER = 3
+
+RECORD_HEADER = struct.Struct(">BI")
+NAME_LENGTH = struct.Struct(">I")
+TRAILER = struct.Struct(">QI8s")
+
+class LogVaultBackend(StorageBackend):
+    """Store secrets in an append-only encrypted log read through mmap."""
+    
+    MAGIC = b"AKML\x01"
+    TRAILER_MAGIC = b"AKMLEND1"
+    NONCE_SIZE = 12
+    # Files with less dead data than this are never compacted
+    MIN_COMPACT_BYTES = 4096
+    
+    def __init__(self, path, master_key, compact_threshold=0.5):
+        """Initialize the log vault backend.
+        
+        Args:
+            path (str): Path of the vault file (created on first write).
+            master_key (bytes): 32-byte encryption key.
+            compact_threshold (float): Share of dead bytes (superseded
+                records and tombstones) that triggers compaction.
+        """
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self._cipher = make_cipher(master_key)
+        # name -> (offset, length) of the newest record for each live secret
+        self._index = {}
+        # Changes not yet written: name -> value, or None for a deletion
+        self._pending = {}
+        self._records_end = len(self.MAGIC)
+        self._dead_bytes = 0
+        self._batch_depth = 0
+        self._file = None
+        self._mm = None
+        self.open()
+    
+    # Reading
+    
+    def open(self):
+        """Map the vault file and load its offset index."""
+        self.close()
+        # An empty file was left by a crash while creating it, before this
+        # version created files atomically: it holds no secrets yet
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(self.MAGIC)] != self.MAGIC:
+            self.close()
+            raise ValueError(f"Not a key vault log file: {self.path}")
+        
+        if not self._read_footer():
+            print(f"Vault index in {self.path} is missing or damaged, rebuilding it", file=sys.stderr)
+            self._recover()
+    
+    def refresh(self):
+        """Re-read the offset index, which another process may have changed.
+        
+        Pending changes are kept; their records are appended after the
+        other process's.
+        """
+        if self._mm is None and not os.path.exists(self.path):
+            return
+        self.open()
+    
+    def close(self):
+        """Unmap and close the vault file."""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _read_footer(self):
+        """Load the offset index from the footer.
+        
+        Returns:
+            bool: False if the trailer or footer is missing or invalid.
+        """
+        size = len(self._mm)
+        if size < len(self.MAGIC) + TRAILER.size:
+            return False
+        
+        footer_offset, footer_length, magic = TRAILER.unpack_from(self._mm, size - TRAILER.size)
+        if magic != self.TRAILER_MAGIC or footer_offset + footer_length != size - TRAILER.size:
+            return False
+        
+        try:
+            record_type, footer = self._read_record(footer_offset)
+        except Exception:
+            return False
+        if record_type != RECORD_FOOTER:
+            return False
+        
+        data = json.loads(footer.decode("utf-8"))
+        self._index = {name: (offset, length) for name, offset, length in data["entries"]}
+        self._dead_bytes = data["dead_bytes"]
+        self._records_end = footer_offset
+        return True
+    
+    def _recover(self):
+        """Rebuild the offset index by scanning records from the start."""
+        self._index = {}
+        self._dead_bytes = 0
+        offset = len(self.MAGIC)
+        size = len(self._mm)
+        
+        while offset + RECORD_HEADER.size <= size:
+            try:
+                record_type, plaintext = self._read_record(offset)
+            except Exception:
+                # Torn write at the end of the log
+                break
+            if record_type == RECORD_FOOTER:
+                break
+            
+            length = RECORD_HEADER.size + RECORD_HEADER.unpack_from(self._mm, offset)[1]
+            name = self._split_entry(plaintext)[0]
+            if name in self._index:
+                self._dead_bytes += self._index[name][1]
+            if record_type == RECORD_ENTRY:
+                self._index[name] = (offset, length)
+            else:
+                self._index.pop(name, None)
+                self._dead_bytes += length
+            offset += length
+        
+        self._records_end = offset
+        self._write([])
+    
+    def _read_record(self, offset):
+        """Decrypt the record at an offset.
+        
+        Returns:
+            tuple: (record type, plaintext bytes)
+        """
+        record_type, length = RECORD_HEADER.unpack_from(self._mm, offset)
+        start = offset + RECORD_HEADER.size
+        payload = self._mm[start:start + length]
+        if len(payload) != length:
+            raise ValueError("Truncated record")
+        
+        nonce, ciphertext = payload[:self.NONCE_SIZE], payload[self.NONCE_SIZE:]
+        aad = self._mm[offset:start]
+        return record_type, self._cipher.decrypt(nonce, ciphertext, aad)
+    
+    def _split_entry(self, plaintext):
+        """Split an entry plaintext into its name and value."""
+        name_length = NAME_LENGTH.unpack_from(plaintext)[0]
+        name_end = NAME_LENGTH.size + name_length
+        name = plaintext[NAME_LENGTH.size:name_end].decode("utf-8")
+        return name, plaintext[name_end:].decode("utf-8")
+    
+    def get_secret(self, name):
+        """Get a secret, decrypting only its own record."""
+        if name in self._pending:
+            return self._pending[name]
+        
+        location = self._index.get(name)
+        if location is None:
+            return None
+        return self._split_entry(self._read_record(location[0])[1])[1]
+    
+    def list_names(self):
+        """Get the names of all secrets stored in the vault."""
+        names = set(self._index)
+        for name, value in self._pending.items():
+            if value is None:
+                names.discard(name)
+            else:
+                names.add(name)
+        return list(names)
+    
+    # Writing
+    
+    def set_secret(self, name, value):
+        """Append a new record for a secret."""
+        self._pending[name] = value
+        self._changed()
+    
+    def delete_secret(self, name):
+        """Append a tombstone for a secret."""
+        if name in self._index:
+            self._pending[name] = None
+        else:
+            self._pending.pop(name, None)
+        self._changed()
+    
+    @contextmanager
+    def batch(self):
+        """Defer appending records until the outermost batch ends."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+    
+    def flush(self):
+        """Append all pending changes and rewrite the footer."""
+        if not self._pending:
+            return
+        
+        records = []
+        offset = self._records_end
+        for name, value in self._pending.items():
+            previous = self._index.get(name)
+            if previous is not None:
+                self._dead_bytes += previous[1]
+            
+            if value is None:
+                record = self._encrypt_record(RECORD_TOMBSTONE, self._encode_entry(name, ""))
+                self._index.pop(name, None)
+                self._dead_bytes += len(record)
+            else:
+                record = self._encrypt_record(RECORD_ENTRY, self._encode_entry(name, value))
+                self._index[name] = (offset, len(record))
+            
+            records.append(record)
+            offset += len(record)
+        
+        self._pending = {}
+        self._write(records)
+        
+        if self._should_compact():
+            self.compact()
+    
+    def compact(self):
+        """Rewrite the vault with only the newest record of each live secret."""
+        self.flush()
+        if self._mm is None:
+            return
+        
+        parts = [self.MAGIC]
+        index = {}
+        offset = len(self.MAGIC)
+        for name, (old_offset, length) in self._index.items():
+            # Records do not depend on their position, so they are copied as-is
+            parts.append(self._mm[old_offset:old_offset + length])
+            index[name] = (offset, length)
+            offset += length
+        
+        self._index = index
+        self._dead_bytes = 0
+        self._records_end = offset
+        parts.append(self._encode_footer())
+        
+        self.close()
+        write_file_atomic(self.path, b"".join(parts))
+        self.open()
+    
+    def _should_compact(self):
+        """Check whether enough of the file is dead data to compact it."""
+        total = self._records_end - len(self.MAGIC)
+        if total <= 0 or self._dead_bytes < self.MIN_COMPACT_BYTES:
+            return False
+        return self._dead_bytes / total > self.compact_threshold
+    
+    def _changed(self):
+        """Write a change now unless a batch is open."""
+        if self._batch_depth == 0:
+            self.flush()
+    
+    def _write(self, records):
+        """Append records at the end of the log, then a new footer and trailer."""
+        data = b"".join(records)
+        records_end = self._records_end + len(data)
+        
+        self.close()
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            # Created with its header in one step, so it is never left empty
+            write_file_atomic(self.path, self.MAGIC)
+        
+        self._records_end = records_end
+        with open(self.path, "r+b") as f:
+            # Overwrite the old footer; a crash before the new trailer is
+            # written is repaired by scanning the records on the next open
+            f.seek(records_end - len(data))
+            f.write(data)
+            f.write(self._encode_footer())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        self.open()
+    
+    def _encode_entry(self, name, value):
+        """Build the plaintext of an entry or tombstone record."""
+        name_bytes = name.encode("utf-8")
+        return NAME_LENGTH.pack(len(name_bytes)) + name_bytes + value.encode("utf-8")
+    
+    def _encode_footer(self):
+        """Build the footer record and trailer for the current index."""
+        data = {
+            "entries": [[name, offset, length] for name, (offset, length) in self._index.items()],
+            "dead_bytes": self._dead_bytes,
+        }
+        footer = self._encrypt_record(RECORD_FOOTER, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        trailer = TRAILER.pack(self._records_end, len(footer), self.TRAILER_MAGIC)
+        return footer + trailer
+    
+    def _encrypt_record(self, record_type, plaintext):
+        """Encrypt a plaintext into a complete record."""
+        nonce = os.urandom(self.NONCE_SIZE)
+        # AES-GCM adds a 16-byte tag to the ciphertext
+        header = RECORD_HEADER.pack(record_type, self.NONCE_SIZE + len(plaintext) + 16)
+        return header + nonce + self._cipher.encrypt(nonce, plaintext, header)
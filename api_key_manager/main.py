@@ -3,21 +3,40 @@
 API Key Manager
 
 A desktop application to securely store and manage API keys with quick copy-to-clipboard functionality.
+
+Pass --profile-startup to print how long each startup phase takes.
 """
 
 import sys
-from PyQt6.QtWidgets import QApplication
-from ui.main_window import MainWindow
-from core.config import config
+from core.profiling import startup_profiler
+
+startup_profiler.enabled = "--profile-startup" in sys.argv
+
+with startup_profiler.phase("import Qt"):
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+with startup_profiler.phase("import UI and load config"):
+    from ui.main_window import MainWindow
+    from core.config import config
 
 def main():
     """Main entry point for the application."""
-    app = QApplication(sys.argv)
-    app.setApplicationName(config.get_app_name())
-    app.setOrganizationName(config.get("organization", default="APIKeyManager"))
+    argv = [arg for arg in sys.argv if arg != "--profile-startup"]
+    
+    with startup_profiler.phase("create application"):
+        app = QApplication(argv)
+        app.setApplicationName(config.get_app_name())
+        app.setOrganizationName(config.get("organization", default="APIKeyManager"))
+    
+    with startup_profiler.phase("create window"):
+        window = MainWindow()
+    
+    with startup_profiler.phase("show window"):
+        window.show()
     
-    window = MainWindow()
-    window.show()
+    # Storage, the key index and icons are loaded once the event loop has
+    # painted the window
+    QTimer.singleShot(0, window.finish_startup)
     
     sys.exit(app.exec())
 
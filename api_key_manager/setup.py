@@ -8,9 +8,15 @@ setup(
         "PyQt6>=6.0.0",
         "keyring>=23.0.0",
     ],
+    extras_require={
+        "vault": ["cryptography>=3.1"],
+        # Encrypted export and import files
+        "export": ["cryptography>=3.1"],
+    },
     entry_points={
         "console_scripts": [
             "api-key-manager=api_key_manager.main:main",
+            "api-key-manager-cli=api_key_manager.cli:main",
         ],
     },
     author="API Key Manager",
@@ -0,0 +1,177 @@
+"""
+Background access to key storage so the UI never blocks on the keyring.
+"""
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+class StorageTaskSignals(QObject):
+    """Signals emitted by a storage task when it completes."""
+    
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class StorageTask(QRunnable):
+    """Run a single storage call on a worker thread."""
+    
+    def __init__(self, func, args, kwargs):
+        """Initialize the task."""
+        super().__init__()
+        self.setAutoDelete(False)
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = StorageTaskSignals()
+    
+    def run(self):
+        """Execute the storage call and report the result."""
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(e)
+            return
+        self.signals.finished.emit(result)
+
+
+class AsyncKeyStorage(QObject):
+    """Run KeyStorage calls off the GUI thread and deliver results as callbacks.
+    
+    Calls are executed one at a time, in submission order, on a dedicated
+    worker thread, because neither KeyStorage nor most keyring backends are
+    safe to use from several threads at once. Result and error callbacks
+    are invoked on the GUI thread.
+    """
+    
+    # Emitted with True when work starts and False when the queue drains
+    busy_changed = pyqtSignal(bool)
+    # Emitted with (operation name, exception) for calls without an error callback
+    error = pyqtSignal(str, object)
+    
+    def __init__(self, key_storage, parent=None):
+        """Initialize the async storage facade.
+        
+        Args:
+            key_storage (KeyStorage): The storage to run calls against.
+            parent (QObject, optional): Parent object.
+        """
+        super().__init__(parent)
+        self.key_storage = key_storage
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        # For work that does not touch storage (see run(parallel=True))
+        self.background_pool = QThreadPool(self)
+        self._pending = set()
+    
+    def is_busy(self):
+        """Check whether any storage calls are still running or queued."""
+        return bool(self._pending)
+    
+    def run(self, func, *args, on_result=None, on_error=None, parallel=False, **kwargs):
+        """Run an arbitrary callable on the storage worker thread.
+        
+        Args:
+            func (callable): Function to run.
+            on_result (callable, optional): Called with the return value.
+            on_error (callable, optional): Called with the raised exception.
+                If not provided, the error signal is emitted instead.
+            parallel (bool): Run on the background pool instead, for work
+                that does not touch storage and should not hold up storage
+                calls.
+        """
+        task = StorageTask(func, args, kwargs)
+        operation = getattr(func, "__name__", "storage call")
+        task.signals.finished.connect(lambda result: self._finish(task, on_result, result))
+        task.signals.failed.connect(lambda e: self._fail(task, operation, on_error, e))
+        
+        self._pending.add(task)
+        if len(self._pending) == 1:
+            self.busy_changed.emit(True)
+        if parallel:
+            self.background_pool.start(task)
+        else:
+            self.pool.start(task)
+    
+    def open(self, factory, on_result=None, on_error=None):
+        """Create the KeyStorage on the storage worker thread.
+        
+        Calls queued after this one run against the new storage.
+        
+        Args:
+            factory (callable): Returns the KeyStorage to use.
+            on_result (callable, optional): Called with the new storage.
+            on_error (callable, optional): Called with the raised exception.
+        """
+        def open_storage():
+            self.key_storage = factory()
+            return self.key_storage
+        
+        self.run(open_storage, on_result=on_result, on_error=on_error)
+    
+    def call(self, method, *args, on_result=None, on_error=None):
+        """Call a KeyStorage method by name on the storage worker thread."""
+        def invoke():
+            # Looked up on the worker, so calls queued behind open() work
+            return getattr(self.key_storage, method)(*args)
+        
+        invoke.__name__ = method
+        self.run(invoke, on_result=on_result, on_error=on_error)
+    
+    def get_all_keys(self, on_result, on_error=None):
+        """Fetch all stored key names."""
+        self.call("get_all_keys", on_result=on_result, on_error=on_error)
+    
+    def get_key(self, name, on_result, on_error=None):
+        """Fetch the value of a key."""
+        self.call("get_key", name, on_result=on_result, on_error=on_error)
+    
+    def get_all_metadata(self, on_result, on_error=None):
+        """Fetch the metadata of every key that has any."""
+        self.call("get_all_metadata", on_result=on_result, on_error=on_error)
+    
+    def get_metadata(self, name, on_result, on_error=None):
+        """Fetch the metadata of a key."""
+        self.call("get_metadata", name, on_result=on_result, on_error=on_error)
+    
+    def add_key(self, name, key, metadata=None, on_result=None, on_error=None):
+        """Add a new key."""
+        self.call("add_key", name, key, metadata, on_result=on_result, on_error=on_error)
+    
+    def update_key(self, name, new_key, on_result=None, on_error=None):
+        """Update an existing key's value."""
+        self.call("update_key", name, new_key, on_result=on_result, on_error=on_error)
+    
+    def set_metadata(self, name, metadata, on_result=None, on_error=None):
+        """Replace the tags, environment and provider of a key."""
+        self.call("set_metadata", name, metadata, on_result=on_result, on_error=on_error)
+    
+    def rename_key(self, old_name, new_name, new_value=None, metadata=None, on_result=None, on_error=None):
+        """Rename a key, optionally changing its value and metadata."""
+        self.call("rename_key", old_name, new_name, new_value, metadata, on_result=on_result, on_error=on_error)
+    
+    def delete_key(self, name, on_result=None, on_error=None):
+        """Delete a key."""
+        self.call("delete_key", name, on_result=on_result, on_error=on_error)
+    
+    def wait_for_done(self, msecs=-1):
+        """Block until all queued storage calls and background work have finished."""
+        return self.pool.waitForDone(msecs) and self.background_pool.waitForDone(msecs)
+    
+    def _finish(self, task, callback, result):
+        """Deliver a task result on the GUI thread."""
+        self._task_done(task)
+        if callback is not None:
+            callback(result)
+    
+    def _fail(self, task, operation, callback, e):
+        """Deliver a task error on the GUI thread."""
+        self._task_done(task)
+        if callback is not None:
+            callback(e)
+        else:
+            self.error.emit(operation, e)
+    
+    def _task_done(self, task):
+        """Forget a finished task and update the busy state."""
+        self._pending.discard(task)
+        if not self._pending:
+            self.busy_changed.emit(False)
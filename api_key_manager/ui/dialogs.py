@@ -4,9 +4,13 @@ Dialog classes for the API Key Manager application.
 
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
-    QPushButton, QDialogButtonBox, QCheckBox
+    QPushButton, QDialogButtonBox, QCheckBox, QPlainTextEdit, QFileDialog
 )
 from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFontDatabase
+
+from core.metrics import metrics
+from core.key_metadata import parse_tags
 
 class KeyDialog(QDialog):
     """Base dialog for adding/editing API keys."""
@@ -49,6 +53,16 @@ class KeyDialog(QDialog):
         show_key_layout.addStretch()
         layout.addLayout(show_key_layout)
         
+        # Metadata fields
+        self.tags_edit = self.add_field(layout, "Tags:", "Comma-separated, e.g. billing, llm")
+        self.environment_edit = self.add_field(layout, "Environment:", "e.g. prod, staging, dev")
+        self.provider_edit = self.add_field(layout, "Provider:", "e.g. OpenAI, Stripe")
+        
+        # Created and rotated times (filled in by the edit dialog)
+        self.history_label = QLabel()
+        self.history_label.hide()
+        layout.addWidget(self.history_label)
+        
         # Buttons
         buttons = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
@@ -57,6 +71,18 @@ class KeyDialog(QDialog):
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
     
+    def add_field(self, layout, label, placeholder):
+        """Add a labelled text field to the dialog and return it."""
+        field_layout = QHBoxLayout()
+        field_label = QLabel(label)
+        field_label.setMinimumWidth(80)
+        field_layout.addWidget(field_label)
+        field_edit = QLineEdit()
+        field_edit.setPlaceholderText(placeholder)
+        field_layout.addWidget(field_edit)
+        layout.addLayout(field_layout)
+        return field_edit
+    
     def toggle_key_visibility(self, checked):
         """Toggle between showing and hiding the API key."""
         if checked:
@@ -68,6 +94,29 @@ class KeyDialog(QDialog):
         """Return the name and key data."""
         return self.name_edit.text().strip(), self.key_edit.text().strip()
 
+    def get_metadata(self):
+        """Return the entered tags, environment and provider."""
+        return {
+            "tags": parse_tags(self.tags_edit.text()),
+            "environment": self.environment_edit.text().strip(),
+            "provider": self.provider_edit.text().strip(),
+        }
+    
+    def set_metadata(self, metadata):
+        """Fill the metadata fields from stored metadata."""
+        self.tags_edit.setText(", ".join(metadata.get("tags", [])))
+        self.environment_edit.setText(metadata.get("environment", ""))
+        self.provider_edit.setText(metadata.get("provider", ""))
+        
+        history = []
+        if metadata.get("created"):
+            history.append(f"Created {metadata['created']}")
+        if metadata.get("rotated"):
+            history.append(f"last rotated {metadata['rotated']}")
+        if history:
+            self.history_label.setText(", ".join(history))
+            self.history_label.show()
+
 
 class AddKeyDialog(KeyDialog):
     """Dialog for adding a new API key."""
@@ -80,8 +129,79 @@ class AddKeyDialog(KeyDialog):
 class EditKeyDialog(KeyDialog):
     """Dialog for editing an existing API key."""
     
-    def __init__(self, name, key, parent=None):
+    def __init__(self, name, key, metadata=None, parent=None):
         """Initialize the edit key dialog."""
         super().__init__("Edit API Key", parent)
         self.name_edit.setText(name)
         self.key_edit.setText(key)
+        self.set_metadata(metadata or {})
+
+
+class MetricsDialog(QDialog):
+    """Debug panel showing the recorded operation metrics."""
+    
+    def __init__(self, cache_stats=None, parent=None):
+        """Initialize the metrics dialog.
+        
+        Args:
+            cache_stats (callable, optional): Returns the value cache counters.
+            parent (QWidget, optional): Parent widget.
+        """
+        super().__init__(parent)
+        self.cache_stats = cache_stats
+        self.setWindowTitle("Metrics")
+        self.resize(640, 420)
+        self.init_ui()
+        self.refresh()
+    
+    def init_ui(self):
+        """Initialize the user interface."""
+        layout = QVBoxLayout(self)
+        
+        self.report = QPlainTextEdit()
+        self.report.setReadOnly(True)
+        self.report.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.report.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addWidget(self.report)
+        
+        button_layout = QHBoxLayout()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        button_layout.addWidget(refresh_button)
+        
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(reset_button)
+        
+        save_button = QPushButton("Save as JSON...")
+        save_button.clicked.connect(self.save)
+        button_layout.addWidget(save_button)
+        
+        button_layout.addStretch()
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+    
+    def refresh(self):
+        """Show the current metrics."""
+        if not metrics.enabled:
+            text = 'Metrics are disabled. Set "enabled" in the "metrics" section of config.json.'
+        else:
+            text = metrics.format_report()
+        
+        stats = self.cache_stats() if self.cache_stats else None
+        if stats:
+            text += "\n\nValue cache: " + ", ".join(f"{name} {value}" for name, value in stats.items())
+        self.report.setPlainText(text)
+    
+    def reset(self):
+        """Clear the recorded metrics."""
+        metrics.reset()
+        self.refresh()
+    
+    def save(self):
+        """Write the metrics to a JSON file."""
+        path, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "metrics.json", "JSON files (*.json)")
+        if path:
+            metrics.dump(path)
@@ -0,0 +1,223 @@
+"""
+Model and proxy for the list of stored key names.
+"""
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QAbstractProxyModel, QModelIndex
+
+class KeyListModel(QAbstractListModel):
+    """List model of key names, in the order of the storage index.
+    
+    Mutations emit row-level signals instead of resetting the model, so
+    views only update the rows that changed.
+    """
+    
+    def __init__(self, parent=None):
+        """Initialize an empty key list model."""
+        super().__init__(parent)
+        self._names = []
+        # name -> row, rebuilt lazily after rows move
+        self._rows = None
+    
+    def rowCount(self, parent=QModelIndex()):
+        """Get the number of keys."""
+        if parent.isValid():
+            return 0
+        return len(self._names)
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        """Get the key name for a row."""
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self._names[index.row()]
+    
+    def name_at(self, row):
+        """Get the key name at a row."""
+        return self._names[row]
+    
+    def row_of(self, name):
+        """Get the row of a key name, or -1 if it is not in the list."""
+        if self._rows is None:
+            self._rows = {n: row for row, n in enumerate(self._names)}
+        return self._rows.get(name, -1)
+    
+    def names(self):
+        """Get all key names."""
+        return list(self._names)
+    
+    def set_names(self, names):
+        """Replace all key names."""
+        self.beginResetModel()
+        self._names = list(names)
+        self._rows = None
+        self.endResetModel()
+    
+    def add_name(self, name):
+        """Append a key name."""
+        row = len(self._names)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._names.append(name)
+        if self._rows is not None:
+            self._rows[name] = row
+        self.endInsertRows()
+    
+    def remove_name(self, name):
+        """Remove a key name."""
+        row = self.row_of(name)
+        if row < 0:
+            return
+        
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._names[row]
+        self._rows = None
+        self.endRemoveRows()
+    
+    def rename(self, old_name, new_name):
+        """Change a key name in place, keeping its row."""
+        row = self.row_of(old_name)
+        if row < 0:
+            return
+        
+        self._names[row] = new_name
+        del self._rows[old_name]
+        self._rows[new_name] = row
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+
+class KeyFilterProxyModel(QAbstractProxyModel):
+    """Filtered view of a KeyListModel driven by a KeySearch.
+    
+    QSortFilterProxyModel asks filterAcceptsRow about every source row on
+    each filter change, which means one Python call per key. This proxy
+    instead takes the matching names straight from the search, already in
+    ranked order, so a new query costs one pass of the search plus one
+    model reset, and the view only ever asks for the rows it displays.
+    """
+    
+    def __init__(self, key_search, fuzzy_limit=20, parent=None):
+        """Initialize the proxy.
+        
+        Args:
+            key_search (KeySearch): Search over the same names as the source model.
+            fuzzy_limit (int): Maximum number of typo-tolerant matches shown
+                after the substring matches.
+            parent (QObject, optional): Parent object.
+        """
+        super().__init__(parent)
+        self.key_search = key_search
+        self.fuzzy_limit = fuzzy_limit
+        self._query = ""
+        # Names passing the tag filter, or None when no tag filter is set
+        self._allowed = None
+        # Matching names in display order, and their rows (rebuilt lazily)
+        self._names = []
+        self._rows = None
+    
+    def rowCount(self, parent=QModelIndex()):
+        """Get the number of matching keys."""
+        if parent.isValid():
+            return 0
+        return len(self._names)
+    
+    def columnCount(self, parent=QModelIndex()):
+        """The key list has a single column."""
+        return 1
+    
+    def index(self, row, column=0, parent=QModelIndex()):
+        """Create an index for a row of the filtered list."""
+        if parent.isValid() or column != 0 or not 0 <= row < len(self._names):
+            return QModelIndex()
+        return self.createIndex(row, column)
+    
+    def parent(self, index=QModelIndex()):
+        """List items have no parent."""
+        return QModelIndex()
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        """Get the key name for a row without going through the source model."""
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self._names[index.row()]
+    
+    def mapToSource(self, proxy_index):
+        """Map a filtered row to its row in the source model."""
+        if not proxy_index.isValid() or self.sourceModel() is None:
+            return QModelIndex()
+        return self.sourceModel().index(self.sourceModel().row_of(self._names[proxy_index.row()]))
+    
+    def mapFromSource(self, source_index):
+        """Map a source row to its filtered row, if it matches."""
+        if not source_index.isValid():
+            return QModelIndex()
+        row = self._row_of(self.sourceModel().name_at(source_index.row()))
+        if row is None:
+            return QModelIndex()
+        return self.index(row)
+    
+    def set_query(self, text):
+        """Filter the list to names matching the text, best matches first."""
+        self.beginResetModel()
+        self._query = text.casefold()
+        self._names = self.key_search.rank(text, self.fuzzy_limit)
+        if self._allowed is not None:
+            self._names = [name for name in self._names if name in self._allowed]
+        self._rows = None
+        self.endResetModel()
+    
+    def set_allowed(self, names):
+        """Only show the given names (None for all), from the next set_query() on.
+        
+        Names added or renamed afterwards are checked against the set right away.
+        """
+        self._allowed = names
+    
+    def is_filtered(self):
+        """Check whether a tag filter is set."""
+        return self._allowed is not None
+    
+    def matches(self, name):
+        """Check whether a name matches the current query and tag filter."""
+        if self._allowed is not None and name not in self._allowed:
+            return False
+        return self._query in name.casefold()
+    
+    def name_added(self, name):
+        """Show a newly added name if it matches the current query."""
+        self.key_search.add(name)
+        if self.matches(name):
+            row = len(self._names)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._names.append(name)
+            self._rows = None
+            self.endInsertRows()
+    
+    def name_removed(self, name):
+        """Remove a deleted name from the filtered list."""
+        self.key_search.remove(name)
+        row = self._row_of(name)
+        if row is not None:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._names[row]
+            self._rows = None
+            self.endRemoveRows()
+    
+    def name_renamed(self, old_name, new_name):
+        """Update the filtered list after a key is renamed."""
+        row = self._row_of(old_name)
+        if row is None or not self.matches(new_name):
+            self.name_removed(old_name)
+            self.name_added(new_name)
+            return
+        
+        # Still matching: rename in place so the row keeps its position
+        self.key_search.rename(old_name, new_name)
+        self._names[row] = new_name
+        self._rows = None
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+    
+    def _row_of(self, name):
+        """Get the filtered row of a name, or None if it is not shown."""
+        if self._rows is None:
+            self._rows = {n: row for row, n in enumerate(self._names)}
+        return self._rows.get(name)
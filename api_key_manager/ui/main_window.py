@@ -3,18 +3,31 @@ Main window implementation for the API Key Manager application.
 """
 
 import os
-import sys
+import time
 from PyQt6.QtWidgets import (
     QMainWindow, QVBoxLayout, QHBoxLayout, QPushButton, 
-    QListWidget, QWidget, QInputDialog, QMessageBox, QLineEdit,
-    QApplication
+    QListView, QWidget, QInputDialog, QMessageBox, QLineEdit,
+    QApplication, QProgressBar, QFileDialog, QComboBox, QToolButton, QMenu
 )
-from PyQt6.QtCore import Qt, QDir
-from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import Qt, QDir, QTimer, QEvent, QFileSystemWatcher
+from PyQt6.QtGui import QKeySequence, QShortcut
 
-from core.key_storage import KeyStorage
 from core.config import config
-from ui.dialogs import AddKeyDialog, EditKeyDialog
+from core.profiling import startup_profiler
+from core.metrics import metrics
+from core.search import KeySearch, TrigramIndex
+from core.key_metadata import TagIndex, normalize_metadata
+from ui.dialogs import AddKeyDialog, EditKeyDialog, MetricsDialog
+from ui.async_storage import AsyncKeyStorage
+from ui.key_list_model import KeyListModel, KeyFilterProxyModel
+from ui.theme import ThemeManager
+
+def open_key_storage():
+    """Create the KeyStorage (runs on the storage worker thread)."""
+    with startup_profiler.phase("open storage and load index"):
+        # Imported here so the keyring module is loaded off the GUI thread
+        from core.key_storage import KeyStorage
+        return KeyStorage()
 
 class MainWindow(QMainWindow):
     """Main window of the API Key Manager application."""
@@ -22,11 +35,30 @@ class MainWindow(QMainWindow):
     def __init__(self):
         """Initialize the main window."""
         super().__init__()
-        self.key_storage = KeyStorage()
+        # All storage calls go through the worker so the event loop never
+        # blocks. Storage itself is opened by finish_startup().
+        self.key_storage = None
+        self.storage = AsyncKeyStorage(None, self)
+        self.storage.error.connect(self.show_storage_error)
+        # Key names are held in a model and filtered through a proxy that
+        # the list view only uses while a search is active
+        self.key_search = KeySearch()
+        self.key_model = KeyListModel(self)
+        self.key_proxy = KeyFilterProxyModel(
+            self.key_search, config.get("window", "search_fuzzy_limit", 20), self
+        )
+        self.key_proxy.setSourceModel(self.key_model)
+        # Tags, environments and providers of the listed keys, for the filters
+        self.key_tags = TagIndex()
+        self.selected_tags = set()
         self.dark_mode = config.get("window", "dark_mode", False)
+        # Palettes and icons are built once per theme and reused on every toggle
+        self.theme = ThemeManager()
+        # perf_counter() time of the pending load_keys request
+        self.load_started = None
         self.init_ui()
-        self.load_keys()
-        
+        config.subscribe("window", self.apply_window_config)
+    
     def init_ui(self):
         """Initialize the user interface."""
         # Window settings
@@ -37,43 +69,6 @@ class MainWindow(QMainWindow):
             window_config.get("min_height", 400)
         )
         
-        # Set window icon with proper path handling for both direct execution and PyInstaller bundle
-        build_config = config.get_build_config()
-        icon_path = build_config.get("icon_path", os.path.join("resources", "icons", "app_icon.ico"))
-        
-        # List of possible icon paths to try
-        icon_paths = [
-            icon_path,                                              # Config specified path
-            os.path.join("resources", "icons", "app_icon.ico"),     # Default relative path
-            os.path.abspath(icon_path),                             # Absolute path from config
-            os.path.abspath(os.path.join("resources", "icons", "app_icon.ico")), # Absolute default path
-        ]
-        
-        # If running from a PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            # When running as a bundle, the path is different
-            base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
-            # Add PyInstaller paths
-            icon_paths.extend([
-                os.path.join(base_path, icon_path),                  # Config path relative to bundle
-                os.path.join(base_path, "resources", "icons", "app_icon.ico"), # Default path relative to bundle
-            ])
-        
-        # Try each path until we find a valid icon file
-        icon_found = False
-        for path in icon_paths:
-            if os.path.exists(path):
-                try:
-                    self.setWindowIcon(QIcon(path))
-                    print(f"Window icon set from: {path}")
-                    icon_found = True
-                    break
-                except Exception as e:
-                    print(f"Failed to set icon from {path}: {e}")
-        
-        if not icon_found:
-            print("Warning: Could not set window icon, no valid icon file found")
-        
         if window_config.get("start_maximized", False):
             self.showMaximized()
         
@@ -82,19 +77,52 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(central_widget)
         main_layout = QVBoxLayout(central_widget)
         
-        # List widget for API keys
-        self.key_list = QListWidget()
-        self.key_list.itemClicked.connect(self.copy_key_to_clipboard)
+        # List view for API keys (uniform rows let it lay out only what is visible)
+        self.key_list = QListView()
+        self.key_list.setModel(self.key_model)
+        self.key_list.setUniformItemSizes(True)
+        self.key_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.key_list.clicked.connect(self.copy_key_to_clipboard)
         main_layout.addWidget(self.key_list)
         
         # Search bar
         search_layout = QHBoxLayout()
         self.search_box = QLineEdit()
         self.search_box.setPlaceholderText("Search API keys...")
-        self.search_box.textChanged.connect(self.filter_keys)
+        self.search_box.textChanged.connect(self.schedule_filter)
+        
+        # Wait for a pause in typing before filtering
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(window_config.get("search_debounce_ms", 150))
+        self.search_timer.timeout.connect(lambda: self.filter_keys(self.search_box.text()))
         search_layout.addWidget(self.search_box)
         main_layout.addLayout(search_layout)
         
+        # Tag, environment and provider filters, filled once metadata is loaded
+        facet_layout = QHBoxLayout()
+        self.tags_button = QToolButton()
+        self.tags_button.setText("Tags")
+        self.tags_button.setPopupMode(QToolButton.ToolButtonPopupMode.InstantPopup)
+        self.tags_menu = QMenu(self.tags_button)
+        self.tags_button.setMenu(self.tags_menu)
+        self.match_all_tags_action = self.tags_menu.addAction("Match all selected tags")
+        self.match_all_tags_action.setCheckable(True)
+        self.match_all_tags_action.toggled.connect(lambda checked: self.apply_facet_filter())
+        facet_layout.addWidget(self.tags_button)
+        
+        self.environment_filter = QComboBox()
+        self.environment_filter.addItem("All environments", None)
+        self.environment_filter.currentIndexChanged.connect(lambda index: self.apply_facet_filter())
+        facet_layout.addWidget(self.environment_filter)
+        
+        self.provider_filter = QComboBox()
+        self.provider_filter.addItem("All providers", None)
+        self.provider_filter.currentIndexChanged.connect(lambda index: self.apply_facet_filter())
+        facet_layout.addWidget(self.provider_filter)
+        facet_layout.addStretch()
+        main_layout.addLayout(facet_layout)
+        
         # Button layout
         button_layout = QHBoxLayout()
         
@@ -113,7 +141,8 @@ class MainWindow(QMainWindow):
             }
         """)
         self.dark_mode_button.clicked.connect(self.toggle_dark_mode)
-        self.update_dark_mode_icon()
+        # Icons are resolved after the first paint, in finish_startup()
+        self.update_dark_mode_style()
         button_layout.addWidget(self.dark_mode_button)
         
         # Add key button
@@ -133,163 +162,351 @@ class MainWindow(QMainWindow):
         
         main_layout.addLayout(button_layout)
         
+        # Bulk transfer buttons
+        transfer_layout = QHBoxLayout()
+        import_button = QPushButton("Import...")
+        import_button.clicked.connect(self.import_keys)
+        transfer_layout.addWidget(import_button)
+        
+        export_button = QPushButton("Export...")
+        export_button.clicked.connect(self.export_keys)
+        transfer_layout.addWidget(export_button)
+        
+        main_layout.addLayout(transfer_layout)
+        
         # Status bar
         self.statusBar().showMessage("Ready")
+        
+        # Busy indicator shown while storage calls are running
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(80)
+        self.busy_indicator.setMaximumHeight(12)
+        self.busy_indicator.setTextVisible(False)
+        self.busy_indicator.hide()
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+        self.storage.busy_changed.connect(self.busy_indicator.setVisible)
+        
+        # Hidden debug panel with the recorded metrics
+        metrics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        metrics_shortcut.activated.connect(self.show_metrics)
+    
+    def finish_startup(self):
+        """Resolve icons, open storage and load the key index.
+        
+        Called once the window has been shown, so none of this work delays
+        the first paint. Storage is opened on the storage worker thread.
+        """
+        startup_profiler.mark("event loop running")
+        with startup_profiler.phase("resolve icons"):
+            self.update_icons()
+        
+        self.statusBar().showMessage("Opening key storage...")
+        self.storage.open(open_key_storage, on_result=self.on_storage_opened)
+        self.watch_config()
+    
+    def watch_config(self):
+        """Reload the configuration when the file is changed by another program."""
+        # A burst of change signals (an editor saving) results in one reload
+        self.config_reload_timer = QTimer(self)
+        self.config_reload_timer.setSingleShot(True)
+        self.config_reload_timer.setInterval(100)
+        self.config_reload_timer.timeout.connect(self.reload_config)
+        
+        # The directory is watched as well: an atomic replace swaps the file,
+        # which ends the watch on the old one
+        config_path = os.path.abspath(config.config_path)
+        self.config_watcher = QFileSystemWatcher(self)
+        self.config_watcher.fileChanged.connect(self.config_reload_timer.start)
+        self.config_watcher.directoryChanged.connect(self.config_reload_timer.start)
+        paths = [path for path in (config_path, os.path.dirname(config_path)) if os.path.exists(path)]
+        if paths and not self.config_watcher.addPaths(paths):
+            return
+        
+        # Where the file system cannot be watched, check it periodically
+        self.config_reload_timer.setSingleShot(False)
+        self.config_reload_timer.setInterval(int(config.get("config_poll_interval", default=2) * 1000))
+        self.config_reload_timer.start()
+    
+    def reload_config(self):
+        """Reload the configuration if the file has changed."""
+        config_path = os.path.abspath(config.config_path)
+        if os.path.exists(config_path) and config_path not in self.config_watcher.files():
+            self.config_watcher.addPath(config_path)
+        config.reload_if_changed()
+    
+    def apply_window_config(self, window_config):
+        """Apply a changed window configuration to the open window."""
+        self.setWindowTitle(window_config.get("title", "API Key Manager"))
+        self.setMinimumSize(window_config.get("min_width", 500), window_config.get("min_height", 400))
+        self.search_timer.setInterval(window_config.get("search_debounce_ms", 150))
+        
+        fuzzy_limit = window_config.get("search_fuzzy_limit", 20)
+        if fuzzy_limit != self.key_proxy.fuzzy_limit:
+            self.key_proxy.fuzzy_limit = fuzzy_limit
+            if self.search_box.text():
+                self.filter_keys(self.search_box.text())
+        
+        dark_mode = window_config.get("dark_mode", False)
+        if dark_mode != self.dark_mode:
+            self.dark_mode = dark_mode
+            self.update_dark_mode_icon()
+    
+    def on_storage_opened(self, key_storage):
+        """Load the key list once storage is available."""
+        self.key_storage = key_storage
+        self.statusBar().showMessage("Ready", 3000)
+        self.load_keys()
     
     def toggle_dark_mode(self):
         """Toggle between light and dark mode."""
         self.dark_mode = not self.dark_mode
         config.set("window", "dark_mode", self.dark_mode)
-        config.save_config()
+        # Written in the background; repeated toggles cost a single write
+        config.schedule_save()
         self.update_dark_mode_icon()
-        
+    
     def update_dark_mode_icon(self):
+        """Update the style and icons based on dark mode state."""
+        self.update_dark_mode_style()
+        self.update_icons()
+    
+    def update_dark_mode_style(self):
+        """Apply the palette for the current dark mode state."""
+        self.theme.apply(self.dark_mode)
+    
+    def update_icons(self):
         """Update the window and button icons based on dark mode state."""
-        # Update application style
-        if self.dark_mode:
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #2b2b2b;
-                }
-                QListWidget {
-                    background-color: #3b3b3b;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                }
-                QLineEdit {
-                    background-color: #3b3b3b;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                    padding: 5px;
-                }
-                QPushButton {
-                    background-color: #444444;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                    padding: 5px 10px;
-                    border-radius: 4px;
-                }
-                QPushButton:hover {
-                    background-color: #555555;
-                }
-                QPushButton#dark_mode_button {
-                    background: transparent;
-                    border: none;
-                }
-                QPushButton#dark_mode_button:hover {
-                    background-color: rgba(128, 128, 128, 0.2);
-                }
-                QStatusBar {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                }
-            """)
-        else:
-            self.setStyleSheet("")
-
-        build_config = config.get_build_config()
-        base_icon = "app_icon_dark.ico" if self.dark_mode else "app_icon.ico"
-        icon_path = os.path.join("resources", "icons", base_icon)
-        
-        # List of possible icon paths to try
-        icon_paths = [
-            icon_path,
-            os.path.abspath(icon_path),
-            os.path.abspath(os.path.join("resources", "icons", base_icon)),
-        ]
-        
-        # If running from a PyInstaller bundle
-        if getattr(sys, 'frozen', False):
-            base_path = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
-            icon_paths.extend([
-                os.path.join(base_path, icon_path),
-                os.path.join(base_path, "resources", "icons", base_icon),
-            ])
-        
-        # Try each path until we find a valid icon file
-        icon_found = False
-        for path in icon_paths:
-            if os.path.exists(path):
-                try:
-                    icon = QIcon(path)
-                    self.setWindowIcon(icon)
-                    self.dark_mode_button.setIcon(icon)
-                    self.dark_mode_button.setIconSize(self.dark_mode_button.size())
-                    print(f"Icons set from: {path}")
-                    icon_found = True
-                    break
-                except Exception as e:
-                    print(f"Failed to set icons from {path}: {e}")
-        
-        if not icon_found:
-            print("Warning: Could not set icons, no valid icon file found")
+        icon = self.theme.icon(self.dark_mode)
+        if icon is None:
+            return
+        self.setWindowIcon(icon)
+        self.dark_mode_button.setIcon(icon)
+        self.dark_mode_button.setIconSize(self.dark_mode_button.size())
     
     def load_keys(self):
-        """Load stored keys into the list widget."""
-        self.key_list.clear()
-        keys = self.key_storage.get_all_keys()
-        for name in keys:
-            self.key_list.addItem(name)
+        """Load stored keys into the list view."""
+        self.load_started = time.perf_counter()
+        self.storage.get_all_keys(self.populate_key_list)
+    
+    @metrics.timed("ui.populate_key_list")
+    def populate_key_list(self, keys):
+        """Fill the list model with the given key names."""
+        with startup_profiler.phase("populate key list"):
+            self.key_search.set_names(keys)
+            self.key_model.set_names(keys)
+            self.filter_keys(self.search_box.text())
+        startup_profiler.report()
+        if self.load_started is not None:
+            # From the request to the storage worker until the list is filled
+            metrics.observe("ui.load_keys", (time.perf_counter() - self.load_started) * 1000)
+            self.load_started = None
+        
+        # Build the fuzzy search index off the GUI thread
+        self.storage.run(
+            TrigramIndex, self.key_search.names(),
+            on_result=self.key_search.set_trigram_index, parallel=True
+        )
+        self.storage.get_all_metadata(self.set_key_metadata)
+    
+    def set_key_metadata(self, metadata):
+        """Index the metadata of all keys for the tag filters."""
+        self.key_tags = TagIndex(metadata)
+        self.update_facet_filters()
+        if self.key_proxy.is_filtered():
+            self.apply_facet_filter()
+    
+    def update_key_metadata(self, name, metadata, old_name=None):
+        """Update the tag filters after the metadata of a key changed."""
+        if old_name is not None:
+            self.key_tags.remove(old_name)
+        self.key_tags.set(name, normalize_metadata(metadata))
+        self.update_facet_filters()
+        self.key_proxy.set_allowed(self.facet_matches())
+    
+    def update_facet_filters(self):
+        """Offer the tags, environments and providers currently in use."""
+        for action in self.tags_menu.actions()[1:]:
+            self.tags_menu.removeAction(action)
+        tags = self.key_tags.values("tag")
+        self.selected_tags &= {tag for tag, count in tags}
+        if tags:
+            self.tags_menu.addSeparator()
+        for tag, count in tags:
+            action = self.tags_menu.addAction(f"{tag} ({count})")
+            action.setCheckable(True)
+            action.setChecked(tag in self.selected_tags)
+            action.toggled.connect(lambda checked, tag=tag: self.toggle_tag(tag, checked))
+        self.update_tags_button()
+        
+        for combo, facet in ((self.environment_filter, "environment"), (self.provider_filter, "provider")):
+            selected = combo.currentData()
+            combo.blockSignals(True)
+            while combo.count() > 1:
+                combo.removeItem(1)
+            for value, count in self.key_tags.values(facet):
+                combo.addItem(f"{value} ({count})", value)
+            combo.setCurrentIndex(max(combo.findData(selected), 0))
+            combo.blockSignals(False)
+    
+    def update_tags_button(self):
+        """Show the number of selected tags on the tag filter button."""
+        count = len(self.selected_tags)
+        self.tags_button.setText(f"Tags ({count})" if count else "Tags")
+    
+    def toggle_tag(self, tag, checked):
+        """Add a tag to or remove it from the tag filter."""
+        if checked:
+            self.selected_tags.add(tag)
+        else:
+            self.selected_tags.discard(tag)
+        self.update_tags_button()
+        self.apply_facet_filter()
     
+    def facet_matches(self):
+        """Get the names passing the tag, environment and provider filters, or None."""
+        all_of = []
+        for combo, facet in ((self.environment_filter, "environment"), (self.provider_filter, "provider")):
+            if combo.currentData() is not None:
+                all_of.append((facet, combo.currentData()))
+        
+        tags = [("tag", tag) for tag in sorted(self.selected_tags)]
+        if self.match_all_tags_action.isChecked():
+            return self.key_tags.query(all_of + tags)
+        return self.key_tags.query(all_of, tags)
+    
+    @metrics.timed("ui.apply_facet_filter")
+    def apply_facet_filter(self):
+        """Filter the key list by the selected tags, environment and provider."""
+        self.key_proxy.set_allowed(self.facet_matches())
+        self.filter_keys(self.search_box.text())
+    
+    def insert_key_row(self, name):
+        """Add a single key name to the list."""
+        self.key_model.add_name(name)
+        self.key_proxy.name_added(name)
+    
+    def remove_key_row(self, name):
+        """Remove a single key name from the list."""
+        self.key_model.remove_name(name)
+        self.key_proxy.name_removed(name)
+    
+    def rename_key_row(self, old_name, new_name):
+        """Rename a single key in the list, keeping its position."""
+        self.key_model.rename(old_name, new_name)
+        self.key_proxy.name_renamed(old_name, new_name)
+    
+    def selected_key_name(self):
+        """Get the name of the selected key, or None."""
+        index = self.key_list.currentIndex()
+        if not index.isValid():
+            return None
+        return index.data()
+    
+    def schedule_filter(self):
+        """Restart the search debounce timer."""
+        self.search_timer.start()
+    
+    @metrics.timed("ui.filter_keys")
     def filter_keys(self, text):
         """Filter the key list based on search text."""
-        for i in range(self.key_list.count()):
-            item = self.key_list.item(i)
-            if text.lower() in item.text().lower():
-                item.setHidden(False)
-            else:
-                item.setHidden(True)
+        self.search_timer.stop()
+        self.key_proxy.set_query(text)
+        model = self.key_proxy if text or self.key_proxy.is_filtered() else self.key_model
+        if self.key_list.model() is not model:
+            self.key_list.setModel(model)
+    
+    def show_storage_error(self, operation, error):
+        """Report a failed storage call."""
+        QMessageBox.critical(self, "Storage Error", f"Key storage operation '{operation}' failed:\n{error}")
     
     def add_key(self):
         """Open dialog to add a new API key."""
         dialog = AddKeyDialog(self)
         if dialog.exec():
             name, key = dialog.get_key_data()
+            metadata = dialog.get_metadata()
             if name and key:
-                if self.key_storage.add_key(name, key):
-                    self.load_keys()
-                    self.statusBar().showMessage(f"Key '{name}' added successfully", 3000)
-                else:
-                    QMessageBox.warning(self, "Error", f"A key with name '{name}' already exists")
+                self.storage.add_key(
+                    name, key, metadata, on_result=lambda added: self.on_key_added(name, added, metadata)
+                )
+    
+    def on_key_added(self, name, added, metadata=None):
+        """Handle the result of adding a key."""
+        if added:
+            if metadata:
+                self.update_key_metadata(name, metadata)
+            self.insert_key_row(name)
+            self.statusBar().showMessage(f"Key '{name}' added successfully", 3000)
+        else:
+            QMessageBox.warning(self, "Error", f"A key with name '{name}' already exists")
     
     def edit_key(self):
         """Edit the selected API key."""
-        current_item = self.key_list.currentItem()
-        if not current_item:
+        name = self.selected_key_name()
+        if not name:
             QMessageBox.information(self, "Select Key", "Please select a key to edit")
             return
         
-        name = current_item.text()
-        key = self.key_storage.get_key(name)
-        
-        dialog = EditKeyDialog(name, key, self)
+        self.storage.get_key(
+            name, lambda key: self.storage.get_metadata(
+                name, lambda metadata: self.show_edit_dialog(name, key, metadata))
+        )
+    
+    def show_edit_dialog(self, name, key, metadata=None):
+        """Show the edit dialog for a key once its value and metadata have been fetched."""
+        metadata = metadata or {}
+        dialog = EditKeyDialog(name, key or "", metadata, self)
         if dialog.exec():
             new_name, new_key = dialog.get_key_data()
+            new_metadata = dialog.get_metadata()
             if new_name and new_key:
+                # Only a changed value counts as a rotation
+                new_value = new_key if new_key != key else None
+                metadata_changed = normalize_metadata(new_metadata) != normalize_metadata(
+                    {field: metadata.get(field) for field in new_metadata}
+                )
                 if name == new_name:
-                    # Just updating the key
-                    self.key_storage.update_key(name, new_key)
+                    if new_value is not None:
+                        self.storage.update_key(name, new_value)
+                    if metadata_changed:
+                        self.storage.set_metadata(
+                            name, new_metadata,
+                            on_result=lambda stored: self.on_metadata_changed(name, new_metadata, stored)
+                        )
                     self.statusBar().showMessage(f"Key '{name}' updated successfully", 3000)
                 else:
-                    # Name change, need to delete old and add new
-                    if self.key_storage.key_exists(new_name):
-                        QMessageBox.warning(self, "Error", f"A key with name '{new_name}' already exists")
-                        return
-                    
-                    self.key_storage.delete_key(name)
-                    self.key_storage.add_key(new_name, new_key)
-                    self.statusBar().showMessage(f"Key renamed to '{new_name}' and updated successfully", 3000)
-                
-                self.load_keys()
+                    # Name change: renamed in place with a single index write
+                    self.storage.rename_key(
+                        name, new_name, new_value, new_metadata,
+                        on_result=lambda renamed: self.on_key_renamed(name, new_name, renamed, new_metadata)
+                    )
+    
+    def on_metadata_changed(self, name, metadata, stored):
+        """Update the tag filters once new metadata of a key has been stored."""
+        if not stored:
+            return
+        self.update_key_metadata(name, metadata)
+        if self.key_proxy.is_filtered():
+            self.apply_facet_filter()
+    
+    def on_key_renamed(self, name, new_name, renamed, metadata=None):
+        """Handle the result of renaming a key."""
+        if renamed:
+            if metadata is not None:
+                self.update_key_metadata(new_name, metadata, old_name=name)
+            self.rename_key_row(name, new_name)
+            self.statusBar().showMessage(f"Key renamed to '{new_name}' and updated successfully", 3000)
+        else:
+            QMessageBox.warning(self, "Error", f"A key with name '{new_name}' already exists")
     
     def delete_key(self):
         """Delete the selected API key."""
-        current_item = self.key_list.currentItem()
-        if not current_item:
+        name = self.selected_key_name()
+        if not name:
             QMessageBox.information(self, "Select Key", "Please select a key to delete")
             return
         
-        name = current_item.text()
         reply = QMessageBox.question(
             self, "Confirm Delete", 
             f"Are you sure you want to delete the key '{name}'?",
@@ -297,16 +514,138 @@ class MainWindow(QMainWindow):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            self.key_storage.delete_key(name)
-            self.load_keys()
-            self.statusBar().showMessage(f"Key '{name}' deleted successfully", 3000)
+            self.storage.delete_key(name, on_result=lambda deleted: self.on_key_deleted(name))
+    
+    def on_key_deleted(self, name):
+        """Handle the result of deleting a key."""
+        self.remove_key_row(name)
+        self.key_tags.remove(name)
+        self.update_facet_filters()
+        if self.key_proxy.is_filtered():
+            # A tag no longer in use has been dropped from the selection
+            self.apply_facet_filter()
+        self.statusBar().showMessage(f"Key '{name}' deleted successfully", 3000)
+    
+    def ask_passphrase(self, confirm=False):
+        """Ask for the passphrase of an encrypted export, or None if cancelled."""
+        passphrase, ok = QInputDialog.getText(
+            self, "Export Passphrase", "Passphrase:", QLineEdit.EchoMode.Password
+        )
+        if not ok or not passphrase:
+            return None
+        if confirm:
+            repeated, ok = QInputDialog.getText(
+                self, "Export Passphrase", "Repeat passphrase:", QLineEdit.EchoMode.Password
+            )
+            if not ok:
+                return None
+            if repeated != passphrase:
+                QMessageBox.warning(self, "Error", "Passphrases do not match")
+                return None
+        return passphrase
+    
+    def import_keys(self):
+        """Import keys from a .env, JSON lines, CSV or encrypted export file."""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import Keys", "",
+            "Key files (*.env *.jsonl *.ndjson *.json *.csv *.akmx);;All files (*)"
+        )
+        if not path:
+            return
+        
+        # Imported here, like KeyStorage, to keep the keyring module out of startup
+        from core import transfer
+        try:
+            file_format = transfer.detect_format(path)
+        except (OSError, transfer.TransferError) as e:
+            QMessageBox.warning(self, "Import Failed", str(e))
+            return
+        
+        passphrase = None
+        if file_format == "encrypted":
+            passphrase = self.ask_passphrase()
+            if passphrase is None:
+                return
+        
+        self.statusBar().showMessage("Importing keys...")
+        self.storage.run(self.run_import, path, file_format, passphrase, on_result=self.on_keys_imported)
     
-    def copy_key_to_clipboard(self, item):
+    def run_import(self, path, file_format, passphrase):
+        """Import keys from a file (runs on the storage worker)."""
+        from core import transfer
+        records = transfer.read_records(path, file_format, passphrase)
+        return transfer.import_keys(
+            self.key_storage, records, workers=config.get("storage", "transfer_workers", 4)
+        )
+    
+    def on_keys_imported(self, result):
+        """Handle the result of an import."""
+        for name in result["added"]:
+            self.insert_key_row(name)
+        message = f"Imported {len(result['added'])} keys, updated {len(result['updated'])}"
+        if result["skipped"]:
+            message += f", skipped {len(result['skipped'])} existing or duplicate names"
+        if result["empty"]:
+            message += f", skipped {len(result['empty'])} empty values"
+        self.statusBar().showMessage(message, 5000)
+    
+    def export_keys(self):
+        """Export all keys to an encrypted file."""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Keys", "api_keys.akmx", "Encrypted key export (*.akmx)"
+        )
+        if not path:
+            return
+        
+        passphrase = self.ask_passphrase(confirm=True)
+        if passphrase is None:
+            return
+        
+        self.statusBar().showMessage("Exporting keys...")
+        self.storage.run(
+            self.run_export, path, passphrase,
+            on_result=lambda count: self.statusBar().showMessage(f"Exported {count} keys to {path}", 5000)
+        )
+    
+    def run_export(self, path, passphrase):
+        """Export all keys to a file (runs on the storage worker)."""
+        from core import transfer
+        return transfer.export_keys(
+            self.key_storage, path, passphrase, workers=config.get("storage", "transfer_workers", 4)
+        )
+    
+    def copy_key_to_clipboard(self, index):
         """Copy the selected key to clipboard when clicked."""
-        name = item.text()
-        key = self.key_storage.get_key(name)
+        name = index.data()
+        self.storage.get_key(name, lambda key: self.set_clipboard_key(name, key))
+    
+    def set_clipboard_key(self, name, key):
+        """Put a fetched key value on the clipboard."""
+        if key is None:
+            self.statusBar().showMessage(f"Key '{name}' has no stored value", 3000)
+            return
         
         clipboard = QApplication.instance().clipboard()
         clipboard.setText(key)
         
         self.statusBar().showMessage(f"Key '{name}' copied to clipboard", 3000)
+    
+    def show_metrics(self):
+        """Show the debug panel with the recorded metrics."""
+        cache_stats = self.key_storage.cache_stats if self.key_storage is not None else None
+        MetricsDialog(cache_stats, self).exec()
+    
+    def changeEvent(self, event):
+        """Wipe cached key values from memory when the window is minimized."""
+        if (event.type() == QEvent.Type.WindowStateChange and self.isMinimized()
+                and self.key_storage is not None):
+            self.storage.call("lock")
+        super().changeEvent(event)
+    
+    def closeEvent(self, event):
+        """Let queued storage writes finish before the window closes."""
+        self.storage.wait_for_done()
+        if self.key_storage is not None:
+            self.key_storage.lock()
+        config.flush()
+        super().closeEvent(event)
@@ -0,0 +1,126 @@
+"""
+Light and dark themes, applied to the whole application at once.
+"""
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt6.QtGui import QColor, QIcon, QImageReader, QPalette, QPixmap
+from PyQt6.QtWidgets import QApplication
+from core import resources
+
+# Colors of the dark theme by palette role
+DARK_COLORS = {
+    QPalette.ColorRole.Window: "#2b2b2b",
+    QPalette.ColorRole.WindowText: "#ffffff",
+    QPalette.ColorRole.Base: "#3b3b3b",
+    QPalette.ColorRole.AlternateBase: "#444444",
+    QPalette.ColorRole.Text: "#ffffff",
+    QPalette.ColorRole.PlaceholderText: "#aaaaaa",
+    QPalette.ColorRole.Button: "#444444",
+    QPalette.ColorRole.ButtonText: "#ffffff",
+    QPalette.ColorRole.BrightText: "#ff5555",
+    QPalette.ColorRole.Light: "#555555",
+    QPalette.ColorRole.Midlight: "#4a4a4a",
+    QPalette.ColorRole.Mid: "#555555",
+    QPalette.ColorRole.Dark: "#1e1e1e",
+    QPalette.ColorRole.Shadow: "#141414",
+    QPalette.ColorRole.Highlight: "#2a82da",
+    QPalette.ColorRole.HighlightedText: "#ffffff",
+    QPalette.ColorRole.ToolTipBase: "#3b3b3b",
+    QPalette.ColorRole.ToolTipText: "#ffffff",
+    QPalette.ColorRole.Link: "#6ab0f3",
+}
+
+# Dark theme colors of disabled widgets
+DARK_DISABLED_COLORS = {
+    QPalette.ColorRole.WindowText: "#808080",
+    QPalette.ColorRole.Text: "#808080",
+    QPalette.ColorRole.ButtonText: "#808080",
+}
+
+# Window and toggle button icon of each theme
+THEME_ICONS = {
+    False: "icons/app_icon.ico",
+    True: "icons/app_icon_dark.ico",
+}
+
+
+def load_icon(name):
+    """Create an icon with every image size stored in an icon resource.
+    
+    Returns:
+        QIcon: The icon, or None if the resource does not exist.
+    """
+    data = resources.load(name)
+    if data is None:
+        return None
+    
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    icon = QIcon()
+    while True:
+        image = reader.read()
+        if image.isNull():
+            break
+        icon.addPixmap(QPixmap.fromImage(image))
+        if not reader.jumpToNextImage():
+            break
+    return icon
+
+
+class ThemeManager:
+    """Switch the application between a light and a dark theme.
+    
+    Each theme's palette and icon are built the first time it is used and
+    kept, so switching only swaps the application palette. No stylesheet
+    is parsed and no widget is re-polished, however many keys are listed.
+    The Fusion style is used because it draws every widget from the
+    palette on all platforms.
+    """
+    
+    def __init__(self, app=None):
+        """Initialize the theme manager.
+        
+        Args:
+            app (QApplication, optional): Application to theme (default: the running one).
+        """
+        self.app = app if app is not None else QApplication.instance()
+        self.app.setStyle("Fusion")
+        self.dark = None
+        self._palettes = {}
+        self._icons = {}
+    
+    def apply(self, dark):
+        """Switch the application to the light or dark theme."""
+        if dark == self.dark:
+            return
+        self.app.setPalette(self.palette(dark))
+        self.dark = dark
+    
+    def palette(self, dark):
+        """Get the palette of a theme."""
+        palette = self._palettes.get(dark)
+        if palette is None:
+            palette = self._palettes[dark] = self._build_palette(dark)
+        return palette
+    
+    def icon(self, dark):
+        """Get the icon of a theme, or None if its file is missing."""
+        if dark not in self._icons:
+            self._icons[dark] = load_icon(THEME_ICONS[dark])
+            if self._icons[dark] is None:
+                print(f"Warning: Could not find icon {THEME_ICONS[dark]}")
+        return self._icons[dark]
+    
+    def _build_palette(self, dark):
+        """Build the palette of a theme."""
+        palette = self.app.style().standardPalette()
+        if not dark:
+            return palette
+        
+        for role, color in DARK_COLORS.items():
+            palette.setColor(role, QColor(color))
+        for role, color in DARK_DISABLED_COLORS.items():
+            palette.setColor(QPalette.ColorGroup.Disabled, role, QColor(color))
+        return palette